@@ -21,6 +21,7 @@ from datasets.common import grid_folder, default_varatts, getRootFolder
 from datasets.common import addLengthAndNamesOfMonth, selectElements, stn_params, shp_params
 from geodata.gdal import loadPickledGridDef, pickleGridDef
 from datasets.WRF import Exp as WRF_Exp
+from utils.catalog import fileExists
 from processing.process import CentralProcessingUnit
 
 # some meta data (needed for defaults)
@@ -510,10 +511,10 @@ def loadCESM_All(experiment=None, name=None, grid=None, station=None, shape=None
     filenames.append(filename) # append to list (passed to DatasetNetCDF later)
     # check existance
     filepath = '{:s}/{:s}'.format(folder,filename)
-    if not os.path.exists(filepath):
+    if not fileExists(filepath): # N.B.: uses archive catalog, if available
       nativename = fileformat.format('',periodstr) # original filename (before regridding)
       nativepath = '{:s}/{:s}'.format(folder,nativename)
-      if os.path.exists(nativepath):
+      if fileExists(nativepath):
         if lautoregrid: 
           from processing.regrid import performRegridding # causes circular reference if imported earlier
           griddef = loadPickledGridDef(grid=grid, res=None, folder=grid_folder)
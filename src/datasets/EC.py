@@ -15,7 +15,7 @@ import codecs, calendar, functools
 from warnings import warn
 # internal imports
 from datasets.CRU import loadCRU_StnTS
-from datasets.common import days_per_month, getRootFolder, selectElements
+from datasets.common import days_per_month, getRootFolder, selectElements, parseStationRecords
 from datasets.common import CRU_vars, stn_params, nullNaN
 from geodata.misc import ParseError, DateError, VariableError, ArgumentError, DatasetError, AxisError
 from geodata.misc import RecordClass, StrictRecordClass, isNumber, isInt 
@@ -146,65 +146,49 @@ class DailyStationRecord(StrictRecordClass):
     f.close()
   
   def parseRecord(self):
-    ''' open the station file and parse records; return a daiy time-series '''
-    # open file
-    f = codecs.open(self.filename, 'r', encoding=self.encoding)
-    self.validateHeader(f.readline()) # read first line as header
+    ''' read the station file at once and decode all records with vectorized string operations; return a 
+        daily time-series (31 days per month, padded with NaN) '''
+    # read entire file and validate header
+    with codecs.open(self.filename, 'r', encoding=self.encoding) as f: text = f.read()
+    lines = text.replace('-9999.9', ' -9999.9').splitlines() # without the replace, the split doesn't work
+    if len(lines) == 0: raise ParseError("No header found in file:\n {:s}".format(self.filename))
+    self.validateHeader(lines[0]) # first line is header
     # allocate daily data array (31 days per month, filled with NaN for missing values)
     tlen = ( (self.end_year - self.begin_year) * 12 + (self.end_mon - self.begin_mon +1) ) * 31
     data = np.empty((tlen,), dtype=self.dtype); data.fill(np.NaN) # use NaN as missing values
-    # some stuff to remember
-    lfloat = 'float' in self.dtype; lint = 'int' in self.dtype; lm = len(self.missing)
-    # iterate over line
-    oldyear = self.begin_year; oldmon = self.begin_mon -1; z = 0
-    for line in f:      
-      ll = line.replace('-9999.9', ' -9999.9').split() # without the replace, the split doesn't work      
-      if ll[0].isdigit() and ll[1].isdigit():
-        year = int(ll[0]); mon = int(ll[1])
-        # check continuity
-        if year == oldyear and mon == oldmon+1: pass
-        elif year == oldyear+1 and oldmon == 12 and mon ==1: pass 
-        else: raise DateError(line)
-        oldyear = year; oldmon = mon
-#         # rigorous check of date bounds
-#         if year == self.begin_year and mon < self.begin_mon: raise DateError, line
-#         elif year < self.begin_year: raise DateError, line
-#         if year == self.end_year and mon > self.end_mon: raise DateError, line
-#         elif year > self.end_year: raise DateError, line
-        # skip dates outside the specified begin/end dates
-        if year < self.begin_year or year > self.end_year: pass # outside range 
-        elif year == self.begin_year and mon < self.begin_mon: pass # start later
-        elif year == self.end_year and mon > self.end_mon: pass # basically done
-        else: # else we can proceed
-          assert len(ll) < 34, line
-          zz = z 
-          # loop over daily values
-          for num in ll[2:]:
-            # evaluate daily value
-            assert zz < data.size, line              
-            if num[:lm] == self.missing: pass # missing value; already pre-filled NaN;  or num[-1] == 'M'
-            else:
-              if lfloat and '.' in num and 1 < len(num): # at least 1 digit plus decimal, i.e. ignore the flag
-                if num[-1].isdigit(): n = float(num)
-                elif num[-2].isdigit() and num[-1] in self.flags: n = float(num[:-1]) # remove data flag
-                else: raise ParseError("Unable to process value '{:s}' in line:\n {:s}".format(num,line))
-              elif lint and 0 < len(num):# almost the same as for floats
-                if num[-1].isdigit(): n = int(num)
-                elif num[-2].isdigit() and num[-1] in self.flags: n = int(num[:-1]) # remove data flag
-                else: raise ParseError("Unable to process value '{:s}' in line:\n {:s}".format(num,line))
-              else: raise ParseError("Unable to process value '{:s}' in line:\n {:s}".format(num,line))
-              if n < self.varmin: warn("Encountered value '{:s}' below minimum in line (ignored):\n {:s}".format(num,line))
-              elif n > self.varmax: warn("Encountered value '{:s}' above maximum in line (ignored):\n {:s}".format(num,line))
-              else: data[zz] = n # only now, we can accept the value
-            # increment daily counter
-            zz += 1 # here each month has 31 days (padded with missing values)
-          if zz != z+31: raise ParseError('Line has {:d} values instead of 31:\n {:s}'.format(zz-z,line))  
-          # increment counter
-          z += 31
-      elif ll[0] != 'Year' or ll[1] != 'Mo':
+    # split lines into fields and separate data lines from title lines
+    records = []; dates = []; reclines = []
+    for line in lines[1:]:
+      ll = line.split()
+      if len(ll) > 1 and ll[0].isdigit() and ll[1].isdigit():
+        records.append(ll[2:]); dates.append((int(ll[0]),int(ll[1]))); reclines.append(line)
+      elif len(ll) < 2 or ll[0] != 'Year' or ll[1] != 'Mo':
         raise ParseError("No valid title or data found at begining of file:\n {:s}".format(self.filename))
-    if z < tlen: raise ParseError('Reached end of file before specified end date: {:s}'.format(self.filename))    
-    f.close() # close again
+    if len(records) == 0: raise ParseError('Reached end of file before specified end date: {:s}'.format(self.filename))
+    # check continuity and skip dates outside the specified begin/end dates
+    dates = np.array(dates, dtype=np.int64)
+    months = ( dates[:,0] - self.begin_year ) * 12 + dates[:,1] - self.begin_mon
+    ldisc = months != np.arange(len(months))
+    if np.any(ldisc): raise DateError(reclines[np.argmax(ldisc)])
+    nrec = tlen//31 # number of months in record
+    if len(records) < nrec: raise ParseError('Reached end of file before specified end date: {:s}'.format(self.filename))
+    for ll,line in zip(records[:nrec],reclines):
+      if len(ll) != 31: raise ParseError('Line has {:d} values instead of 31:\n {:s}'.format(len(ll),line))
+    # decode daily values (missing values are skipped and data flags are removed)
+    fields = np.array(records[:nrec], dtype=np.str_).ravel()
+    lmissing = np.char.startswith(fields, self.missing)
+    numbers = np.char.rstrip(np.where(lmissing, 'NaN', fields), self.flags) 
+    try: values = numbers.astype(np.float64)
+    except ValueError:
+      for num,field in zip(numbers,fields):
+        try: float(num)
+        except ValueError: raise ParseError("Unable to process value '{:s}' in file:\n {:s}".format(field,self.filename))
+    lvalid = np.logical_and(values >= self.varmin, values <= self.varmax) # NaN is never valid
+    nout = np.sum(np.logical_and(~lvalid, ~lmissing))
+    if nout > 0: 
+      warn("Encountered {:d} values outside of valid range [{}, {}] in file (ignored):\n {:s}".format(
+            nout,self.varmin,self.varmax,self.filename))
+    data[lvalid] = values[lvalid] # only now, we can accept the value
     # return array
     return data
   
@@ -552,13 +536,14 @@ class StationRecords(object):
     # reopen netcdf file with netcdf dataset
     self.dataset = DatasetNetCDF(dataset=ncset, mode='rw', load=True) # always need to specify mode manually
     
-  def readStationData(self):
-    ''' read station data from source files and store in dataset '''
+  def readStationData(self, NP=None):
+    ''' read station data from source files and store in dataset; station files are parsed on a pool of NP 
+        worker processes (default: all cores) '''
     assert self.dataset
     # determine record begin and end indices
     all_begin = self.dataset.time.coord[0] # coordinate value of first time step
-    begin_idx = ( self.dataset.stn_begin_date.getArray() - all_begin ) * 31.
-    end_idx = ( self.dataset.stn_end_date.getArray() - all_begin + 1 ) * 31.
+    begin_idx = np.asarray(( self.dataset.stn_begin_date.getArray() - all_begin ) * 31, dtype=np.int64)
+    end_idx = np.asarray(( self.dataset.stn_end_date.getArray() - all_begin + 1 ) * 31, dtype=np.int64)
     # loop over variables
     dailydata = dict() # to store daily data for derived variables
     monlydata = dict() # monthly data, but transposed
@@ -573,10 +558,11 @@ class StationRecords(object):
       dailytmp = np.empty(shape, dtype=varobj.dtype); dailytmp.fill(np.NaN) # initialize all with NaN
       # loop over stations
       s = 0 # station counter
-      for station in self.stationlists[var]:
+      stationlist = self.stationlists[var]
+      for station,data in zip(stationlist,parseStationRecords(stationlist, NP=NP)):
         print(("   {:<15s} {:s}".format(station.name,station.filename)))
-        # read station file
-        dailytmp[s,begin_idx[s]:end_idx[s]] = station.parseRecord()  
+        # read station file (parsed in parallel and returned in order)
+        dailytmp[s,begin_idx[s]:end_idx[s]] = data
         s += 1 # next station
       assert s == varobj.shape[0]
       dailytmp = vardef.convert(dailytmp) # apply conversion function
@@ -15,7 +15,7 @@ import codecs, calendar, functools
 from warnings import warn
 # internal imports
 from datasets.CRU import loadCRU_StnTS
-from datasets.common import days_per_month, getRootFolder, selectElements
+from datasets.common import days_per_month, getRootFolder, selectElements, parseStationRecords
 from datasets.common import CRU_vars, stn_params, nullNaN
 from geodata.misc import ParseError, ArgumentError, DatasetError, AxisError
 from geodata.misc import RecordClass, StrictRecordClass, isNumber, isInt 
@@ -130,81 +130,68 @@ class DailyStationRecord(StrictRecordClass):
     self.validateHeader(f.readline()) # read first line as header
     f.close()
   
-  def parseRecord(self):
-    ''' open the station file and parse records; return a daily time-series '''
-    # open file
-    f = codecs.open(self.filename, 'r', encoding=self.encoding)
-    infoline=f.readlines()
-    ll=infoline[0]
-    self.begin_year = int(ll[11:15])
-    self.begin_mon = int(ll[15:17])
-    #existflag=False
-    off=-270 #number of characters in a line
-    f.seek(off, 2)#-270 from the end of file
-    infoline = f.readlines() 
-    if len(infoline)>=2: 
-      raise ParseError('last line incomplete')
-    else:
-      ll=infoline[-1]
-      self.end_year = int(ll[11:15])
-      self.end_mon = int(ll[15:17])
-    oldyear = self.begin_year; oldmon = self.begin_mon -1;
+  def parseRecord(self, lflags=False):
+    ''' read the station file into a byte buffer and decode the records of the variable all at once, using 
+        fixed-width views of the value, flag and date columns; return a daily time-series (31 days per 
+        month, padded with NaN); if lflags is True, also return the (mflag,qflag,sflag) flags of each day '''
+    # read entire file and convert to a 2D array of characters (lines are padded to full length)
+    with open(self.filename, 'rb') as f: lines = f.read().splitlines()
+    lines = [line for line in lines if line.strip()] # skip empty lines
+    if len(lines) == 0: raise ParseError("No records found in file: {:s}".format(self.filename))
+    if len(lines[-1]) < 266: raise ParseError('last line incomplete') 
+    linelen = np.array([len(line) for line in lines])
+    chars = np.array(lines, dtype='S269').view(np.uint8).reshape((len(lines),269)).copy()
+    chars[chars == 0] = 32 # short lines are padded with null characters: replace with blanks
+    # N.B.: each line has an 11 character ID, year and month, a 4 character element name, and 31 fields of 
+    #       8 characters each: a 5 character value and three 1 character flags (mflag, qflag, sflag)
+    begin_year, begin_mon = decodeInts(chars[:1,11:15])[0], decodeInts(chars[:1,15:17])[0]
+    end_year, end_mon = decodeInts(chars[-1:,11:15])[0], decodeInts(chars[-1:,15:17])[0]
+    self.begin_year = int(begin_year); self.begin_mon = int(begin_mon)
+    self.end_year = int(end_year); self.end_mon = int(end_mon)
     # allocate daily data array (31 days per month, filled with NaN for missing values)
     tlen = ( (self.end_year - self.begin_year) * 12 + (self.end_mon - self.begin_mon +1) ) * 31
     data = np.empty((tlen,), dtype=self.dtype); data.fill(np.NaN) # use NaN as missing values
-    # some stuff to remember
-    lm = len(self.missing)
-    # iterate over line
-    z = 0
-    f.seek(0,0)
-    for line in f:
-      ll=line
-      if self.variable==ll[17:21]:#check if it's the variable we're looking for
-        year = int(ll[11:15]); mon = int(ll[15:17])  
-        # check continuity
-        discontinuity_flag = False
-        if year == oldyear and mon == oldmon+1: pass
-        elif year == oldyear+1 and oldmon == 12 and mon ==1: pass 
-        else:
-          discontinuity_flag = True
-          print('discontinuity', oldyear, oldmon)
-          while (discontinuity_flag):
-            z+=31
-            if oldmon == 12:
-              oldmon=1;oldyear+=1
-            else:
-              oldmon+=1
-            if year == oldyear and mon == oldmon+1: discontinuity_flag=False
-            elif year == oldyear+1 and oldmon == 12 and mon ==1: discontinuity_flag=False 
-        oldyear=year;oldmon=mon
-          #assert len(ll) ==269, line
-        zz = z 
-          # loop over daily values
-        count=21
-        while(count < 266):
-            num=ll[count:count+5]
-            # evaluate daily value
-            assert zz < data.size, line              
-            if num[:lm] == self.missing: 
-                pass # missing value; already pre-filled NaN;  or num[-1] == 'M'
-            else:
-              n = int(num)
-              if n < self.varmin: warn("Encountered value '{:s}' below minimum in line (ignored):\n {:s}".format(num,line))
-              elif n > self.varmax: warn("Encountered value '{:s}' above maximum in line (ignored):\n {:s}".format(num,line))
-              else: data[zz] = n # only now, we can accept the value
-            # increment count in line
-            zz += 1 # here each month has 31 days (padded with missing values)
-            count += 8 # here each month has 31 days (padded with missing values)
-        if zz != z+31: raise ParseError('Line has {:d} values instead of 31:\n {:s}'.format(zz-z,line))  
-        # increment counter
-        z += 31
-    #if existflag==False:tlen=0
-    #if z < tlen: raise ParseError, 'Reached end of file before specified end date: {:s}'.format(self.filename)    
-    f.close() # close again
+    if lflags: flags = np.full((tlen,3), b' ', dtype='S1')
+    # select lines with the variable we're looking for
+    lvar = np.all(chars[:,17:21] == np.frombuffer(self.variable.encode(), dtype=np.uint8), axis=1)
+    if np.any(linelen[lvar] < 266): raise ParseError("Incomplete line(s) in file: {:s}".format(self.filename))
+    chars = chars[lvar,:]
+    if len(chars) > 0:
+      # compute offsets from dates (discontinuities are skipped)
+      months = ( decodeInts(chars[:,11:15]) - self.begin_year ) * 12 + decodeInts(chars[:,15:17]) - self.begin_mon
+      if months.min() < 0 or months.max()*31 + 31 > tlen:
+        raise ParseError("Record dates out of range in file: {:s}".format(self.filename)) 
+      index = ( months.reshape((len(months),1))*31 + np.arange(31) ).ravel()
+      # decode daily values (missing values are skipped)
+      fields = chars[:,21:].reshape((len(chars)*31,8))
+      lmissing = np.all(fields[:,:len(self.missing)] == np.frombuffer(self.missing.encode(), dtype=np.uint8), axis=1)
+      values = decodeInts(fields[:,:5])
+      lvalid = np.logical_and(values >= self.varmin, values <= self.varmax)
+      nout = np.sum(np.logical_and(~lvalid, ~lmissing))
+      if nout > 0: 
+        warn("Encountered {:d} values outside of valid range [{}, {}] in file (ignored):\n {:s}".format(
+              nout,self.varmin,self.varmax,self.filename))
+      lvalid = np.logical_and(lvalid, ~lmissing)
+      data[index[lvalid]] = values[lvalid] # only now, we can accept the value
+      if lflags: flags[index,:] = fields[:,5:8].view('S1')
     # return array
-    return data
+    if lflags: return data, flags
+    else: return data
   
 
+def decodeInts(chars):
+  ''' decode right-aligned integers from a 2D array of characters (uint8), where each row is one field '''
+  digits = chars.astype(np.int64) - 48 # ASCII code of '0'
+  ldigit = np.logical_and(digits >= 0, digits <= 9)
+  lsign = chars == 45 # ASCII code of '-'
+  lvalid = np.all(np.logical_or(np.logical_or(ldigit, lsign), chars == 32), axis=1) # or blank
+  if not np.all(lvalid): 
+    raise ParseError("Unable to decode value(s): {}".format(chars[~lvalid][:5].tobytes()))
+  powers = 10**np.arange(chars.shape[1]-1,-1,-1, dtype=np.int64)
+  values = np.where(ldigit, digits, 0).dot(powers)
+  return np.where(lsign.any(axis=1), -values, values)
+
+
 ## class that defines variable properties (specifics are implemented in children)
 class VarDef(RecordClass):
   # variable specific
@@ -552,13 +539,14 @@ class StationRecords(object):
     # reopen netcdf file with netcdf dataset
     self.dataset = DatasetNetCDF(dataset=ncset, mode='rw', load=True) # always need to specify mode manually
     
-  def readStationData(self):
-    ''' read station data from source files and store in dataset '''
+  def readStationData(self, NP=None):
+    ''' read station data from source files and store in dataset; station files are parsed on a pool of NP 
+        worker processes (default: all cores) '''
     assert self.dataset
     # determine record begin and end indices
     all_begin = self.dataset.time.coord[0] # coordinate value of first time step
-    begin_idx = ( self.dataset.stn_begin_date.getArray() - all_begin ) * 31.
-    end_idx = ( self.dataset.stn_end_date.getArray() - all_begin + 1 ) * 31.
+    begin_idx = np.asarray(( self.dataset.stn_begin_date.getArray() - all_begin ) * 31, dtype=np.int64)
+    end_idx = np.asarray(( self.dataset.stn_end_date.getArray() - all_begin + 1 ) * 31, dtype=np.int64)
     # loop over variables
     dailydata = dict() # to store daily data for derived variables
     monlydata = dict() # monthly data, but transposed
@@ -573,10 +561,11 @@ class StationRecords(object):
       dailytmp = np.empty(shape, dtype=varobj.dtype); dailytmp.fill(np.NaN) # initialize all with NaN
       # loop over stations
       s = 0 # station counter
-      for station in self.stationlists[var]:
+      stationlist = self.stationlists[var]
+      for station,data in zip(stationlist,parseStationRecords(stationlist, NP=NP)):
         print(("   {:<15s} {:s}".format(station.name,station.filename)))
-        # read station file
-        dailytmp[s,begin_idx[s]:end_idx[s]] = station.parseRecord()  
+        # read station file (parsed in parallel and returned in order)
+        dailytmp[s,begin_idx[s]:end_idx[s]] = data
         s += 1 # next station
       assert s == varobj.shape[0]
       dailytmp = vardef.convert(dailytmp) # apply conversion function
@@ -16,7 +16,7 @@ Changes in SnoDAS data:
 # external imports
 import datetime as dt
 import pandas as pd
-import os, gzip
+import os, gzip, shutil
 import os.path as osp
 import numpy as np
 import netCDF4 as nc # netCDF4-python module
@@ -98,6 +98,7 @@ avgfile   = 'snodas{0:s}_clim{1:s}.nc' # the filename needs to be extended: bias
 tsfile    = 'snodas_{0:s}{1:s}{2:s}_monthly.nc' # extend with bias_correction, variable and grid type
 daily_folder    = root_folder + dataset_name.lower()+'_daily/' 
 netcdf_filename = dataset_name.lower()+'_{VAR:s}_daily.nc' # extend with variable name
+cache_folder    = root_folder + dataset_name.lower()+'_cache/' # decompressed binary files (memory-mapped)
 netcdf_dtype    = np.dtype('<f4') # little-endian 32-bit float
 netcdf_settings = dict(chunksizes=(8,snodas_shape2d[0]/16,snodas_shape2d[1]/32))
 
@@ -133,7 +134,7 @@ def readBinaryData(fobj=None, lstr=True):
     # read binary data (16-bit signed integers, big-endian)
     if lstr:
         # read binary data from file stream (basically as string; mainly for gzip files)
-        data = np.fromstring(fobj.read(), dtype=binary_dtype, count=-1) # read binary data
+        data = np.frombuffer(fobj.read(), dtype=binary_dtype, count=-1) # read binary data (no copy)
     else:
         # read binary data from file system (does not work with gzip files)
         data = np.fromfile(fobj, dtype=binary_dtype, count=-1) # read binary data
@@ -141,53 +142,126 @@ def readBinaryData(fobj=None, lstr=True):
         raise DataError(data)
     data = data.reshape(snodas_shape2d) # assign shape
     return data
-  
+
+def cacheBinaryFile(varname=None, date=None, root_folder=root_folder, cache_folder=cache_folder, loverwrite=False):
+    ''' decompress a gzipped SnoDAS binary file into the cache folder (only if it is not cached yet)
+        and return the path to the uncompressed file, which can then be memory-mapped '''
+    folder,filename = getFilenameFolder(varname=varname, date=date, root_folder=root_folder, lgzip=True)
+    cachepath = cache_folder + filename[:-3] # strip '.gz'
+    if loverwrite or not osp.exists(cachepath):
+        if not osp.isdir(cache_folder): os.makedirs(cache_folder)
+        tmppath = cachepath + '.tmp'
+        with gzip.open(folder+filename, mode='rb') as gzobj, open(tmppath, mode='wb') as fobj:
+            shutil.copyfileobj(gzobj, fobj) # decompress in blocks
+        os.replace(tmppath, cachepath)
+        # N.B.: the file is only renamed when it is complete, so that incomplete files are never used
+    return cachepath
+
+def mapBinaryFile(filepath):
+    ''' memory-map an uncompressed SnoDAS binary file as a read-only 2D array (origin upper-left) '''
+    if osp.getsize(filepath) != snodas_shape2d[0]*snodas_shape2d[1]*binary_dtype.itemsize:
+        raise DataError(filepath)
+    return np.memmap(filepath, dtype=binary_dtype, mode='r', shape=snodas_shape2d)
+
+def decodeBinaryData(data, scalefactor=1, lmask=True, out=None, mask=None):
+    ''' convert raw binary data to actual variable values in one pass: the cast to float and the scaling
+        are combined and written into 'out' (if given), and missing values are masked (mask is written
+        into 'mask', if given) '''
+    fdata = np.multiply(data, scalefactor, out=out, dtype=netcdf_dtype, casting='unsafe')
+    if lmask:
+        mask = np.equal(data, missing_value, out=mask)
+        fdata = np.ma.masked_array(fdata, mask=mask, copy=False)
+    return fdata
+
+class BinaryRaster(object):
+    '''
+      A lazy wrapper for raw SnoDAS binary data (usually a memory-mapped file); the y-axis is flipped
+      (in the file the upper-left corner is the origin, we want lower-left) and values are masked and
+      scaled only when the raster is sliced, and only for the requested elements.
+    '''
+    shape = snodas_shape2d
+    ndim  = 2
+    dtype = netcdf_dtype
+
+    def __init__(self, data=None, scalefactor=1, lmask=True):
+        ''' wrap raw binary data; if data is None, the raster is treated as missing '''
+        if data is None:
+            data = np.broadcast_to(np.asarray(missing_value, dtype=binary_dtype), snodas_shape2d)
+            scalefactor = 1 # N.B.: missing values are not scaled
+        elif data.shape != snodas_shape2d: raise DataError(data.shape)
+        self.data = data[::-1,:] # flip y-axis (only a view)
+        self.scalefactor = scalefactor
+        self.lmask = lmask
+
+    def __getitem__(self, key):
+        ''' slice raw data and decode only the selected elements '''
+        return decodeBinaryData(self.data[key], scalefactor=self.scalefactor, lmask=self.lmask)
+
+    def __array__(self, dtype=None):
+        data = self.read()
+        return data if dtype is None else data.astype(dtype)
+
+    def read(self, out=None, mask=None):
+        ''' decode the entire raster (into 'out' and 'mask', if given) '''
+        return decodeBinaryData(self.data, scalefactor=self.scalefactor, lmask=self.lmask, out=out, mask=mask)
+
 def readBinaryFile(varname=None, date=None, root_folder=root_folder, lgzip=True, scalefactor=None, 
-                   lmask=True, lmissing=True):
-    ''' load SnoDAS binary data for one day into a numpy array with proper scaling and unites etc. '''
+                   lmask=True, lmissing=True, lcache=False, cache_folder=cache_folder, llazy=False):
+    ''' load SnoDAS binary data for one day into a numpy array with proper scaling and unites etc.; 
+        if lcache is True, decompressed files are cached and memory-mapped, and if llazy is True, a
+        BinaryRaster is returned, which only decodes data when it is sliced '''
     # find file
     folder,filename = getFilenameFolder(varname=varname, date=date, root_folder=root_folder, lgzip=lgzip)
     filepath = folder+filename
+    if scalefactor is None:
+        scalefactor = binary_varatts[varname]['scalefactor']*netcdf_varatts[varname]['scalefactor']
     # check if present
     try:
-        # open file (gzipped or not)
-        with gzip.open(filepath, mode='rb') if lgzip else open(filepath, mode='rb') as fobj:              
-            data = readBinaryData(fobj=fobj, lstr=lgzip,) # read data        
-        # flip y-axis (in file upper-left corner is origin, we want lower-left)
-        data = np.flip(data, axis=0)
-        # N.B.: the order of the axes is (y,x)
-        # format such that we have actual variable values
-        if lmask:
-            fdata = np.ma.masked_array(data, dtype=netcdf_dtype)
-            fdata = np.ma.masked_where(data==-9999, fdata, copy=False)
+        if lcache:
+            # decompress once and memory-map uncompressed file
+            if lgzip: filepath = cacheBinaryFile(varname=varname, date=date, root_folder=root_folder, 
+                                                 cache_folder=cache_folder)
+            data = mapBinaryFile(filepath)
         else:
-            fdata = np.asarray(data, dtype=netcdf_dtype)
-        del data
-        # apply scalefactor
-        if scalefactor is None:
-            scalefactor = binary_varatts[varname]['scalefactor']*netcdf_varatts[varname]['scalefactor']
-        if scalefactor != 1:
-            fdata *= scalefactor
+            # open file (gzipped or not)
+            with gzip.open(filepath, mode='rb') if lgzip else open(filepath, mode='rb') as fobj:              
+                data = readBinaryData(fobj=fobj, lstr=lgzip,) # read data
+        # N.B.: the order of the axes is (y,x); flipping, masking and scaling are done by BinaryRaster
+        raster = BinaryRaster(data, scalefactor=scalefactor, lmask=lmask)
     except IOError:
         if lmissing:
             print(("Warning: data for '{}' missing - creating empty array!\n  ('{:s}')".format(date, folder)))
-            # create empty/masked array
-            if lmask: fdata = np.ma.masked_all(snodas_shape2d, dtype=netcdf_dtype)            
-            else: fdata = np.zeros(snodas_shape2d, dtype=netcdf_dtype)+missing_value
+            raster = BinaryRaster(None, lmask=lmask) # empty/masked raster
         else:
             print(("Point of failure: {}/{}".format(varname,date)))
             raise IOError("Data folder for '{}' is missing:\n  '{:s}'".format(date, folder))
     except DataError:
         if lmissing:
             print(("Warning: data for '{}' incomplete - creating empty array!\n  ('{:s}')".format(date, folder)))
-            # create empty/masked array
-            if lmask: fdata = np.ma.masked_all(snodas_shape2d, dtype=netcdf_dtype)            
-            else: fdata = np.zeros(snodas_shape2d, dtype=netcdf_dtype)+missing_value
+            raster = BinaryRaster(None, lmask=lmask) # empty/masked raster
         else:
             print(("Point of failure: {}/{}".format(varname,date)))
             raise
+    # return lazy raster or decode data now
+    return raster if llazy else raster.read()
 
-    return fdata
+def readBinaryBatch(varname=None, dates=None, out=None, lmask=True, **kwargs):
+    ''' load SnoDAS binary data for many days into one 3D array, so that it can be written to NetCDF in
+        one go; each raster is decoded directly into its slice of the (optionally preallocated) output
+        array (all other keyword arguments are passed on to readBinaryFile) '''
+    shape = (len(dates),)+snodas_shape2d
+    if out is None:
+        data = np.empty(shape, dtype=netcdf_dtype)
+        mask = np.empty(shape, dtype=np.bool_) if lmask else None
+    else:
+        if out.shape != shape: raise ValueError(out.shape)
+        data = np.ma.getdata(out)
+        mask = np.ma.getmaskarray(out) if lmask else None
+    for i,date in enumerate(dates):
+        raster = readBinaryFile(varname=varname, date=date, lmask=lmask, llazy=True, **kwargs)
+        raster.read(out=data[i,:], mask=None if mask is None else mask[i,:])
+    # return (masked) array
+    return np.ma.masked_array(data, mask=mask, copy=False) if lmask else data
 
 def creatNetCDF(varname, varatts=None, ncatts=None, data_folder=daily_folder, fillValue=missing_value):
     ''' create a NetCDF-4 file for the given variable, create dimensions and variable, and allocate data;
@@ -1033,6 +1107,8 @@ if __name__ == '__main__':
       
       
         lappend = True
+        lcache = True # keep decompressed binary files and memory-map them
+        batch_chunks = 4 # number of time chunks written to NetCDF in one go
   #       netcdf_settings = dict(chunksizes=(1,snodas_shape2d[0]/4,snodas_shape2d[1]/8))
         nc_time_chunk = netcdf_settings['chunksizes'][0]
         start_date = '2009-12-14'; end_date = '2019-04-10'
@@ -1092,53 +1168,38 @@ if __name__ == '__main__':
                     ncds.close()
                     continue # skip ahead to next variable
             
-            flush_intervall = 64 if nc_time_chunk==1 else nc_time_chunk*4
+            # batches of several time chunks are read and written to NetCDF in one go
+            batch_size = nc_time_chunk*batch_chunks
+            data_buffer = np.empty((batch_size,)+snodas_shape2d, dtype=netcdf_dtype)
+            mask_buffer = np.empty((batch_size,)+snodas_shape2d, dtype=np.bool_)
+            # N.B.: the buffers are reused for all batches
             
-            # loop over daily records and periodically write to disk
-            ii = 0; fi = 0; c = 0; var_chunks = []; tc_chunks = []; ts_chunks = []
+            # loop over batches of daily records and write to disk
+            ii = time_offset
             print("\nIterating over daily rasters:\n")
-            for i,day in enumerate(time_array):
+            for ib in range(0, len(time_array), batch_size):
                 
-                ii = time_offset + i + 1 # one-based day
-                actual_day = day -1
+                days = time_array[ib:ib+batch_size]; nb = len(days)
+                ic = ii; ii = ic + nb # start and end of batch (zero-based)
+                actual_days = days - 1
                 ## N.B.: look into validity of time-stamp, i.e. end of day or beginning?
+                for actual_day in actual_days: print(("  {}".format(actual_day)))
       
-                # load data and add to variable chunk list
-                var_chunks.append(readBinaryFile(varname=varname, date=day,))
-                # assign time stamp to time chunk list
-                tc_chunks.append(i+time_offset) # zero-based
-                print(("  {}".format(actual_day)))
-                ts_chunks.append(str(actual_day))
+                # load data directly into buffer
+                out = np.ma.masked_array(data_buffer[:nb,:], mask=mask_buffer[:nb,:], copy=False)
+                data = readBinaryBatch(varname=varname, dates=days, out=out, lcache=lcache)
+                # write data, time coordinate, and time stamps
+                ncvar[ic:ii,:,:] = data
+                nctc[ic:ii] = np.arange(ic,ii)
+                ncts[ic:ii] = np.array([str(actual_day) for actual_day in actual_days])
+                del data, out
                 
-                # now assign chunk to file
-                c += 1
-                if c == nc_time_chunk:
-                    ic = ii - nc_time_chunk # start of chunk
-                    # write data
-                    ncvar[ic:ii,:,:] = np.stack(var_chunks, axis=0)
-                    nctc[ic:ii] = np.stack(tc_chunks, axis=0)          
-                    ncts[ic:ii] = np.stack(ts_chunks, axis=0)
-                    # reset intervall counter and lists
-                    c = 0; var_chunks = []; tc_chunks = []; ts_chunks = []
-  
-                # periodic flushing to disk
-                fi += 1
-                if fi == flush_intervall:
-                    print(("Flushing data to disk ({:d}, {:s})".format(ii, actual_day)))
-                    ncds.sync() # flush data
-                    fi = 0 # reset intervall counter
-                    gc.collect()
+                # flush to disk after every batch
+                print(("Flushing data to disk ({:d}, {})".format(ii, actual_days[-1])))
+                ncds.sync()
                     
-            # write remaining data for incomplete chunk
-            if len(var_chunks) > 0:
-                ic = ii - c # start of chunk
-                # write data
-                ncvar[ic:ii,:,:] = np.stack(var_chunks, axis=0)
-                nctc[ic:ii] = np.stack(tc_chunks, axis=0)          
-                ncts[ic:ii] = np.stack(ts_chunks, axis=0)
-                # delete chunk lists lists
-                del var_chunks, tc_chunks, ts_chunks
-                gc.collect()
+            del data_buffer, mask_buffer
+            gc.collect()
             
             print(("\nCompleted iteration; read {:d} rasters and created NetCDF-4 variable:\n".format(ii)))    
             print(ncvar)
@@ -24,6 +24,7 @@ from datasets.common import grid_folder, selectElements, stn_params, shp_params,
 from warnings import warn
 from collections import OrderedDict
 from utils.constants import precip_thresholds
+from utils.catalog import fileExists
 
 dataset_name = 'WRF' # dataset name
 root_folder = getRootFolder(dataset_name=dataset_name)
@@ -878,11 +879,11 @@ def loadWRF_All(experiment=None, name=None, domains=None, grid=None, station=Non
       filenames.append(filename) # file list to be passed on to DatasetNetCDF
       # check existence
       filepath = '{:s}/{:s}'.format(folder,filename)
-      if not os.path.exists(filepath):
+      if not fileExists(filepath): # N.B.: uses archive catalog, if available
         if lclim: nativename = fileformat.format(domain,'',periodstr) # original filename (before regridding)
         elif lts or ldaily: nativename = fileformat.format(domain,'') # original filename (before regridding)
         nativepath = '{:s}/{:s}'.format(folder,nativename)
-        if os.path.exists(nativepath):
+        if fileExists(nativepath):
           if lautoregrid: # already set to False for stations
             from processing.regrid import performRegridding # causes circular reference if imported earlier
             dataargs = dict(experiment=experiment, filetypes=[filetype], domain=domain, period=period)
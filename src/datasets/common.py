@@ -13,8 +13,10 @@ import inspect
 import numpy as np
 import os
 import functools
+import multiprocessing
 # internal imports
 from utils.misc import expandArgumentList
+from utils.catalog import fileExists
 from geodata.misc import AxisError, DatasetError, DateError, ArgumentError, EmptyDatasetError, DataError, VariableError
 from geodata.base import Dataset, Variable, Axis, Ensemble
 from geodata.netcdf import DatasetNetCDF
@@ -122,6 +124,26 @@ def timeSlice(period):
   return (period[0]-1979)*12, (period[1]-1979)*12-1 
 
 
+# helper functions to parse daily station records (EC and GHCN) in parallel
+def parseStationRecord(station):
+  ''' worker function that parses a single station record (must be module-level, so it can be pickled) '''
+  return station.parseRecord()
+
+def parseStationRecords(stations, NP=None, chunksize=4):
+  ''' parse a list of daily station records (objects with a parseRecord method) on a pool of NP worker
+      processes; the records are returned in order, as an iterator; NP=1 parses in the current process '''
+  if NP is None: NP = multiprocessing.cpu_count()
+  if NP == 1 or len(stations) < 2:
+    for station in stations: yield station.parseRecord()
+  else:
+    pool = multiprocessing.Pool(processes=min(NP,len(stations)))
+    try:
+      for data in pool.imap(parseStationRecord, stations, chunksize=chunksize): yield data
+    finally:
+      pool.terminate(); pool.join() # also if the generator is not exhausted
+
+
+
 # convenience function to extract landmask variable from another masked variable
 def addLandMask(dataset, varname='precip', maskname='landmask', atts=None):
   ''' Add a landmask variable with meta data from a masked variable to a dataset. '''
@@ -381,10 +403,10 @@ def loadObservations(name=None, title=None, folder=None, period=None, grid=None,
                            filepattern=filepattern, filetype=mode)
     # check existance
     filepath = '{:s}/{:s}'.format(folder,filename)
-    if not os.path.exists(filepath):
+    if not fileExists(filepath): # N.B.: uses archive catalog, if available
       nativename = getFileName(name=name, resolution=resolution, period=period, grid=None, filepattern=filepattern)
       nativepath = '{:s}/{:s}'.format(folder,nativename)
-      if os.path.exists(nativepath):
+      if fileExists(nativepath):
         if lautoregrid: 
           from processing.regrid import performRegridding # causes circular reference if imported earlier
           griddef = loadPickledGridDef(grid=grid, res=None, folder=grid_folder)
@@ -554,9 +576,10 @@ def loadDataset(name=None, station=None, shape=None, mode='climatology', basin_l
 loadDatasets = BatchLoad(loadDataset)
 
 # function to extract common points that meet a specific criterion from a list of datasets
-def selectElements(datasets, axis, testFct=None, master=None, linplace=False, lall=False):
+def selectElements(datasets, axis, testFct=None, master=None, linplace=False, lall=False, lvectorized=False):
   ''' Extract common points that meet a specific criterion from a list of datasets. 
-      The test function has to accept the following input: index, dataset, axis'''
+      The test function has to accept the following input: index, dataset, axis; if lvectorized is 
+      True, an array of indices is passed instead and a boolean array has to be returned. '''
   if linplace: raise NotImplementedError("Option 'linplace' does not work currently.")
   # check input
   if not isinstance(datasets, (list,tuple,Ensemble)): raise TypeError(datasets)
@@ -585,42 +608,33 @@ def selectElements(datasets, axis, testFct=None, master=None, linplace=False, la
   if not imaster is None and not isinstance(imaster,(int,np.integer)): raise TypeError(imaster)
   elif imaster >= len(datasets) or imaster < 0: raise ValueError 
   maxis = axes.pop(imaster) # extraxt shortest axis for loop
-  if lall: 
-    tmpds = tuple(datasets)
-    if imaster != 0: tmpds = (tmpds[imaster],)+tmpds[:imaster]+tmpds[imaster+1:]
-    test_fct = lambda i,ds: testFct(i, ds, axis) # prepare test function arguments
-  else: 
-    test_fct = lambda i: testFct(i, datasets[imaster], axis) 
-  # loop over coordinate axis
-  itpls = [] # list of valid index tuple
-  for i,x in enumerate(maxis.coord):
-    # check other axes
-    if all([x in ax.coord for ax in axes]): # only the other axes
-      # no condition
-      if lnotest:
-        # just find and add indices
-        itpls.append((i,)+tuple(ax.coord.searchsorted(x) for ax in axes))
-      # check condition using shortest dataset
-      elif lall: 
-        # check test condition on all datasets (slower)
-        tmpidx = (i,)+tuple(ax.coord.searchsorted(x) for ax in axes)
-        if all(test_fct(ii,ds) for ii,ds in zip(tmpidx,tmpds)):
-          # add corresponding indices in each dataset to list
-          itpls.append(tmpidx)
-      else:
-        # check test condition on only one dataset (faster, default)
-        if test_fct(i):
-          # add corresponding indices in each dataset to list
-          itpls.append((i,)+tuple(ax.coord.searchsorted(x) for ax in axes))
-          # N.B.: since we can expect exact matches, plain searchsorted is fastest (side='left') 
+  tmpds = tuple(datasets)
+  if imaster != 0: tmpds = (tmpds[imaster],)+tmpds[:imaster]+tmpds[imaster+1:] # master first
+  # join coordinate axes: find master coordinates in all other (sorted) axes at once
+  mcoord = maxis.coord
+  lmatch = np.ones(len(mcoord), dtype=np.bool_)
+  idxs = [np.arange(len(mcoord))] # index arrays, master first
+  for ax in axes:
+    if len(ax) == 0: 
+      lmatch[:] = False; idxs.append(np.zeros(len(mcoord), dtype=np.int64)); continue
+    order = np.argsort(ax.coord, kind='mergesort') # stable: first occurence of duplicates
+    srtcoord = ax.coord[order]
+    pos = np.minimum(srtcoord.searchsorted(mcoord), len(srtcoord)-1) # out of range: no match
+    lmatch &= srtcoord[pos] == mcoord
+    idxs.append(order[pos])
+  # check condition using shortest dataset (faster, default) or all datasets (slower)
+  if not lnotest:
+    for idx,ds in zip(idxs, tmpds if lall else tmpds[:1]):
+      if not np.any(lmatch): break
+      ltest = np.zeros_like(lmatch)
+      if lvectorized: ltest[lmatch] = testFct(idx[lmatch], ds, axis)
+      else: ltest[lmatch] = [bool(testFct(i, ds, axis)) for i in idx[lmatch]]
+      lmatch &= ltest # only elements that passed are tested on other datasets
   # check if there is anything left...
-  if len(itpls) == 0: raise DatasetError("Aborting: no data points match all criteria!")
+  if not np.any(lmatch): raise DatasetError("Aborting: no data points match all criteria!")
   # construct axis indices for each dataset (need to remember to move shortest axis back in line)
-  idxs = [[] for ds in datasets] # create unique empty lists
-  for itpl in itpls:
-    for i,idx in enumerate(itpl): idxs[i].append(idx)
+  idxs = [np.asarray(idx[lmatch], dtype='int') for idx in idxs]
   idxs.insert(imaster,idxs.pop(0)) # move first element back in line (where shortest axis was)
-  idxs = [np.asarray(idxlst, dtype='int') for idxlst in idxs]      
   # slice datasets using only positive results  
   datasets = [ds(lidx=True, linplace=linplace, **{axis:idx}) for ds,idx in zip(datasets,idxs)]
   if lens: datasets = Ensemble(*datasets, **enskwargs)
@@ -11,8 +11,12 @@ import numpy as np
 import numpy.ma as ma # masked arrays
 from numpy.lib.stride_tricks import as_strided
 import scipy.stats as ss
-from scipy.interpolate import griddata
+from scipy import sparse
+from scipy.interpolate import griddata, CloughTocher2DInterpolator
+from scipy.spatial import Delaunay, cKDTree
+import os, hashlib
 import numbers
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import functools
 import gc # garbage collection
 from warnings import warn
@@ -24,7 +28,7 @@ from geodata.misc import checkIndex, isEqual, isInt, isNumber, AttrDict, joinDic
 from geodata.misc import genStrArray, translateSeasons
 from geodata.misc import VariableError, AxisError, DataError, DatasetError, ArgumentError, EmptyDatasetError
 from processing.multiprocess import apply_along_axis
-from utils.misc import histogram, binedges, detrend, percentile, tabulate
+from utils.misc import histogram, binedges, detrend, percentile, tabulate, QuantileSketch
      
 # used for climatology and seasons
 monthlyUnitsList = ('month','months','month of the year')
@@ -66,6 +70,20 @@ class UnaryCheckAndCreateVar(object):
     return functools.partial(self.__call__, instance) # but using 'partial' is simpler
 
 
+def binaryAtts(orig, other, name, units):
+  ''' Construct the attributes of the result of a binary operation; only non-conflicting attributes are kept. '''
+  if hasattr(other,'atts'): 
+    atts = joinDicts(orig.atts, other.atts)
+    if orig.atts['name'] == other.atts['name']:
+        # use original name, if names are the same (likely some kind of change or differences)
+        atts['name'] = orig.atts['name'] 
+        atts['binop_name'] = name
+    else:    
+        atts['name'] = name
+  else: atts = orig.atts.copy()
+  atts['units'] = units # units can still change, though
+  return atts
+
 def BinaryCheckAndCreateVar(sameUnits=True, linplace=False):
   ''' A decorator function that accepts arguments and returns a decorator class with fixed parameter values. '''
   class BinaryCheckAndCreateVar_Class(object):
@@ -78,6 +96,9 @@ def BinaryCheckAndCreateVar(sameUnits=True, linplace=False):
     # define method wrapper (this is now the actual decorator)
     def __call__(self, orig, other, sameUnits=sameUnits, asVar=True, linplace=linplace, **kwargs):
       ''' Perform sanity checks, then execute operation, and return result. '''
+      from geodata.lazy import LazyVar, lazyOperation # N.B.: the lazy module depends on this module
+      # operations with LazyVars are only evaluated when data are requested (except in-place operations)
+      llazy = not linplace and ( isinstance(orig,LazyVar) or isinstance(other,LazyVar) )
       if isinstance(other,Variable): # raise TypeError, 'Can only add two Variable instances!' 
         if orig.shape != other.shape:
           mind = min(orig.ndim,other.ndim)
@@ -87,25 +108,30 @@ def BinaryCheckAndCreateVar(sameUnits=True, linplace=False):
         if sameUnits and orig.units != other.units: 
           raise VariableError('Variable units have to be identical for addition!')
         for lax,rax in zip(orig.axes,other.axes):
-          if not isEqual(lax[:],rax[:]): 
+          if lax is not rax and not isEqual(lax[:],rax[:]): 
               raise AxisError('Variables need to have identical coordinate arrays!\n{}'.format(lax[:]-rax[:]))
-        if not other.data: other.load()
+        if not other.data and not llazy: other.load()
       elif not isinstance(other, (np.ndarray,numbers.Number,np.integer,np.inexact)): 
         raise TypeError('Can only operate with Variables or numerical types!')
         # N.B.: don't check ndarray shapes, because we want to allow broadcasting        
-      if not orig.data: orig.load()
       # prepare arguments
       if isinstance(other, Variable):
-        otherdata = other.data_array
         othername = other.name      
         otherunits = other.units
+      else:
+        othername = str(other)
+        otherunits = None
+      if llazy: # construct expression instead of computing results
+        return lazyOperation(self.binOp, orig, other, asVar=asVar, othername=othername, 
+                             otherunits=otherunits, **kwargs)
+      if not orig.data: orig.load()
+      if isinstance(other, Variable):
+        otherdata = other.data_array
         if other.ndim < orig.ndim: 
           otherdata = otherdata.reshape(other.shape+(1,)*(orig.ndim-other.ndim))
         elif other.ndim < orig.ndim: 
           raise NotImplementedError("Can only broadcast second Variable in binary operation.")
       else:
-        othername = str(other)
-        otherunits = None
         otherdata = np.asanyarray(other)
       # call original method
       try:
@@ -122,16 +148,7 @@ def BinaryCheckAndCreateVar(sameUnits=True, linplace=False):
         var = orig # in-place operation should already have changed data_array 
       elif asVar:
         # construct resulting variable (copy from orig)
-        if hasattr(other,'atts'): 
-          atts = joinDicts(orig.atts, other.atts)
-          if orig.atts['name'] == other.atts['name']:
-              # use original name, if names are the same (likely some kind of change or differences)
-              atts['name'] = orig.atts['name'] 
-              atts['binop_name'] = name
-          else:    
-              atts['name'] = name
-        else: atts = orig.atts.copy()
-        atts['units'] = units # units can still change, though
+        atts = binaryAtts(orig, other, name, units)
         var = orig.copy(data=data, atts=atts)
       else:
         var = data
@@ -313,6 +330,102 @@ class ApplyTestOverList(object):
     return functools.partial(self.__call__, instance) # but using 'partial' is simpler
 
 
+## interpolation of scattered points to regular grids (used by Variable.gridVar)
+interp_weights = 'points_{0:s}_{1:s}_weights.npz' # file pattern for cached point interpolation weights
+interp_cache = dict() # in-memory cache of triangulations and interpolation weights (by checksum)
+
+def pointChecksum(*arrays):
+  ''' a short checksum that identifies a set of point/grid coordinates (and other settings) '''
+  sha = hashlib.sha1()
+  for array in arrays: 
+    if isinstance(array,str): sha.update(array.encode())
+    else: sha.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+  return sha.hexdigest()[:16]
+
+def pointCoordinates(cvec, gvec, rescale=False):
+  ''' assemble point and grid coordinates as (N,ndim) arrays; if rescale is True, both are centered on 
+      the mean of the point coordinates and divided by their range (peak-to-peak), which is the same 
+      rescaling that scipy.interpolate.griddata applies '''
+  points = np.stack([np.asarray(c, dtype=np.float64).ravel() for c in cvec], axis=1)
+  xi = np.stack([g.ravel() for g in np.broadcast_arrays(*gvec)], axis=1).astype(np.float64)
+  if rescale:
+    offset = points.mean(axis=0); scale = points.ptp(axis=0)
+    scale[scale == 0] = 1. # avoid division by zero
+    points = (points - offset) / scale; xi = (xi - offset) / scale
+  return points, xi
+
+def getTriangulation(points, lcache=True):
+  ''' return the Delaunay triangulation of a set of points (cached in memory by checksum) '''
+  key = ('tri', pointChecksum(points))
+  if lcache and key in interp_cache: return interp_cache[key]
+  tri = Delaunay(points)
+  if lcache: interp_cache[key] = tri
+  return tri
+
+def getInterpWeights(cvec, gvec, method='linear', rescale=False, lcache=True, folder=None, lfeedback=False):
+  ''' Return a sparse matrix of interpolation weights (grid points x sample points) that reproduces 
+      scipy.interpolate.griddata for the methods 'linear' (barycentric weights in the Delaunay triangles) 
+      and 'nearest'; grid points without weights are outside of the convex hull. Weights are cached in 
+      memory and, if a folder is given, saved to/loaded from disk (by checksum of the coordinates). '''
+  if method not in ('linear','nearest'): raise ArgumentError(method)
+  points, xi = pointCoordinates(cvec, gvec, rescale=rescale)
+  shape = (len(xi),len(points))
+  key = pointChecksum(points, xi, method)
+  if lcache and key in interp_cache: return interp_cache[key]
+  # check for cached weights on disk
+  filepath = None
+  if lcache and folder is not None:
+    filepath = '{0:s}/{1:s}'.format(folder,interp_weights.format(pointChecksum(points),key))
+    if os.path.exists(filepath):
+      weights = sparse.load_npz(filepath).tocsr()
+      if weights.shape == shape:
+        if lfeedback: print(("Loading interpolation weights from file '{:s}'".format(filepath)))
+        interp_cache[key] = weights
+        return weights
+  # compute weights
+  if method == 'nearest':
+    dist, cols = cKDTree(points).query(xi); del dist
+    rows = np.arange(len(xi)); vals = np.ones(len(xi))
+  else:
+    tri = getTriangulation(points, lcache=lcache) # the triangulation only depends on the points
+    ndim = points.shape[1]
+    simplex = tri.find_simplex(xi)
+    rows = np.flatnonzero(simplex >= 0); simplex = simplex[rows] # -1: outside of convex hull
+    T = tri.transform[simplex] # affine transformation to barycentric coordinates
+    bary = np.einsum('ijk,ik->ij', T[:,:ndim,:], xi[rows] - T[:,ndim,:])
+    vals = np.concatenate((bary, 1. - bary.sum(axis=1, keepdims=True)), axis=1)
+    cols = tri.simplices[simplex]; rows = np.repeat(rows, ndim+1)
+  weights = sparse.csr_matrix((vals.ravel(),(rows,cols.ravel())), shape=shape, dtype=np.float64)
+  # N.B.: explicit zeros are retained, so that NaN's at triangle vertices propagate like in griddata
+  # cache weights
+  if lcache:
+    interp_cache[key] = weights
+    if filepath is not None:
+      sparse.save_npz(filepath, weights)
+      if lfeedback: print(("Saving interpolation weights to file '{:s}'".format(filepath)))
+  return weights
+
+def interpolatePoints(data, cvec, gvec, method='linear', fill_value=np.NaN, rescale=False, 
+                      lcache=True, folder=None, lfeedback=False):
+  ''' interpolate many fields of point data (fields x points) to a grid (fields x grid points) at once; 
+      linear and nearest-neighbour interpolation use a sparse weight matrix, cubic interpolation reuses 
+      the triangulation (only 2D); returns None, if the method/dimension is not supported '''
+  gce = len(cvec)
+  if isinstance(data, ma.MaskedArray): 
+    data = data.astype(np.float64).filled(np.NaN) # griddata does not support masks
+  if method in ('linear','nearest') and gce > 1:
+    weights = getInterpWeights(cvec, gvec, method=method, rescale=rescale, lcache=lcache, folder=folder, lfeedback=lfeedback)
+    grid_data = weights.dot(np.asarray(data, dtype=np.float64).T).T
+    grid_data[:,np.diff(weights.indptr) == 0] = fill_value # outside of convex hull
+  elif method == 'cubic' and gce == 2:
+    points, xi = pointCoordinates(cvec, gvec, rescale=rescale)
+    tri = getTriangulation(points, lcache=lcache)
+    interp = CloughTocher2DInterpolator(tri, np.asarray(data, dtype=np.float64).T, fill_value=fill_value)
+    grid_data = interp(xi).T
+  else: grid_data = None
+  return grid_data
+
+
 ## Variable class and derivatives 
 
 class Variable(object):
@@ -1544,9 +1657,14 @@ class Variable(object):
     return cvar
 
   def percentile(self, q=None, asVar=True, name=None, axis=None, axis_idx=None, lflatten=False,  
-                 lcheckVar=True, lcheckAxis=True, qaxatts=None, qvaratts=None, fillValue=None, **kwargs):
+                 lcheckVar=True, lcheckAxis=True, qaxatts=None, qvaratts=None, fillValue=None, 
+                 lstream=None, eps=0.01, chunksize=None, memory=1024, **kwargs):
     ''' Compute percentiles along a given axis and preserve the other axes. 
-        N.B.: this involves sorting the array and hence makes a full copy of the data '''
+        N.B.: the exact computation partitions a full copy of the data; alternatively, approximate
+              percentiles can be computed from streaming sketches (lstream=True), which read the data
+              in chunks along the percentile axis (e.g. from a NetCDF file); the rank error is bounded 
+              by 'eps' and missing values are ignored; the default (lstream=None) is to only stream 
+              data that are not loaded and larger than 'memory' (in MB) '''
     # some input checking
     if lflatten and axis is not None: raise ArgumentError
     if not lflatten and axis is None: 
@@ -1586,9 +1704,39 @@ class Variable(object):
     qcoord = np.asarray(q) # for percentile axis
     if qcoord.max() > 1 or qcoord.min() < 0: raise ValueError
     q = tuple(100.*qq for qq in q) # for percentile function
+    # decide whether to stream the data or to load everything
+    if lstream is None:
+      lstream = not self.data and np.prod(self.shape)*self.dtype.itemsize > memory*1024.**2
     # define functions that perform actual computation
     # N.B.: these "operations" will be called through the reduce method (see above for details)
-    if lflatten: # totally by-pass reduce()...
+    if lstream: # read chunks and update sketches; the data are never loaded completely
+      iax = 0 if lflatten else axis_idx
+      axlen = self.shape[iax]
+      npts = 1 if lflatten else int(np.prod(self.shape))//axlen
+      if chunksize is None: chunksize = max(1, int(64*1024.**2*axlen//(np.prod(self.shape)*8))) # ~64 MB
+      sketch = QuantileSketch(npts=npts, eps=eps, n=np.prod(self.shape)//npts)
+      slcs = [slice(None)]*self.ndim
+      for i in range(0, axlen, chunksize):
+        slcs[iax] = slice(i, min(i+chunksize,axlen))
+        data = self[tuple(slcs)]
+        if fillValue is not None and isinstance(data,np.ma.MaskedArray): data = data.filled(fillValue)
+        if lflatten: sketch.update(data.reshape((1,-1)), axis=-1)
+        else: sketch.update(data, axis=iax)
+      qdata = sketch.quantile(qcoord)
+      if lflatten: qdata = qdata.reshape(qcoord.shape)
+      else: 
+        qdata = qdata.reshape(self.shape[:iax]+self.shape[iax+1:]+qcoord.shape)
+        qdata = np.rollaxis(qdata, axis=self.ndim-1, start=iax) # move percentile axis into place
+      # create new Axis and Variable objects (same as reduce)
+      if asVar:
+        if lflatten: qvar = Variable(data=qdata, axes=(Axis(coord=qcoord, atts=axatts),), atts=varatts)
+        else:
+          raxatts = self.axes[iax].atts.copy(); raxatts.update(axatts)
+          axes = list(self.axes); axes[iax] = Axis(coord=qcoord, atts=raxatts)
+          vatts = self.atts.copy(); vatts.update(varatts)
+          qvar = self.copy(data=qdata, axes=axes, atts=vatts)
+      else: qvar = qdata
+    elif lflatten: # totally by-pass reduce()...
       # this is actually the default behavior of np.histogram()
       if self.masked: data = self.data_array.filled(fillValue)
       else: data = self.data_array
@@ -1598,12 +1746,9 @@ class Variable(object):
       if asVar: qvar = Variable(data=qdata, axes=(Axis(coord=qcoord, atts=axatts),), atts=varatts)
       else: qvar = qdata
     else: # use reduce to only apply to selected axis      
-      # create a helper function that apllies the histogram along the specified axis
+      # create a helper function that computes percentiles along the specified axis
       def qfct(data, axis=None):
-        if axis < 0: axis += data.ndim
-        fct = functools.partial(percentile, q=q, axis=axis)         
-        qdata = apply_along_axis(fct, axis, data, laax=False)
-        return qdata
+        return percentile(data, q=q, axis=axis) # np.percentile partitions along the axis
       # call reduce to perform operation
       axatts['coord'] = qcoord # reduce() reads this and uses it as new axis coordinates
       qvar = self.reduce(operation=qfct, blklen=len(q), blkidx=None, axis=axis, mode='all', 
@@ -1986,7 +2131,95 @@ class Variable(object):
   def seasonalMin(self, season='annual', **kwargs):
     ''' Return a time-series of annual averages of the specified season. '''    
     return self.reduceToAnnual(season=season, operation=nf.nanmin, **kwargs)
-  
+
+  def seasonalStatistics(self, stats, asVar=True, names=None, taxis='time', lwaterYear=False, year_offset=0,
+                         lcheckVar=True, lcheckAxis=True, taxatts=None, varatts=None, mean_list=None,
+                         ltrim=False, lstrict=True, lclim=False):
+    ''' Compute several annual time-series of seasonal statistics in one pass over the data; 'stats' is a
+        list of (season, operation) tuples, where operation is one of 'mean', 'sum', 'std', 'var', 'sem',
+        'max' or 'min' (as in seasonalMean etc.); all statistics are computed from a single reshaped
+        (years, 12) view of the data and moments are computed from shared sums and sums of squares
+        (of deviations from the long-term mean, for numerical stability); returns a list of Variables
+        (or arrays), in the order of 'stats'; the default names are '{name}_{season}_{operation}'. '''
+    if not self.hasAxis(taxis):
+      if lcheckAxis: raise AxisError('Seasonal reduction requires a time axis!')
+      else: return None # just skip and do nothing
+    if self.strvar or self.dtype.kind not in 'iuf':
+      if lcheckVar: raise VariableError("Seasonal reduction does not work with string Variables!")
+      else: return None
+    # check statistics
+    if isinstance(stats,tuple) and len(stats) == 2 and isinstance(stats[1],str): stats = [stats]
+    stats = [(season,op.lower()) for season,op in stats]
+    for season,op in stats:
+      if op not in ('mean','sum','std','var','sem','max','min'):
+        raise ArgumentError("Unknown seasonal statistic: '{}'".format(op))
+    if names is None:
+      names = ['{:s}_{:s}_{:s}'.format(self.name,str(season),op) for season,op in stats]
+    elif len(names) != len(stats): raise ArgumentError(names)
+    # hadling of exceptions: some variables in Datasets should only be averaged
+    if mean_list is not None and self.name in mean_list: stats = [(season,'mean') for season,op in stats]
+    # get view with complete years and reshape to (..., years, 12); this is done only once
+    if not self.data: self.load()
+    data_view, coord_view = self._getCompleteYears(taxis=taxis, lwaterYear=lwaterYear, year_offset=year_offset,
+                                                  ltrim=ltrim, asVar=False, lcheck=lstrict, lclim=lclim, lcoord=True)
+    taxis = self.getAxis(taxis); tax = self.axisIndex(taxis.name); nyr = data_view.shape[tax]//12
+    if isinstance(data_view,ma.MaskedArray): data = data_view.astype(np.float64).filled(np.NaN)
+    else: data = data_view.astype(np.float64)
+    data = np.moveaxis(data, tax, -1); data = data.reshape(data.shape[:-1]+(nyr,12))
+    valid = np.isfinite(data)
+    # shared sums, counts and sums of squares (deviations from the long-term mean)
+    lmoments = any(op not in ('max','min') for season,op in stats)
+    if lmoments:
+      with np.errstate(invalid='ignore', divide='ignore'):
+        shift = np.nansum(data, axis=(-2,-1)) / valid.sum(axis=(-2,-1))
+      shift[~np.isfinite(shift)] = 0; shift = shift[...,np.newaxis] # broadcast over years
+      dev = np.where(valid, data - shift[...,np.newaxis], 0.); sqr = dev**2
+    moments = dict() # cache moments of each season (season, count, sum, sum of squares)
+    # N.B.: data_view is the same for all statistics, so that all moments can be reused
+    results = []
+    with np.errstate(invalid='ignore', divide='ignore'):
+      for season,op in stats:
+        idx = translateSeasons(season); key = tuple(idx)
+        if op in ('max','min'):
+          sdata = np.where(valid[...,idx], data[...,idx], -np.inf if op == 'max' else np.inf)
+          rdata = sdata.max(axis=-1) if op == 'max' else sdata.min(axis=-1)
+          rdata[~np.isfinite(rdata)] = np.NaN # no valid values
+        else:
+          if key not in moments:
+            moments[key] = (valid[...,idx].sum(axis=-1), dev[...,idx].sum(axis=-1), sqr[...,idx].sum(axis=-1))
+          n, s, ss = moments[key]
+          if op == 'sum': rdata = s + n*shift
+          elif op == 'mean': rdata = shift + s/n
+          else:
+            var = np.maximum(ss/n - (s/n)**2, 0.)
+            if op == 'var': rdata = var
+            elif op == 'std': rdata = np.sqrt(var)
+            elif op == 'sem': rdata = np.sqrt(var/n)
+        # N.B.: results of integer variables are floating point
+        if self.dtype.kind == 'f': rdata = rdata.astype(self.dtype)
+        if self.masked: rdata = ma.masked_invalid(rdata, copy=False)
+        results.append(np.moveaxis(rdata, -1, tax))
+    assert all(rdata.shape == self.shape[:tax]+(nyr,)+self.shape[tax+1:] for rdata in results)
+    # create Variables with a common yearly time axis
+    if asVar:
+      tatts = taxis.atts.copy()
+      tatts['name'] = 'year'; tatts['units'] = 'year' # defaults
+      if taxatts is not None: tatts.update(taxatts)
+      coord = coord_view.reshape(nyr,12)[:,0].copy() # beginning of each year
+      if tatts['units'].lower() == 'year' and any([mu in taxis.units.lower() for mu in monthlyUnitsList]):
+        if taxis.coord[0]%12 == 1: coord = ( ( coord -1 ) // 12 ) + 1 # if we start counting at 1
+        else: coord = coord // 12 # just divide by 12, assuming we count from 0
+      yaxis = Axis(coord=coord, atts=tatts)
+      axes = self.axes[:tax]+(yaxis,)+self.axes[tax+1:]
+      newvars = []
+      for name,rdata in zip(names,results):
+        vatts = self.atts.copy(); vatts['name'] = name; vatts['units'] = self.units
+        if varatts is not None: vatts.update(varatts)
+        newvars.append(self.copy(data=rdata, axes=axes, atts=vatts, dtype=rdata.dtype))
+      results = newvars
+    # return list of results
+    return results
+
   def reduceToClimatology(self, operation, yridx=None, asVar=True, name=None, taxis='time', 
                           lcheckVar=True, lcheckAxis=True, checkUnits=True, taxatts=None, varatts=None, 
                           mean_list=None, ltrim=False, lstrict=True, **kwargs):
@@ -2261,8 +2494,10 @@ class Variable(object):
     return var
   
   def gridVar(self, point_axis=None, coord_vars=None, grid_axes=None, method='cubic', fill_value=np.NaN, 
-              rescale=None, asVar=True, lcheckAxis=True, lcheckVar=True):
-    ''' interpolate a one-dimensional point vector to a regular 2D grid '''
+              rescale=None, asVar=True, lcheckAxis=True, lcheckVar=True, lcache=True, folder=None, lfeedback=False):
+    ''' interpolate a one-dimensional point vector to a regular 2D grid; the triangulation and interpolation 
+        weights are computed only once and applied to all other dimensions (and cached for reuse; if a 
+        folder is given, weights are also saved to disk) '''
     # some eligibility checks
     if self.dtype.kind in ('S',): 
         if lcheckVar: 
@@ -2301,10 +2536,14 @@ class Variable(object):
         rshp = data.shape[:-1] # old shape of remaining dimensions
         re = data.size//pe
         data = data.reshape((re,pe)) # flatten other dimensions
-        # loop over dimensions
-        grid_data = np.zeros((re,)+gshp) # allocate new array
-        for i in range(re):
-            grid_data[i,:] = griddata(cvec, data[i,:], gvec, method=method, fill_value=fill_value, rescale=rescale) 
+        # interpolate all slices at once, using the same weights/triangulation
+        grid_data = interpolatePoints(data, cvec, gvec, method=method, fill_value=fill_value, rescale=bool(rescale), 
+                                      lcache=lcache, folder=folder, lfeedback=lfeedback)
+        if grid_data is None:
+            # loop over dimensions (fallback for methods without reusable weights)
+            grid_data = np.zeros((re,)+gshp) # allocate new array
+            for i in range(re):
+                grid_data[i,:] = griddata(cvec, data[i,:], gvec, method=method, fill_value=fill_value, rescale=rescale) 
         grid_data = grid_data.reshape(rshp+gshp) # return other dimensions to old shape
     # create new axes tuple and new variable
     if asVar: 
@@ -2425,6 +2664,9 @@ class Variable(object):
         return functools.partial(self._apply_ufunc, ufunc=ufunc)      
       else:
         raise AttributeError("The numpy function '{:s}' is not supported by class '{:s}'! (only ufunc's are supported)".format(attr,self.__class__.__name__))
+    elif attr.lower() == 'bkde': # binned KDE (not part of scipy.stats)
+      from geodata.stats import asDistVar
+      return functools.partial(asDistVar, self, dist=attr)
     elif hasattr(ss,attr): # either a distribution or a statistical test
       dist = getattr(ss, attr)
       if isinstance(dist,ss.rv_discrete):
@@ -3373,8 +3615,10 @@ class Dataset(object):
       var.load(fillValue=fillValue, **kwargs)
       
   def gridDataset(self, grid_axes=None, dsatts=None, method='cubic', fill_value=np.NaN, rescale=None,
-                  asVar=True, lcheckAxis=True, lcheckVar=True, deepcopy=False, coord_map=None):
-    ''' a wrapper for gridVar, which infers the point Axis and axes variables from the Dataset '''
+                  asVar=True, lcheckAxis=True, lcheckVar=True, deepcopy=False, coord_map=None, 
+                  lcache=True, folder=None, lfeedback=False):
+    ''' a wrapper for gridVar, which infers the point Axis and axes variables from the Dataset; 
+        interpolation weights are computed once and reused for all variables '''
     # check axes
     point_axis = None; coord_vars = []
     for ax in grid_axes:
@@ -3395,7 +3639,8 @@ class Dataset(object):
             newvars[varname] = var.gridVar(point_axis=point_axis, coord_vars=tuple(coord_vars), 
                                            grid_axes=grid_axes, 
                                            method=method, fill_value=fill_value, rescale=rescale, 
-                                           asVar=asVar, lcheckAxis=lcheckAxis, lcheckVar=lcheckVar)
+                                           asVar=asVar, lcheckAxis=lcheckAxis, lcheckVar=lcheckVar,
+                                           lcache=lcache, folder=folder, lfeedback=lfeedback)
         else:
             newvars[varname] = var.copy(deepcopy=deepcopy) # variables that are just copies
     # create new dataset with regridded and old variables
@@ -3427,6 +3672,24 @@ class Dataset(object):
     # return new dataset
     return newset
 
+  def seasonalStatistics(self, stats, varlist=None, copyother=False, deepcopy=False, dsatts=None,
+                         lcheckVar=False, lcheckAxis=False, **kwargs):
+    ''' Compute several seasonal statistics for all Variables in one pass over the data of each Variable
+        (see Variable.seasonalStatistics); returns a new Dataset with all results and a common yearly
+        time axis; Variables without time axis are only copied, if 'copyother' is True. '''
+    if varlist is None: varlist = list(self.variables.keys())
+    newvars = []
+    for varname in varlist:
+      var = self.variables[varname]
+      ldata = var.data # whether data was pre-loaded
+      results = var.seasonalStatistics(stats, asVar=True, lcheckVar=lcheckVar, lcheckAxis=lcheckAxis, **kwargs)
+      if results is not None: newvars.extend(results)
+      elif copyother: newvars.append(var.copy(deepcopy=deepcopy))
+      if not ldata and results is not None: var.unload() # data are no longer needed
+    # assemble new dataset (the yearly axis of the first Variable is used by all Variables)
+    atts = self.atts.copy() if dsatts is None else dsatts
+    return Dataset(varlist=newvars, atts=atts)
+
   def __getattr__(self, attr):
     ''' if the call is a Variable method that is not provided by Dataset, call the Variable method
         on all Variables using _apply_to_all '''
@@ -3683,6 +3946,8 @@ class Ensemble(object):
   idkey     = 'name'  # property of members used for unique identification
   ens_name  = ''      # name of the ensemble
   ens_title = ''      # printable title used for the ensemble
+  executor  = None    # execution policy for member methods: None (serial), 'thread', or 'process'
+  max_workers = None  # concurrency limit for thread/process pools (default: number of CPUs)
   
   def __init__(self, *members, **kwargs):
     ''' Initialize an ensemble from a list of members (the list arguments);
@@ -3695,12 +3960,19 @@ class Ensemble(object):
     idkey        = property of members used for unique identification
     ens_name     = name of the ensemble (string)
     ens_title    = printable title used for the ensemble (string)
+    executor     = execution policy for member methods: None (serial), 'thread' (for I/O-bound 
+                   methods), or 'process' (for compute-bound methods that return new objects)
+    max_workers  = concurrency limit for thread/process pools (default: number of CPUs)
     '''
     # add members
     self.members = list(members)
     # add certain properties
     self.ens_name = kwargs.pop('name','')
     self.ens_title = kwargs.pop('title','')
+    self.executor = kwargs.pop('executor',None)
+    if self.executor not in (None,'thread','process'): 
+      raise ArgumentError("Unknown executor '{}' (use None, 'thread', or 'process').".format(self.executor))
+    self.max_workers = kwargs.pop('max_workers',None)
     # no need to be too restrictive
     if 'basetype' in kwargs:
       self.basetype = kwargs.pop('basetype') # don't want to add that later! 
@@ -3732,7 +4004,7 @@ class Ensemble(object):
     elif all([not callable(f) and not isinstance(f, (Variable,Dataset)) for f in fs]): return fs  
     elif all([isinstance(f, (Variable,Dataset)) for f in fs]):
       # N.B.: technically, Variable instances are callable, but that's not what we want here...
-      ens_args = dict(name=self.ens_name, title=self.ens_title)
+      ens_args = dict(name=self.ens_name, title=self.ens_title, executor=self.executor, max_workers=self.max_workers)
       if all([isinstance(f, Axis) for f in fs]): 
         return fs
       # N.B.: axes are often shared, so we can't have an ensemble
@@ -3756,6 +4028,29 @@ class Ensemble(object):
       else:
         raise TypeError("Resulting Ensemble members have inconsisent type.")
   
+  def _executeConcurrent(self, fs, argslists, kwargs, executor='thread', max_workers=None):
+    ''' internal helper method to execute member methods in a thread or process pool; results are 
+        returned in member order and exceptions from all members are collected and raised together '''
+    if executor == 'thread': Pool = ThreadPoolExecutor
+    elif executor == 'process': Pool = ProcessPoolExecutor
+    else: raise ArgumentError("Unknown executor '{}' (use None, 'thread', or 'process').".format(executor))
+    # N.B.: in a process pool members are pickled, so that in-place operations (e.g. load) 
+    #       only affect the copies in the worker processes; use threads for these
+    if len(fs) == 0: return []
+    max_workers = max(1,min(len(fs), max_workers or os.cpu_count() or 1))
+    with Pool(max_workers=max_workers) as pool:
+      futures = [pool.submit(f, *args, **kwargs) for args,f in zip(argslists,fs)]
+      res = []; errors = []
+      for member,future in zip(self.members,futures):
+        try: res.append(future.result())
+        except Exception as err: 
+          res.append(None); errors.append((getattr(member,self.idkey),err))
+    if errors:
+      msg = "{:d} of {:d} Ensemble members failed:\n".format(len(errors),len(fs))
+      msg += '\n'.join("  {:s}: {:s}".format(str(memid),repr(err)) for memid,err in errors)
+      raise EnsembleError(msg) from errors[0][1]
+    return res
+  
   def __call__(self, *args, **kwargs):
     ''' Overloading the call method allows coordinate slicing on Ensembles. '''
     return self.__getattr__('slicing')(*args, **kwargs)
@@ -3770,6 +4065,9 @@ class Ensemble(object):
     if all([callable(f) and not isinstance(f, (Variable,Dataset)) for f in fs]):
       # for callable objects, return a wrapper that can read argument lists      
       def wrapper( *args, **kwargs):
+        # execution policy can be overridden for individual calls
+        executor = kwargs.pop('ens_executor', self.executor)
+        max_workers = kwargs.pop('ens_workers', self.max_workers)
         # either distribute args or give the same to everyone
         lens = len(self)
         if all([len(arg)==lens and isinstance(arg,(tuple,list,Ensemble)) for arg in args]):
@@ -3777,9 +4075,12 @@ class Ensemble(object):
           for arg in args: # swap nested list order ("transpose") 
             for i in range(len(argslists)): 
               argslists[i].append(arg[i])
+        else:
+          argslists = [args]*lens
+        if executor is None:
           res = [f(*args, **kwargs) for args,f in zip(argslists,fs)]
         else:
-          res = [f(*args, **kwargs) for f in fs]
+          res = self._executeConcurrent(fs, argslists, kwargs, executor=executor, max_workers=max_workers)
         return self._recastList(res) # code is reused, hens pulled out
       # return function wrapper
       return wrapper
@@ -12,9 +12,11 @@ and methods to an existing object/class instance.
 
 import numpy as np
 import numpy.ma as ma
+import scipy.sparse as sparse
 from collections import OrderedDict
 import types  # needed to bind functions to objects
 import os, gzip # griddef pickles compress well
+import hashlib
 import pickle
 
 
@@ -367,7 +369,217 @@ def gdalInterp(interpolation):
   elif interpolation == 'cubicspline': gdal_interp = gdal.GRA_CubicSpline # cubic spline
   else: raise GDALError('Unknown interpolation method: %s'%interpolation)
   return gdal_interp
-         
+
+def interpName(gdal_interp):
+  ''' the inverse of gdalInterp: return the name of a GDAL interpolation method '''
+  for interpolation in ('bilinear','nearest','lanczos','convolution','cubicspline'):
+    if gdalInterp(interpolation) == gdal_interp: return interpolation
+  raise GDALError('Unknown interpolation method: %s'%gdal_interp)
+
+
+## regridding weights
+regrid_weights = '{0:s}_{1:s}_{2:s}_wrap{3:d}{4:d}_{5:s}_weights.npz' # file pattern for cached regridding weights
+interp_radius = dict(nearest=1, bilinear=1, convolution=2, cubicspline=2, lanczos=3) # kernel radius in source cells
+regrid_cache = dict() # in-memory cache of regridding weights for the current session
+
+def getRegridWeights(srcgrd, tgtgrd, interpolation='bilinear', lwrapSrc=False, lwrapTgt=False, lcache=True, 
+                     folder=None, memory=500, lfeedback=False):
+  ''' Return a sparse matrix of interpolation weights (target x source grid cells, both flattened as (y,x)) 
+      that reproduces gdal.ReprojectImage for a given pair of GridDefinitions and interpolation method; 
+      the weights are derived by reprojecting arrays of impulses, which are spaced sufficiently far apart, 
+      so that the footprint of each target cell can be attributed to exactly one impulse. Weights are cached 
+      in memory and, if both grids have names, saved to/loaded from the grid folder. 'memory' limits the 
+      size (in MB) of the impulse arrays that are reprojected at once. '''
+  if srcgrd.__class__.__name__ != GridDefinition.__name__: raise TypeError(srcgrd)
+  if tgtgrd.__class__.__name__ != GridDefinition.__name__: raise TypeError(tgtgrd)
+  if not isinstance(interpolation,str): interpolation = interpName(interpolation)
+  gdal_interp = gdalInterp(interpolation)
+  sye = len(srcgrd.ylat); sxe = len(srcgrd.xlon); tye = len(tgtgrd.ylat); txe = len(tgtgrd.xlon)
+  shape = (tye*txe,sye*sxe)
+  # check in-memory cache first
+  key = tuple( (tuple(grd.geotransform), tuple(grd.size), grd.projection.ExportToWkt()) for grd in (srcgrd,tgtgrd) )
+  key += (interpolation, lwrapSrc, lwrapTgt)
+  if lcache and key in regrid_cache: return regrid_cache[key]
+  # check for cached weights on disk (only possible, if both grids are named)
+  filepath = None 
+  if lcache and srcgrd.name and tgtgrd.name:
+    # N.B.: wrap flags and a checksum of both grid geometries are part of the name, so that weights are not 
+    #       reused for different grids with the same name or size
+    checksum = hashlib.sha1((gridChecksum(srcgrd)+gridChecksum(tgtgrd)).encode()).hexdigest()[:16]
+    filename = regrid_weights.format(srcgrd.name,tgtgrd.name,interpolation,int(lwrapSrc),int(lwrapTgt),checksum)
+    filepath = '{0:s}/{1:s}'.format(grid_folder if folder is None else folder,filename)
+    if os.path.exists(filepath):
+      weights = sparse.load_npz(filepath).tocsr()
+      if weights.shape == shape: 
+        if lfeedback: print(("Loading regridding weights from file '{:s}'".format(filepath)))
+        regrid_cache[key] = weights
+        return weights
+      elif lfeedback: print(("Regridding weights in file '{:s}' do not match grids - recomputing".format(filepath)))
+  # helper function to reproject a stack of source fields to the target grid using GDAL
+  def reproject(data, gdal_interp, fillValue):
+    band = Axis(name='band', units='', coord=np.arange(data.shape[0]))
+    srcvar = Variable(name='weights', units='', axes=(band,srcgrd.ylat,srcgrd.xlon), data=data)
+    srcvar = addGDALtoVar(srcvar, griddef=srcgrd)
+    tgtvar = Variable(name='weights', units='', axes=(band,tgtgrd.ylat,tgtgrd.xlon), dtype=data.dtype)
+    tgtvar = addGDALtoVar(tgtvar, griddef=tgtgrd)
+    srcdata = srcvar.getGDAL(load=True, wrap360=lwrapSrc)
+    tgtdata = tgtvar.getGDAL(load=False, wrap360=lwrapTgt, allocate=True, fillValue=fillValue)
+    err = gdal.ReprojectImage(srcdata, tgtdata, srcgrd.projection.ExportToWkt(), tgtgrd.projection.ExportToWkt(), gdal_interp)
+    if err != 0: raise GDALError('ERROR CODE {:}'.format(err))
+    tgtvar.loadGDAL(tgtdata, mask=False, wrap360=lwrapTgt)
+    return tgtvar.data_array.reshape((data.shape[0],tye*txe))
+  # source cell (indices) that contains each target cell; -1 outside of the source domain
+  iy,ix = np.meshgrid(np.arange(sye, dtype=np.float64), np.arange(sxe, dtype=np.float64), indexing='ij')
+  index = np.round(reproject(np.stack((iy,ix)), gdalInterp('nearest'), -1.)).astype(np.int64)
+  tiy = index[0]; tix = index[1]; linside = np.logical_and(tiy >= 0, tix >= 0)
+  if interpolation == 'nearest':
+    # trivial case: every target cell gets the value of the source cell it falls into
+    rows = np.flatnonzero(linside); cols = tiy[rows]*sxe + tix[rows]; vals = np.ones(rows.shape)
+  else:
+    # impulse spacing has to exceed the (possibly down-scaled) kernel footprint
+    if tgtgrd.scale and srcgrd.scale: ratio = max(1., abs(tgtgrd.scale/srcgrd.scale))
+    else: ratio = 1. # N.B.: scale is not defined for all grids; assume similar resolution
+    spacing = 2*int(np.ceil(interp_radius[interpolation]*ratio)) + 2
+    offsets = [(a,b) for a in range(spacing) for b in range(spacing)]
+    nbands = max(1, int( memory*1024.**2 / ( 8. * ( sye*sxe + tye*txe ) ) ))
+    rows = []; cols = []; vals = []
+    for n in range(0,len(offsets),nbands):
+      batch = offsets[n:n+nbands]
+      impulses = np.zeros((len(batch),sye,sxe), dtype=np.float64)
+      for i,(a,b) in enumerate(batch): impulses[i,a::spacing,b::spacing] = 1.
+      response = reproject(impulses, gdal_interp, 0.)
+      del impulses
+      for i,(a,b) in enumerate(batch):
+        idx = np.flatnonzero(np.logical_and(response[i] != 0, linside))
+        # attribute response to the nearest impulse (within the source domain)
+        cy = a + spacing*np.round((tiy[idx]-a)/float(spacing)).astype(np.int64)
+        cy[cy < 0] += spacing; cy[cy >= sye] -= spacing
+        cx = b + spacing*np.round((tix[idx]-b)/float(spacing)).astype(np.int64)
+        cx[cx < 0] += spacing; cx[cx >= sxe] -= spacing
+        lvalid = np.logical_and(np.logical_and(cy >= 0, cy < sye), np.logical_and(cx >= 0, cx < sxe))
+        rows.append(idx[lvalid]); cols.append(cy[lvalid]*sxe + cx[lvalid]); vals.append(response[i,idx[lvalid]])
+      if lfeedback: print(("Computed regridding weights for {:d} of {:d} impulse offsets".format(min(n+nbands,len(offsets)),len(offsets))))
+    rows = np.concatenate(rows); cols = np.concatenate(cols); vals = np.concatenate(vals)
+  weights = sparse.csr_matrix((vals,(rows,cols)), shape=shape, dtype=np.float64)
+  # cache weights
+  if lcache:
+    regrid_cache[key] = weights
+    if filepath is not None:
+      sparse.save_npz(filepath, weights)
+      if lfeedback: print(("Saving regridding weights to file '{:s}'".format(filepath)))
+  # return sparse matrix
+  return weights
+
+
+## station locator (grid cells that are closest to point locations)
+station_indices = '{0:s}_{1:s}_{2:d}_stations.npz' # file pattern for cached station indices
+station_neighbours = 4 # number of nearest grid cells considered for elevation correction
+locator_cache = dict() # in-memory cache of StationLocator instances (by grid checksum)
+
+def transformPoints(lons, lats, projection):
+  ''' transform arrays of geographic (WGS84 lon/lat) coordinates to the coordinate system of 'projection',
+      using a single (batched) call to GDAL; returns arrays of x and y coordinates '''
+  latlon = osr.SpatialReference()
+  latlon.SetWellKnownGeogCS('WGS84') # a normal lat/lon coordinate system
+  tx = osr.CoordinateTransformation(latlon,projection)
+  points = np.stack((np.asarray(lons, dtype=np.float64).ravel(),np.asarray(lats, dtype=np.float64).ravel()), axis=1)
+  points = np.asarray(tx.TransformPoints(points), dtype=np.float64).reshape((len(points),-1))
+  # N.B.: GDAL does not understand numpy scalar types, but (N,2) float64 arrays are fine
+  return points[:,0], points[:,1]
+
+def stationChecksum(lons, lats):
+  ''' a short checksum that identifies a list of stations (based on their coordinates) '''
+  sha = hashlib.sha1()
+  for coord in (lons,lats): sha.update(np.ascontiguousarray(coord, dtype=np.float64).tobytes())
+  return sha.hexdigest()[:16]
+
+class StationLocator(object):
+  '''
+    A spatial index (KD-tree) of the cell centers of a grid (in native coordinates), which locates the
+    nearest (or k nearest) grid cells of many stations at once; the resulting index arrays are cached
+    for each list of stations (in memory and, for named grids, on disk).
+  '''
+
+  def __init__(self, griddef=None, xlon=None, ylat=None):
+    ''' initialize from a GridDefinition; the x/lon and y/lat axes can be overridden (e.g. dataset axes) '''
+    if griddef.__class__.__name__ != GridDefinition.__name__: raise TypeError(griddef)
+    self.griddef = griddef
+    self.xlon = griddef.xlon if xlon is None else xlon
+    self.ylat = griddef.ylat if ylat is None else ylat
+    self.xcoord = np.asarray(self.xlon.coord, dtype=np.float64)
+    self.ycoord = np.asarray(self.ylat.coord, dtype=np.float64)
+    sha = hashlib.sha1(griddef.projection.ExportToWkt().encode())
+    for coord in (self.xcoord,self.ycoord): sha.update(coord.tobytes())
+    self.checksum = sha.hexdigest()[:16] # identifies projection and coordinates
+    self._tree = None # constructed on demand
+    self.indices = dict() # cached station indices for this grid
+
+  @property
+  def tree(self):
+    ''' KD-tree of grid cell centers (flattened in (y,x) order) '''
+    if self._tree is None:
+      from scipy.spatial import cKDTree
+      x2D, y2D = np.meshgrid(self.xcoord, self.ycoord)
+      self._tree = cKDTree(np.stack((x2D.ravel(),y2D.ravel()), axis=1))
+    return self._tree
+
+  def transform(self, lons, lats):
+    ''' transform geographic station coordinates to native grid coordinates '''
+    lons = np.asarray(lons, dtype=np.float64); lats = np.asarray(lats, dtype=np.float64)
+    if self.griddef.isProjected:
+      if lons.size > 0 and lons.max() > 180.: lons = np.where(lons > 180., lons - 360., lons)
+      lons, lats = transformPoints(lons, lats, self.griddef.projection)
+    elif lons.size > 0:
+      if lons.min() < 0. and self.xcoord.max() > 180.: lons = np.where(lons < 0., lons + 360., lons)
+      elif lons.max() > 180. and self.xcoord.min() < 0.: lons = np.where(lons > 180., lons - 360., lons)
+    return lons, lats
+
+  def query(self, lons, lats, k=1, lcache=True, folder=None, lfeedback=False):
+    ''' return the x/lon and y/lat indices of the k nearest grid cells of each station (as (stations,k)
+        arrays, sorted by distance) and a boolean array indicating whether a station is within the
+        bounds of the grid (indices of stations outside the grid are not meaningful) '''
+    lons = np.asarray(lons, dtype=np.float64).ravel(); lats = np.asarray(lats, dtype=np.float64).ravel()
+    if lons.shape != lats.shape: raise AxisError("Station coordinate arrays do not match: {} != {}".format(lons.shape,lats.shape))
+    key = (stationChecksum(lons,lats), int(k))
+    if lcache and key in self.indices: return self.indices[key]
+    # check for cached indices on disk (only possible, if the grid is named)
+    filepath = None
+    if lcache and self.griddef.name:
+      filename = station_indices.format(self.griddef.name,key[0],key[1])
+      filepath = '{0:s}/{1:s}'.format(grid_folder if folder is None else folder,filename)
+      if os.path.exists(filepath):
+        with np.load(filepath) as npz:
+          if str(npz['grid']) == self.checksum:
+            if lfeedback: print(("Loading station indices from file '{:s}'".format(filepath)))
+            self.indices[key] = ( npz['ix'], npz['iy'], npz['lvalid'] )
+            return self.indices[key]
+        if lfeedback: print(("Station indices in file '{:s}' do not match grid - recomputing".format(filepath)))
+    # transform all stations at once and find nearest grid cells
+    xs, ys = self.transform(lons, lats)
+    lvalid = np.logical_and(np.logical_and(xs >= self.xcoord.min(), xs <= self.xcoord.max()),
+                            np.logical_and(ys >= self.ycoord.min(), ys <= self.ycoord.max()))
+    # N.B.: consistent with Axis.getIndex(..., outOfBounds=True), stations outside the grid are invalid
+    k = min(int(k), len(self.xcoord)*len(self.ycoord))
+    points = np.stack((np.where(lvalid, xs, self.xcoord[0]),np.where(lvalid, ys, self.ycoord[0])), axis=1)
+    if len(points) > 0: idx = self.tree.query(points, k=k)[1]
+    else: idx = np.zeros((0,k), dtype=np.int64)
+    idx = np.asarray(idx, dtype=np.int64).reshape((len(points),k))
+    iy, ix = np.divmod(idx, len(self.xcoord))
+    indices = (ix, iy, lvalid)
+    # cache indices
+    if lcache:
+      self.indices[key] = indices
+      if filepath is not None:
+        np.savez_compressed(filepath, ix=ix, iy=iy, lvalid=lvalid, grid=self.checksum)
+        if lfeedback: print(("Saving station indices to file '{:s}'".format(filepath)))
+    return indices
+
+def getStationLocator(griddef=None, xlon=None, ylat=None, lcache=True):
+  ''' return a StationLocator for a grid, reusing existing instances (and their KD-trees and indices) '''
+  locator = StationLocator(griddef=griddef, xlon=xlon, ylat=ylat)
+  if lcache: locator = locator_cache.setdefault(locator.checksum, locator)
+  return locator
+
 
 def getProjFromDict(projdict, name='', GeoCS='WGS84', convention='Proj4'):
   ''' Initialize a projected OSR SpatialReference instance from a dictionary using Proj4 conventions. 
@@ -1270,6 +1482,111 @@ def addGDALtoDataset(dataset, griddef=None, projection=None, geotransform=None,
   
 
 ## shapefile contianer class
+## rasterized shape masks (cached in memory and on disk)
+
+mask_folder = grid_folder + '/masks/' # folder for cached shape masks
+shape_masks = '{0:s}_{1:d}_{2:s}_{3:s}_mask.npz' # file pattern for cached shape masks
+shape_subgrid = 5 # default number of sub-cells (per dimension) used to compute fractional coverage 
+mask_cache = dict() # in-memory cache of shape masks for the current session
+
+def gridChecksum(griddef):
+  ''' a short checksum that identifies a grid (based on projection, geotransform and size) '''
+  if griddef.__class__.__name__ != GridDefinition.__name__: raise TypeError(griddef)
+  key = '{:s}|{:s}|{:s}'.format(griddef.projection.ExportToWkt(), repr(tuple(float(g) for g in griddef.geotransform)), 
+                                repr(tuple(int(s) for s in griddef.size)))
+  return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def burnLayer(shp_lyr, geotransform=None, size=None, projection=None, inside=1, outside=0, lalltouched=False, name='mask'):
+  ''' "burn" an OGR layer onto a raster with the given geotransform, size (x,y) and projection; returns 
+      a 2D (y,x) array of type uint8; if lalltouched is True, all cells touched by the shape are burned, 
+      otherwise only cells with centers inside the shape '''
+  msk_ds = ramdrv.Create(name, int(size[0]), int(size[1]), 1, gdal.GDT_Byte)
+  # N.B.: this is a special case: only one band (1) and always boolean (gdal.GDT_Byte)
+  msk_ds.SetGeoTransform(geotransform)
+  msk_ds.SetProjection(projection.ExportToWkt())
+  # initialize raster band        
+  msk_rst = msk_ds.GetRasterBand(1) # only one anyway...
+  msk_rst.Fill(outside); msk_rst.SetNoDataValue(outside) # fill with zeros
+  # burn shape layer onto raster band
+  options = ['ALL_TOUCHED=TRUE'] if lalltouched else []
+  err = gdal.RasterizeLayer(msk_ds, [1], shp_lyr, burn_values=[inside], options=options)
+  if err != 0: raise GDALError('ERROR CODE %i'%err)
+  # retrieve mask array from raster band
+  return msk_ds.GetRasterBand(1).ReadAsArray()
+
+class ShapeMask(object):
+  ''' 
+    A shape rasterized on a grid, stored in a compact sparse format: the flattened (y,x) indices of grid 
+    cells with centers inside the shape (the binary mask) and the indices and fractional coverage of 
+    all cells that overlap with the shape. 
+  '''
+  
+  def __init__(self, mapshape, index, frac_index, frac, subgrid=None):
+    ''' initialize from sparse representation; mapshape is the (y,x) shape of the grid '''
+    self.mapshape = tuple(int(n) for n in mapshape)
+    self.index = np.asarray(index, dtype=np.int64)
+    self.frac_index = np.asarray(frac_index, dtype=np.int64)
+    self.frac = np.asarray(frac, dtype=np.float32)
+    if self.frac_index.shape != self.frac.shape: raise AxisError(self.frac.shape)
+    self.subgrid = subgrid
+    
+  def getMask(self, invert=False):
+    ''' return binary mask as 2D (y,x) boolean array (True inside the shape, unless inverted) '''
+    mask = np.zeros(self.mapshape[0]*self.mapshape[1], dtype=np.bool_)
+    mask[self.index] = True
+    if invert: np.logical_not(mask, out=mask)
+    return mask.reshape(self.mapshape)
+    
+  def getFraction(self):
+    ''' return fractional coverage as 2D (y,x) float array (zero outside the shape) '''
+    frac = np.zeros(self.mapshape[0]*self.mapshape[1], dtype=np.float32)
+    frac[self.frac_index] = self.frac
+    return frac.reshape(self.mapshape)
+  
+  def save(self, filepath):
+    ''' save sparse representation to a compressed npz file '''
+    np.savez_compressed(filepath, mapshape=np.asarray(self.mapshape), index=self.index, 
+                        frac_index=self.frac_index, frac=self.frac, subgrid=self.subgrid or 0)
+  
+  @classmethod
+  def load(cls, filepath):
+    ''' load sparse representation from a npz file '''
+    with np.load(filepath) as npz:
+      return cls(mapshape=npz['mapshape'], index=npz['index'], frac_index=npz['frac_index'], 
+                 frac=npz['frac'], subgrid=int(npz['subgrid']) or None)
+
+def rasterizeShape(shp_lyr, griddef=None, subgrid=None, memory=64, name='mask'):
+  ''' rasterize an OGR layer on a grid and compute fractional coverage by burning the layer on a finer 
+      grid with subgrid x subgrid sub-cells per cell; only the window of cells that are touched by the 
+      shape is refined, in strips of approximately 'memory' MB; returns a ShapeMask '''
+  if subgrid is None: subgrid = shape_subgrid
+  ye, xe = griddef.size[1], griddef.size[0]
+  gt = griddef.geotransform
+  # binary mask (cell centers inside the shape)
+  mask = burnLayer(shp_lyr, geotransform=gt, size=griddef.size, projection=griddef.projection, name=name)
+  index = np.flatnonzero(mask)
+  # cells that are touched by the shape
+  touched = burnLayer(shp_lyr, geotransform=gt, size=griddef.size, projection=griddef.projection, 
+                      lalltouched=True, name=name)
+  rows = np.flatnonzero(touched.any(axis=1)); cols = np.flatnonzero(touched.any(axis=0))
+  frac_index = []; frac = []
+  if len(rows) > 0:
+    r0, r1 = rows[0], rows[-1]+1; c0, c1 = cols[0], cols[-1]+1
+    nr = max(1, int( memory*1024.**2 / ( (c1-c0)*subgrid**2 ) )) # rows per strip
+    for rs in range(r0,r1,nr):
+      re = min(rs+nr,r1)
+      # refined geotransform for the window
+      sgt = (gt[0]+c0*gt[1]+rs*gt[2], gt[1]/subgrid, gt[2]/subgrid, gt[3]+c0*gt[4]+rs*gt[5], gt[4]/subgrid, gt[5]/subgrid)
+      sub = burnLayer(shp_lyr, geotransform=sgt, size=((c1-c0)*subgrid,(re-rs)*subgrid), 
+                      projection=griddef.projection, name=name)
+      sub = sub.reshape((re-rs,subgrid,c1-c0,subgrid)).mean(axis=(1,3))
+      iy, ix = np.nonzero(sub)
+      frac_index.append((iy+rs)*xe + ix+c0); frac.append(sub[iy,ix])
+  if frac_index: 
+    frac_index = np.concatenate(frac_index); frac = np.concatenate(frac)
+  return ShapeMask(mapshape=(ye,xe), index=index, frac_index=frac_index, frac=frac, subgrid=subgrid)
+
+  
 class Shape(object):
   ''' A wrapper class for shapefiles, with some added functionality and raster interface '''
   
@@ -1299,6 +1616,7 @@ class Shape(object):
     self.shapetype = shapetype # for specific types of shapes, e.g. Basin, Lake, Prov, Natl
     # load shapefile (or not)
     self._ogr = ogr.Open(shapefile) if load else None
+    self._checksum = None # computed when needed
   
   @property
   def OGR(self):
@@ -1315,35 +1633,66 @@ class Shape(object):
     ''' return a layer from the shapefile '''
     return self.OGR.GetLayer(layer) # get shape layer
     
+  def checksum(self):
+    ''' a checksum of the shapefile (used to identify cached masks) '''
+    if getattr(self,'_checksum',None) is None:
+      sha1 = hashlib.sha1()
+      with open(self.shapefile, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''): sha1.update(block)
+      self._checksum = sha1.hexdigest()[:16]
+    return self._checksum
+  
+  def getShapeMask(self, griddef=None, layer=0, subgrid=None, lcache=True, folder=None, lfeedback=False):
+    ''' return a ShapeMask with binary mask and fractional coverage on the given grid; masks are cached 
+        in memory and on disk (keyed by shapefile checksum, layer and grid) and only loaded when needed '''
+    if griddef.__class__.__name__ != GridDefinition.__name__: raise TypeError 
+    if subgrid is None: subgrid = shape_subgrid
+    key = (self.checksum(), layer, gridChecksum(griddef), subgrid)
+    if lcache and key in mask_cache: return mask_cache[key]
+    # check for cached mask on disk
+    if folder is None: folder = mask_folder
+    filename = shape_masks.format(self.name, layer, griddef.name or 'grid', 
+                                  hashlib.sha1(repr(key).encode()).hexdigest()[:16])
+    filepath = '{0:s}/{1:s}'.format(folder,filename)
+    if lcache and os.path.exists(filepath):
+      if lfeedback: print(("Loading shape mask from file '{:s}'".format(filepath)))
+      shpmask = ShapeMask.load(filepath)
+    else:
+      # rasterize shape and save mask
+      shpmask = rasterizeShape(self.getLayer(layer), griddef=griddef, subgrid=subgrid, name=self.name)
+      if lcache:
+        try:
+          if not os.path.exists(folder): os.makedirs(folder)
+          shpmask.save(filepath)
+          if lfeedback: print(("Saving shape mask to file '{:s}'".format(filepath)))
+        except (IOError,OSError): pass # e.g. read-only grid folder; the mask is only cached in memory
+    if lcache: mask_cache[key] = shpmask
+    return shpmask
+  
+  def getFraction(self, griddef=None, layer=0, subgrid=None, lcache=True):
+    ''' return fractional coverage of grid cells by the shape as 2D float array '''
+    return self.getShapeMask(griddef=griddef, layer=layer, subgrid=subgrid, lcache=lcache).getFraction()
+    
   # rasterize shapefiles
-  def rasterize(self, griddef=None, layer=0, invert=False, asVar=False, ldebug=False):
-    ''' "burn" shapefile on a 2D raster; returns a 2D boolean array '''
+  def rasterize(self, griddef=None, layer=0, invert=False, asVar=False, ldebug=False, lcache=False):
+    ''' "burn" shapefile on a 2D raster; returns a 2D boolean array (if lcache is True, cached masks from
+        getShapeMask are used, which also computes fractional coverage and writes mask files) '''
     if griddef.__class__.__name__ != GridDefinition.__name__: raise TypeError 
     #if not isinstance(griddef,GridDefinition): raise TypeError # this is always False. probably due to pickling
-    if not isinstance(invert,(bool,np.bool)): raise TypeError
+    if not isinstance(invert,(bool,np.bool_)): raise TypeError
     # fill values
     if invert: inside, outside = 0,1
     else: inside, outside = 1,0
-    shp_lyr = self.getLayer(layer) # get shape layer
-    # create raster to burn shape onto
-    if ldebug: print(' - creating raster')
-    msk_ds = ramdrv.Create(self.name, griddef.size[0], griddef.size[1], 1, gdal.GDT_Byte)
-    # N.B.: this is a special case: only one band (1) and always boolean (gdal.GDT_Byte)
-    # set projection parameters
-    msk_ds.SetGeoTransform(griddef.geotransform)  # does the order matter?
-    msk_ds.SetProjection(griddef.projection.ExportToWkt())  # is .ExportToWkt() necessary?
-    # initialize raster band        
-    msk_rst = msk_ds.GetRasterBand(1) # only one anyway...
-    msk_rst.Fill(outside); msk_rst.SetNoDataValue(outside) # fill with zeros
-    # burn shape layer onto raster band
-    if ldebug: print(' - burning layer to raster')
-    err = gdal.RasterizeLayer(msk_ds, [1], shp_lyr, burn_values = [inside]) # None, None, [1] # burn_value = 1
-    # use argument ['ALL_TOUCHED=TRUE'] like so: None, None, [1], ['ALL_TOUCHED=TRUE']
-    if err != 0: raise GDALError('ERROR CODE %i'%err)
-    #msk_ds.FlushCash()  
-    # retrieve mask array from raster band
-    if ldebug: print(' - retrieving mask')
-    mask = msk_ds.GetRasterBand(1).ReadAsArray()
+    if lcache:
+      # use cached mask (cell centers inside shape)
+      if ldebug: print(' - retrieving cached mask')
+      mask = self.getShapeMask(griddef=griddef, layer=layer, lcache=True, lfeedback=ldebug).getMask(invert=invert)
+      mask = mask.astype(np.uint8) # same as GDAL output
+    else:
+      # burn shape layer onto raster band
+      if ldebug: print(' - burning layer to raster')
+      mask = burnLayer(self.getLayer(layer), geotransform=griddef.geotransform, size=griddef.size, 
+                       projection=griddef.projection, inside=inside, outside=outside, name=self.name)
     # convert to Variable object, is desired
     if asVar: 
       mask = Variable(name=self.name, units='mask', axes=(griddef.ylat,griddef.xlon), data=mask, 
@@ -0,0 +1,195 @@
+'''
+A module that implements lazy evaluation of arithmetic expressions with Variables: operations on a
+LazyVar construct an expression graph, which is checked when it is constructed, but only evaluated
+when data are requested; the evaluation proceeds chunk by chunk along the first axis, so that only
+chunk-sized intermediate arrays are created and operands can be read from file on demand (VarNC).
+'''
+
+# external imports
+import numpy as np
+import numpy.ma as ma
+# internal imports
+from geodata.base import Variable, binaryAtts
+from geodata.misc import ArgumentError, AxisError
+
+# default size of chunks in bytes (per operand)
+chunkbytes = 2**24
+
+
+def asLazyVar(var=None, chunksize=None):
+  ''' Simple function to cast a Variable instance as a LazyVar, so that arithmetic operations with
+      this Variable are evaluated lazily. '''
+  if not isinstance(var,Variable): raise TypeError(var)
+  plot = var.plot.copy() if var.plot else None
+  return LazyVar(expr=var, axes=var.axes, dtype=var.dtype, atts=var.atts.copy(), plot=plot,
+                 chunksize=chunksize)
+
+def lazyOperation(op, orig, *others, **kwargs):
+  ''' Construct a new LazyVar from an arithmetic operation; 'op' is the undecorated Variable method,
+      which is also used to compute name, units and dtype (from a single element); the operation is
+      binary, if another operand is given. '''
+  asVar = kwargs.pop('asVar',True)
+  # operands: expressions of LazyVars are merged into the new expression
+  args = tuple(arg.expr if isinstance(arg,LazyVar) and not arg.data else arg for arg in (orig,)+others)
+  # determine meta data and dtype by applying the operation to a single element
+  probes = tuple(np.ones(1, dtype=arg.dtype) if isinstance(arg,(Variable,np.ndarray)) else arg for arg in (orig,)+others)
+  data, name, units = op(Operand(probes[0], orig.name, orig.units), *probes[1:], linplace=False, **kwargs)
+  expr = Expression(op, args, kwargs, name=orig.name, units=orig.units)
+  # construct attributes like the corresponding eager operation
+  if len(others) > 0: atts = binaryAtts(orig, others[0], name, units)
+  else:
+    atts = orig.atts.copy(); atts['name'] = name; atts['units'] = units
+  chunksize = [arg.chunksize for arg in (orig,)+others if isinstance(arg,LazyVar)][0]
+  plot = orig.plot.copy() if orig.plot else None
+  var = LazyVar(expr=expr, axes=orig.axes, dtype=np.asarray(data).dtype, atts=atts, plot=plot,
+                chunksize=chunksize)
+  # without a Variable container, there is nothing to defer
+  return var if asVar else var.evaluate()
+
+
+class Operand(object):
+  ''' A minimal stand-in for a Variable that is passed to the arithmetic methods of Variable. '''
+  def __init__(self, data, name='', units=''):
+    self.data_array = data
+    self.name = name
+    self.units = units
+
+
+class Expression(object):
+  '''
+    A node in an expression graph: an arithmetic operation ('op', an undecorated Variable method) and
+    its operands, which can be Variables, other Expressions, or constants (numbers or arrays).
+  '''
+
+  def __init__(self, op, args, kwargs=None, name='', units=''):
+    ''' save operation and operands; name and units of the first operand are used for meta data '''
+    if not callable(op): raise TypeError(op)
+    self.op = op
+    self.args = tuple(args)
+    self.kwargs = dict() if kwargs is None else kwargs.copy()
+    if 'lwarn' in self.kwargs: self.kwargs['lwarn'] = False # warnings are issued upon construction
+    self.name = name
+    self.units = units
+
+  def __call__(self, slcs):
+    ''' evaluate expression for a tuple of slices (one for each dimension) '''
+    vals = [evaluateOperand(arg, slcs) for arg in self.args]
+    data, name, units = self.op(Operand(vals[0], self.name, self.units), *vals[1:], linplace=False, **self.kwargs)
+    return data
+
+def evaluateOperand(arg, slcs):
+  ''' retrieve a chunk of data from an operand, so that it broadcasts like in the eager operation '''
+  ndim = len(slcs)
+  if isinstance(arg,Expression):
+    data = arg(slcs)
+  elif isinstance(arg,Variable):
+    # Variables with fewer dimensions are broadcast along trailing dimensions
+    data = arg[tuple(slcs[:arg.ndim])]
+    if arg.ndim < ndim: data = data.reshape(data.shape+(1,)*(ndim-arg.ndim))
+  elif isinstance(arg,np.ndarray) and 0 < arg.ndim <= ndim:
+    # arrays are broadcast along leading dimensions (only dimensions with length > 1 are sliced)
+    n = ndim - arg.ndim
+    data = arg[tuple(slcs[n+i] if l > 1 else slice(None) for i,l in enumerate(arg.shape))]
+  else: data = arg # scalars
+  return data
+
+
+class LazyVar(Variable):
+  '''
+    A Variable class that represents an arithmetic expression of other Variables; the expression is
+    only evaluated when data are requested (getArray, load, __getitem__, or when it is written to a
+    NetCDF file), chunk by chunk along the first axis.
+  '''
+
+  def __init__(self, expr=None, name=None, units=None, axes=None, dtype=None, atts=None, plot=None,
+               fillValue=None, chunksize=None, **kwatts):
+    '''
+      Initialize a Variable that is defined by an expression.
+
+      New Instance Attributes:
+        expr = None # an Expression instance or a Variable (the root of the expression graph)
+        chunksize = None # length of chunks along the first axis (default: chunkbytes per operand)
+    '''
+    if not isinstance(expr,(Expression,Variable)): raise TypeError(expr)
+    if chunksize is not None and chunksize < 1: raise ArgumentError(chunksize)
+    # call parent constructor (without data)
+    super(LazyVar,self).__init__(name=name, units=units, axes=axes, data=None, dtype=dtype,
+                                 mask=None, fillValue=fillValue, atts=atts, plot=plot, **kwatts)
+    self.__dict__['expr'] = expr
+    self.__dict__['chunksize'] = chunksize
+
+  def evaluate(self, slcs=None, out=None, chunksize=None):
+    ''' Evaluate the expression for a slice (default: everything), chunk by chunk along the first axis;
+        if 'out' is given (an array or a NetCDF variable), results are written into 'out'. '''
+    ndim = self.ndim; shape = self.shape
+    if ndim == 0: return self.expr(()) if isinstance(self.expr,Expression) else evaluateOperand(self.expr, ())
+    # expand slices to all dimensions; integer indices are converted to slices and squeezed at the end
+    if slcs is None: slcs = ()
+    elif not isinstance(slcs,(tuple,list)): slcs = (slcs,)
+    if len(slcs) > ndim: raise AxisError(slcs)
+    slcs = list(slcs) + [slice(None)]*(ndim-len(slcs))
+    lsqueeze = [isinstance(slc,(int,np.integer)) for slc in slcs]
+    slcs = [slice(slc, slc+1 if slc != -1 else None) if lsq else slc for slc,lsq in zip(slcs,lsqueeze)]
+    # chunks along the first axis
+    if isinstance(slcs[0],slice) and ( slcs[0].step is None or slcs[0].step > 0 ):
+      start, stop, step = slcs[0].indices(shape[0])
+      n0 = len(range(start,stop,step))
+      chunk = lambda i,j: slice(start+i*step, start+j*step, step)
+    else:
+      idx = np.arange(shape[0])[slcs[0]] # index arrays and reverse slices
+      n0 = len(idx)
+      chunk = lambda i,j: idx[i:j]
+    if chunksize is None: chunksize = self.chunksize
+    if chunksize is None:
+      chunksize = max(1, int(chunkbytes//(np.prod(shape[1:])*self.dtype.itemsize)))
+    # evaluate expression chunk by chunk
+    lout = out is not None
+    for i in range(0, max(n0,1), chunksize):
+      j = min(i+chunksize,n0)
+      cslcs = [chunk(i,j)] + slcs[1:]
+      data = self.expr(cslcs) if isinstance(self.expr,Expression) else evaluateOperand(self.expr, cslcs)
+      if out is None: # allocate output array based on first chunk
+        oshape = (n0,)+data.shape[1:]
+        out = ma.empty(oshape, dtype=data.dtype) if isinstance(data,ma.MaskedArray) else np.empty(oshape, dtype=data.dtype)
+      out[i:j] = data
+    # remove dimensions that were indexed with integers
+    if not lout and any(lsqueeze): out = out[tuple(0 if lsq else slice(None) for lsq in lsqueeze)]
+    return out
+
+  def __getitem__(self, slcs):
+    ''' Method implementing access to the actual data; if data is not loaded, evaluate expression for slice. '''
+    if self.data: return super(LazyVar,self).__getitem__(slcs)
+    else: return self.evaluate(slcs)
+
+  def load(self, data=None, **kwargs):
+    ''' Method to evaluate the expression and attach the results to the Variable. '''
+    if data is None and not self.data: data = self.evaluate()
+    return super(LazyVar,self).load(data=data, **kwargs)
+
+  def getArray(self, axes=None, broadcast=False, unmask=False, fillValue=None, dtype=None, copy=True):
+    ''' Copy the entire data array or a slice; option to unmask and to reorder/reshape to specified axes. '''
+    if not self.data: self.load()
+    return super(LazyVar,self).getArray(axes=axes, broadcast=broadcast, unmask=unmask, dtype=dtype,
+                                        fillValue=fillValue, copy=copy)
+
+  def slicing(self, **kwargs):
+    ''' Slicing requires data, so the expression is evaluated first. '''
+    if not self.data: self.load()
+    return super(LazyVar,self).slicing(**kwargs)
+
+  def copy(self, deepcopy=False, **newargs):
+    ''' A method to copy the Variable; the copy is also a LazyVar, unless data are loaded or provided. '''
+    if self.data or deepcopy or 'data' in newargs:
+      return super(LazyVar,self).copy(deepcopy=deepcopy, **newargs) # a regular Variable
+    args = dict(expr=self.expr, axes=self.axes, dtype=self.dtype, atts=self.atts.copy(),
+                chunksize=self.chunksize)
+    if self.plot: args['plot'] = self.plot.copy()
+    args.update(newargs)
+    return LazyVar(**args)
+
+  def _apply_ufunc(self, ufunc=None, asVar=True, linplace=False, lwarn=True, **kwargs):
+    ''' Apply a ufunc lazily (in-place operations require data). '''
+    if linplace or self.data:
+      return super(LazyVar,self)._apply_ufunc(ufunc=ufunc, asVar=asVar, linplace=linplace, lwarn=lwarn, **kwargs)
+    op = Variable.__dict__['_apply_ufunc'].op # the undecorated method
+    return lazyOperation(op, self, asVar=asVar, ufunc=ufunc, lwarn=lwarn, **kwargs)
@@ -10,11 +10,13 @@ A module that provides access to NetCDF datasets for GeoData datasets and variab
 import numpy as np
 import collections as col
 import netCDF4 as nc # netcdf python module
-import os, functools
+import os, functools, hashlib
+import pickle
 
 # import all base functionality from PyGeoDat
 # from nctools import * # my own netcdf toolkit
 from geodata.base import Variable, Axis, Dataset, ApplyTestOverList
+from geodata.lazy import LazyVar
 from geodata.misc import checkIndex, isEqual, joinDicts
 from geodata.misc import DatasetError, DataError, AxisError, NetCDFError, PermissionError, FileError, VariableError, ArgumentError 
 from utils.nctools import coerceAtts, writeNetCDF, add_var, add_coord, checkFillValue
@@ -36,12 +38,14 @@ def asVarNC(var=None, ncvar=None, mode='rw', axes=None, deepcopy=False, **kwargs
   else: axes = var.axes
   # create new VarNC instance (using the ncvar NetCDF Variable instance as file reference)
   if not isinstance(var,Variable): raise TypeError
-  if not isinstance(ncvar,(nc.Variable,nc.Dataset)): raise TypeError
+  if not isinstance(ncvar,ncvariable_types+ncdataset_types): raise TypeError
   atts = kwargs.pop('atts',var.atts.copy()) # name and units are also stored in atts!
   plot = kwargs.pop('plot',var.plot.copy())
   data = var.data_array.copy() if deepcopy else var.data_array
   varnc = VarNC(ncvar, axes=axes, atts=atts, plot=plot, dtype=var.dtype, mode=mode, 
                 data=data, **kwargs)
+  # expressions are evaluated and written to file chunk by chunk
+  if data is None and isinstance(var,LazyVar) and 'w' in mode: var.evaluate(out=varnc.ncvar)
   # return VarNC
   return varnc
 
@@ -49,7 +53,7 @@ def asAxisNC(ax=None, ncvar=None, mode='rw', deepcopy=True, **kwargs):
   ''' Simple function to cast an Axis instance as a AxisNC (NetCDF-capable Axis subclass). '''
   # create new AxisNC instance (using the ncvar NetCDF Variable instance as file reference)
   if not isinstance(ax,Axis): raise TypeError
-  if not isinstance(ncvar,(nc.Variable,nc.Dataset)): raise TypeError # this is for the coordinate variable, not the dimension
+  if not isinstance(ncvar,ncvariable_types+ncdataset_types): raise TypeError # this is for the coordinate variable, not the dimension
   # axes are handled automatically (self-reference)  )
   atts = kwargs.pop('atts',ax.atts.copy()) # name and units are also stored in atts!
   plot = kwargs.pop('plot',ax.plot.copy())
@@ -103,6 +107,308 @@ class NoNetCDF(object):
     # N.B.: similar implementation to 'partial': need to return a callable that behaves like the instance method
     return functools.partial(self.__call__, instance) # but using 'partial' is simpler
 
+## block cache for data read from NetCDF variables
+
+cache_memory = 256 # default memory ceiling of a block cache in MB
+cache_block_bytes = 2**22 # default minimum size of a block in bytes
+
+class BlockCache(object):
+  '''
+    A least recently used (LRU) cache for blocks of data read from NetCDF variables; blocks are keyed by
+    variable and block index, and the least recently used blocks are evicted, when the memory ceiling 
+    is exceeded. Blocks are aligned with the NetCDF chunks, so that every chunk is only decompressed once.
+    A cache is usually shared by all variables of a DatasetNetCDF.
+  '''
+  
+  def __init__(self, memory=None, blockbytes=None):
+    ''' initialize empty cache; memory is the memory ceiling in MB '''
+    if memory is None: memory = cache_memory
+    if blockbytes is None: blockbytes = cache_block_bytes
+    self.memory = memory*1024.*1024. # in bytes
+    self.blockbytes = blockbytes
+    self.blocks = col.OrderedDict() # in order of last use
+    self.shapes = dict() # block shapes by variable
+    self.nbytes = 0; self.hits = 0; self.misses = 0
+    
+  def __len__(self): return len(self.blocks)
+  
+  def varKey(self, ncvar):
+    ''' key to identify a NetCDF variable (only unique among open files) '''
+    return (ncvar._grpid, ncvar._varid)
+  
+  def blockShape(self, ncvar):
+    ''' determine block shape based on NetCDF chunks; blocks are grown, starting with the innermost 
+        dimension, until they are at least 'blockbytes' large '''
+    varkey = self.varKey(ncvar)
+    if varkey not in self.shapes:
+      shape = ncvar.shape
+      chunks = ncvar.chunking()
+      if isinstance(chunks,(list,tuple)): block = list(chunks)
+      else: block = [1]*(len(shape)-1) + [max(shape[-1],1)] # contiguous: rows
+      itemsize = ncvar.dtype.itemsize
+      for i in range(len(shape)-1,-1,-1):
+        while np.prod(block)*itemsize < self.blockbytes and block[i] < shape[i]:
+          block[i] = min(block[i]*2, shape[i])
+      self.shapes[varkey] = tuple(max(b,1) for b in block)
+    return self.shapes[varkey]
+  
+  def get(self, key):
+    ''' retrieve block and mark as recently used (returns None, if not cached) '''
+    block = self.blocks.get(key,None)
+    if block is not None: 
+      self.blocks.move_to_end(key); self.hits += 1
+    else: self.misses += 1
+    return block
+  
+  def put(self, key, block):
+    ''' add block to cache and evict least recently used blocks, if memory ceiling is exceeded '''
+    if block.nbytes > self.memory: return # don't cache, if it doesn't fit
+    if key in self.blocks: self.nbytes -= self.blocks.pop(key).nbytes
+    self.blocks[key] = block; self.nbytes += block.nbytes
+    while self.nbytes > self.memory:
+      oldkey, oldblock = self.blocks.popitem(last=False)
+      self.nbytes -= oldblock.nbytes
+  
+  def discard(self, ncvar):
+    ''' remove all blocks of a variable (e.g. after writing) '''
+    varkey = self.varKey(ncvar)
+    for key in [key for key in self.blocks if key[0] == varkey]:
+      self.nbytes -= self.blocks.pop(key).nbytes
+    self.shapes.pop(varkey,None)
+      
+  def clear(self):
+    ''' remove all blocks from the cache '''
+    self.blocks.clear(); self.shapes.clear(); self.nbytes = 0
+  
+  def read(self, ncvar, slcs):
+    ''' read data from NetCDF variable using cached blocks; indexing follows the (orthogonal) netCDF4
+        conventions; unsupported index types are passed through to the NetCDF variable '''
+    shape = ncvar.shape
+    if not isinstance(slcs,(list,tuple)) or len(slcs) != len(shape) or len(shape) == 0 or ncvar.dtype == str:
+      return ncvar.__getitem__(slcs)
+    # convert all indices to index arrays (and record integer indices for squeezing)
+    idxs = []; lint = []
+    for slc,n in zip(slcs,shape):
+      if isinstance(slc,slice): 
+        idx = np.arange(*slc.indices(n)); lint.append(False)
+      elif isinstance(slc,(int,np.integer)): 
+        idx = np.array([slc+n if slc < 0 else slc]); lint.append(True)
+      else:
+        idx = np.asarray(slc); lint.append(False)
+        if idx.dtype.kind not in 'iu' or idx.ndim != 1: return ncvar.__getitem__(slcs)
+        idx = np.where(idx < 0, idx+n, idx)
+      if len(idx) == 0 or idx.min() < 0 or idx.max() >= n: return ncvar.__getitem__(slcs)
+      idxs.append(idx)
+    # assemble bounding box from blocks
+    block = self.blockShape(ncvar); varkey = self.varKey(ncvar)
+    los = [idx.min() for idx in idxs]
+    box_shape = tuple(idx.max()-lo+1 for idx,lo in zip(idxs,los))
+    blkidxs = [np.unique(idx//b) for idx,b in zip(idxs,block)] # only blocks that are actually needed
+    data = None; mask = None; fill_value = None
+    for blkidx in np.ndindex(*[len(bi) for bi in blkidxs]):
+      blk = tuple(int(bi[i]) for bi,i in zip(blkidxs,blkidx))
+      blkslcs = tuple(slice(k*b, min((k+1)*b, n)) for k,b,n in zip(blk,block,shape))
+      blkshape = tuple(slc.stop-slc.start for slc in blkslcs)
+      key = (varkey, blk)
+      blkdata = self.get(key)
+      if blkdata is None or blkdata.shape != blkshape:
+        blkdata = ncvar.__getitem__(blkslcs) # read and decode block
+        self.put(key, blkdata)
+      # copy intersection of block and bounding box
+      if data is None:
+        data = np.empty(box_shape, dtype=blkdata.dtype)
+        if isinstance(blkdata,np.ma.MaskedArray): fill_value = blkdata.fill_value
+      elif blkdata.dtype != data.dtype: data = data.astype(np.result_type(data,blkdata))
+      src = []; tgt = []
+      for slc,lo,bl in zip(blkslcs,los,box_shape):
+        start = max(slc.start,lo); stop = min(slc.stop,lo+bl)
+        src.append(slice(start-slc.start,stop-slc.start)); tgt.append(slice(start-lo,stop-lo))
+      src = tuple(src); tgt = tuple(tgt)
+      data[tgt] = np.ma.getdata(blkdata)[src]
+      if isinstance(blkdata,np.ma.MaskedArray):
+        if mask is None: mask = np.zeros(box_shape, dtype=np.bool_)
+        mask[tgt] = np.ma.getmaskarray(blkdata)[src]
+    if mask is not None: data = np.ma.masked_array(data, mask=mask, fill_value=fill_value)
+    # apply (orthogonal) indexing relative to bounding box and squeeze integer indices
+    for i,(idx,lo,n) in enumerate(zip(idxs,los,box_shape)):
+      if len(idx) != n or np.any(np.diff(idx) != 1):
+        data = data[(slice(None),)*i + (idx-lo,)]
+    if any(lint): data = data[tuple(0 if l else slice(None) for l in lint)]
+    return data
+  
+
+## metadata index and proxies for NetCDF files
+
+index_version = 1 # increment, when the format of the index changes
+index_suffix = '.idx.pickle' # suffix for sidecar index files
+lmetadata_index = False # default for DatasetNetCDF: construct datasets from metadata index
+
+def indexFilename(filepath, folder=None):
+  ''' name of the metadata index of a NetCDF file: a sidecar file, or a file in a separate folder '''
+  if folder is None: return filepath + index_suffix
+  # N.B.: in a separate folder, the absolute path is hashed, to avoid collisions of identical filenames
+  pathhash = hashlib.md5(os.path.abspath(filepath).encode()).hexdigest()[:8]
+  return os.path.join(folder, '{:s}_{:s}{:s}'.format(os.path.basename(filepath), pathhash, index_suffix))
+
+def buildMetadataIndex(filepath):
+  ''' read dimensions, variables and attributes of a NetCDF file, as well as the values of coordinate 
+      variables (which are required to construct axes) '''
+  with nc.Dataset(filepath, mode='r') as ds:
+    dimensions = {name:(len(dim),dim.isunlimited()) for name,dim in ds.dimensions.items()}
+    variables = dict()
+    for name,ncvar in ds.variables.items():
+      if not ( isinstance(ncvar.dtype,np.dtype) or ncvar.dtype == str ): 
+        raise NotImplementedError("Compound and VLen types are not supported: '{:s}'".format(name))
+      meta = dict(dimensions=ncvar.dimensions, shape=ncvar.shape, dtype=ncvar.dtype, chunking=ncvar.chunking(),
+                  atts={key:ncvar.getncattr(key) for key in ncvar.ncattrs()})
+      if name in ds.dimensions and ncvar.ndim == 1: meta['data'] = ncvar[:] # coordinates
+      variables[name] = meta
+    atts = {key:ds.getncattr(key) for key in ds.ncattrs()}
+  return dict(version=index_version, dimensions=dimensions, variables=variables, atts=atts)
+
+def loadMetadataIndex(filepath, folder=None, lwrite=True):
+  ''' load the metadata index of a NetCDF file; the index is (re-)built, if it is missing or outdated,
+      i.e. if the modification time or size of the file have changed, and written, if possible '''
+  stat = os.stat(filepath)
+  stamp = (stat.st_mtime, stat.st_size)
+  idxfile = indexFilename(filepath, folder=folder)
+  index = None
+  if os.path.exists(idxfile):
+    try:
+      with open(idxfile, 'rb') as filehandle: index = pickle.load(filehandle)
+      if index.get('version',None) != index_version or index.get('stamp',None) != stamp: index = None
+    except Exception: index = None # corrupted or incompatible index: rebuild
+  if index is None:
+    index = buildMetadataIndex(filepath)
+    index['stamp'] = stamp
+    if lwrite:
+      try: # write to temporary file first, so that concurrent readers never see partial files
+        tmpfile = idxfile + '.tmp{:d}'.format(os.getpid())
+        with open(tmpfile, 'wb') as filehandle: pickle.dump(index, filehandle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpfile, idxfile)
+      except (IOError,OSError): pass # e.g. read-only data folder; the index just won't be persisted
+  return index
+
+
+class DimensionProxy(object):
+  ''' A stand-in for a netCDF4 Dimension, constructed from a metadata index. '''
+  
+  def __init__(self, name, size, unlimited=False):
+    self.name = name
+    self.size = size
+    self.unlimited = unlimited
+    
+  def __len__(self): return self.size
+  
+  def isunlimited(self): return self.unlimited
+
+
+class VariableProxy(object):
+  '''
+    A stand-in for a netCDF4 Variable, constructed from a metadata index; meta data and coordinates 
+    are served from the index, and the actual NetCDF variable is only accessed for other data.
+  '''
+  
+  def __init__(self, name, meta, dataset, varid=0):
+    self.__dict__['_name'] = name
+    self.__dict__['dimensions'] = tuple(meta['dimensions'])
+    self.__dict__['shape'] = tuple(meta['shape'])
+    self.__dict__['dtype'] = meta['dtype']
+    self.__dict__['atts'] = meta['atts']
+    self.__dict__['_chunking'] = meta['chunking']
+    self.__dict__['_data'] = meta.get('data',None)
+    self.__dict__['_dataset'] = dataset
+    # N.B.: keys for the BlockCache; the proxy id is practically disjoint from NetCDF group ids
+    self.__dict__['_grpid'] = id(dataset)
+    self.__dict__['_varid'] = varid
+    
+  @property
+  def ndim(self): return len(self.shape)
+  
+  @property
+  def ncvar(self):
+    ''' the actual NetCDF variable (opens the file, if necessary) '''
+    return self._dataset.dataset.variables[self._name]
+  
+  def ncattrs(self): return list(self.atts.keys())
+  
+  def getncattr(self, key): return self.atts[key]
+  
+  def chunking(self): return self._chunking
+  
+  def __getitem__(self, slcs):
+    ''' serve coordinates from index, and everything else from file '''
+    if self._data is None: return self.ncvar.__getitem__(slcs)
+    if isinstance(slcs,list) and len(slcs) == 1: slcs = tuple(slcs)
+    return self._data.__getitem__(slcs).copy() # don't modify index
+  
+  def __getattr__(self, attr):
+    ''' NetCDF attributes are served from the index, methods from the actual NetCDF variable '''
+    if attr in self.atts: return self.atts[attr]
+    elif hasattr(nc.Variable,attr): return getattr(self.ncvar,attr)
+    else: raise AttributeError(attr)
+  
+
+class DatasetProxy(object):
+  '''
+    A stand-in for a netCDF4 Dataset, constructed from a metadata index; the NetCDF file is only opened 
+    on first access to data that are not in the index (read-only).
+  '''
+  
+  def __init__(self, filepath, index=None, folder=None):
+    ''' load metadata index (or use index) and construct proxies for dimensions and variables '''
+    if index is None: index = loadMetadataIndex(filepath, folder=folder)
+    self.__dict__['path'] = filepath
+    self.__dict__['atts'] = index['atts']
+    self.__dict__['_dataset'] = None
+    self.__dict__['dimensions'] = {name:DimensionProxy(name, size, unlimited) for name,(size,unlimited) in index['dimensions'].items()}
+    self.__dict__['variables'] = {name:VariableProxy(name, meta, self, varid=i) for i,(name,meta) in enumerate(index['variables'].items())}
+  
+  @property
+  def dataset(self):
+    ''' the actual NetCDF dataset (opened on first access) '''
+    if self._dataset is None: self.__dict__['_dataset'] = nc.Dataset(self.path, mode='r')
+    return self._dataset
+  
+  def ncattrs(self): return list(self.atts.keys())
+  
+  def getncattr(self, key): return self.atts[key]
+  
+  def filepath(self): return self.path
+  
+  def close(self):
+    ''' close the NetCDF file, if it was opened '''
+    if self._dataset is not None: self._dataset.close()
+    self.__dict__['_dataset'] = None
+  
+  def __getattr__(self, attr):
+    ''' NetCDF attributes are served from the index, methods from the actual NetCDF dataset '''
+    if attr in self.atts: return self.atts[attr]
+    elif hasattr(nc.Dataset,attr): return getattr(self.dataset,attr)
+    else: raise AttributeError(attr)
+
+# types that can be used in place of netCDF4 classes
+ncdataset_types = (nc.Dataset, DatasetProxy)
+ncvariable_types = (nc.Variable, VariableProxy)
+
+
+def composeIndex(idx, preset, n):
+  ''' compose an index along a sliced axis with the preset slice of that axis, so that the result 
+      refers to the NetCDF variable on file ('n' is the length of the dimension in the file) '''
+  if isinstance(idx,slice) and idx == slice(None): return preset # trivial case
+  if isinstance(preset,slice):
+    rng = range(*preset.indices(n))
+    if isinstance(idx,slice):
+      rng = rng[idx] # applies offset and stride
+      if len(rng) == 0: return slice(0,0)
+      return slice(rng.start, rng.stop if rng.stop >= 0 else None, rng.step)
+    elif isinstance(idx,(int,np.integer)): return rng[idx]
+    else: return np.asarray(rng)[idx] # index lists and arrays
+  elif isinstance(preset,(list,tuple,np.ndarray)):
+    return np.asarray(preset)[idx]
+  else: return idx # scalar presets remove the axis, so nothing to compose
+
+
 class VarNC(Variable):
   '''
     A variable class that implements access to data from a NetCDF variable object.
@@ -110,7 +416,7 @@ class VarNC(Variable):
   
   def __init__(self, ncvar, name=None, units=None, axes=None, data=None, dtype=None, scalefactor=1, 
                offset=0, transform=None, atts=None, plot=None, fillValue=None, mode='r', load=False, 
-               squeeze=False, slices=None, **kwatts):
+               squeeze=False, slices=None, zlib=True, chunking=None, cache=None, **kwatts):
     ''' 
       Initialize Variable instance based on NetCDF variable.
       
@@ -122,6 +428,10 @@ class VarNC(Variable):
         transform = None # function that can perform non-trivial transforms upon load
         squeezed = False # if True, all singleton dimensions in NetCDF Variable are silently ignored
         slices = None # slice with respect to NetCDF Variable
+        cache = None # a BlockCache instance for data read from the NetCDF variable (usually per dataset)
+      Arguments for the creation of new NetCDF variables:
+        zlib = True # compression settings (see utils.nctools.getCompression)
+        chunking = None # chunking policy (see utils.nctools.getChunkSizes)
     '''
     # check mode
     if not (mode == 'w' or mode == 'r' or mode == 'rw' or mode == 'wr'):  
@@ -142,12 +452,13 @@ class VarNC(Variable):
         if dtype is None: dtype = ncvar.dtype
       else: 
         if dtype is None: raise TypeError("No data (-type) to construct NetCDF variable!")
-        ncvar = add_var(ncvar, name, dims=dims, shape=dimshape, atts=atts, dtype=dtype, fillValue=fillValue, zlib=True)
-    elif isinstance(ncvar,nc.Variable):
+        ncvar = add_var(ncvar, name, dims=dims, shape=dimshape, atts=atts, dtype=dtype, fillValue=fillValue, 
+                        zlib=zlib, chunking=chunking)
+    elif isinstance(ncvar,ncvariable_types):
       if dtype is None: dtype = ncvar.dtype
     if dtype is not None: dtype = np.dtype(dtype) # proper formatting
     # some type checking
-    if not isinstance(ncvar,nc.Variable): raise TypeError("Argument 'ncvar' has to be a NetCDF Variable or Dataset.")        
+    if not isinstance(ncvar,ncvariable_types): raise TypeError("Argument 'ncvar' has to be a NetCDF Variable or Dataset.")        
     if data is not None:
       if axes is not None:
           if data.shape != tuple(len(ax) for ax in axes): raise DataError
@@ -211,6 +522,8 @@ class VarNC(Variable):
     self.__dict__['transform'] = transform
     self.__dict__['squeezed'] = False
     self.__dict__['slices'] = slices # initial default (i.e. everything)
+    if cache is not None and not isinstance(cache,BlockCache): raise TypeError(cache)
+    self.__dict__['cache'] = cache
     self.ncstrvar = lstrvar
     self.ncstrlen = strlen
     if squeeze: self.squeeze() # may set 'squeezed' to True
@@ -234,8 +547,8 @@ class VarNC(Variable):
         if (not self.ncstrvar and len(slcs) != self.ncvar.ndim) or (self.ncstrvar and len(slcs)+1 != self.ncvar.ndim): 
           raise AxisError(slcs)
         slcs = list(slcs) # need to insert items
-        # NetCDF can't deal wit negative list indices
-        for i,slc in enumerate(slcs):
+        # NetCDF can't deal wit negative list indices (preset slices are handled below)
+        for i,slc in enumerate(slcs if not self.slices else []):
           lendim = self.ncvar.shape[i] # add dimension length to negative values
           if isinstance(slc,(list,tuple)):
             slcs[i] = [idx+lendim if idx < 0 else idx for idx in slc]
@@ -254,13 +567,15 @@ class VarNC(Variable):
       # check for existing slicing directive
       if self.slices:
         assert isinstance(self.slices,(list,tuple)) and isinstance(slcs,list)
-        # substitute None-slices with the preset slicing directive
-        slcs = [sslc if oslc == slice(None) else oslc for oslc,sslc in zip(slcs,self.slices)]
-        # set slices to None, since they unneccessary now, and cause problems when slicing
-        self.slices = None
+        # compose indices with the preset slicing directive, so that they refer to the file
+        slcs = [composeIndex(oslc, sslc, n) for oslc,sslc,n in zip(slcs,self.slices,self.ncvar.shape)]
+        # N.B.: the preset slicing is retained, so that repeated access returns the same slice
       # finally, get data!
+      if isinstance(slcs,list): slcs = tuple(slcs) # N.B.: a list of integers would be treated as a fancy index
       if self.ndim == 0 and self.ncvar.ndim == 0:
           data = self.ncvar.getValue() # special case for scalars
+      elif self.cache is not None:
+          data = self.cache.read(self.ncvar, slcs) # served from cached blocks, if possible
       else:
           data = self.ncvar.__getitem__(slcs) # exceptions handled by netcdf module
       if self.dtype is not None and not np.issubdtype(data.dtype,self.dtype):
@@ -344,7 +659,8 @@ class VarNC(Variable):
           slcs = newslcs
       # create new VarNC instance with different slices
       newvar = asVarNC(newvar, self.ncvar, mode=self.mode, axes=axes, slices=slcs, squeeze=lsqueeze,
-                       scalefactor=self.scalefactor, offset=self.offset, transform=self.transform)
+                       scalefactor=self.scalefactor, offset=self.offset, transform=self.transform, 
+                       cache=self.cache)
     # N.B.: the copy method can also cast as VarNC and it is called in slicing; however, slicing
     #       can not communicate slices correctly, so that casting as VarNC has to happen here
     if lslices: return newvar, slcs
@@ -380,6 +696,7 @@ class VarNC(Variable):
       if 'transform' not in newargs: newargs['transform'] = self.transform
       if 'offset' not in newargs: newargs['offset'] = self.offset
       if 'slices' not in newargs: newargs['slices'] = self.slices
+      if 'cache' not in newargs: newargs['cache'] = self.cache
       copyvar = asVarNC(var=copyvar, ncvar=self.ncvar, mode=self.mode, **newargs)
     else:
       if not copyvar.data and not 'data' in newargs: 
@@ -472,6 +789,7 @@ class VarNC(Variable):
           ncvar[:] = nc.stringtochar(self.data_array) # transform string array to char array with one more dimension
           if fillValue is not None: raise NotImplementedError
         else: ncvar[:] = self.data_array # masking should be handled by the NetCDF module
+        if self.cache is not None: self.cache.discard(ncvar) # cached blocks are outdated
         # reset scale factors etc.
         self.scalefactor = 1; self.offset = 0
         fillValue = checkFillValue(fillValue, self.dtype)
@@ -537,7 +855,7 @@ class DatasetNetCDF(Dataset):
   def __init__(self, name=None, title=None, dataset=None, filelist=None, varlist=None, variables=None,
       	       varatts=None, atts=None, axes=None, multifile=False, check_override=None, ignore_list=None, 
                folder='', mode='r', ncformat='NETCDF4', squeeze=True, lscalars=False, load=False, 
-               check_vars=None):
+               check_vars=None, zlib=True, chunking=None, cache=None, lindex=None, index_folder=None):
     ''' 
       Create a Dataset from one or more NetCDF files; Variables are created from NetCDF variables. 
       Alternatively, create a netcdf file from an existing Dataset (Variables can be added as well).  
@@ -559,6 +877,13 @@ class DatasetNetCDF(Dataset):
         squeeze        : squeeze singleton dimensions from all variables
         lscalars       : load scalar variables or skip (default: skip)
         load           : load data from disk immediately (passed on to VarNC)
+        zlib           : compression settings for new variables (bool or dict; see utils.nctools.getCompression)
+        chunking       : chunking policy for new variables, e.g. 'map' or 'timeseries' (see utils.nctools.getChunkSizes)
+        cache          : cache for data read from NetCDF variables (BlockCache instance, or memory ceiling in MB, 
+                         or True for the default ceiling; None means no caching)
+        lindex         : construct dataset from a persisted metadata index, without opening the files (read-only;
+                         files are opened on first data access; default: lmetadata_index)
+        index_folder   : folder for index files (default: sidecar files next to the NetCDF files)
                        
       NetCDF Attributes:
         mode           = 'r' # a string indicating whether read ('r') or write ('w') actions are intended/permitted
@@ -571,14 +896,20 @@ class DatasetNetCDF(Dataset):
         atts           = AttrDict() # dictionary containing global attributes / meta data
     '''
     if len(folder) > 0 and folder[-1] != '/': folder += '/'
+    if lindex is None: lindex = lmetadata_index
+    # block cache shared by all variables
+    if cache is True: cache = BlockCache()
+    elif isinstance(cache,(int,float,np.number)) and not isinstance(cache,bool): cache = BlockCache(memory=cache)
+    elif cache is False: cache = None
+    elif cache is not None and not isinstance(cache,BlockCache): raise TypeError(cache)
     if variables is None:
       # either use available NetCDF datasets directly, ...  
-      if isinstance(dataset,nc.Dataset):
+      if isinstance(dataset,ncdataset_types):
         datasets = [dataset]  # datasets is used later
         #if hasattr(dataset,'filepath'): filelist = [dataset.filepath()] # only available in newer versions
         # N.B.: apparently filepath() tends to cause the netCDF library to crash... need to find a workaround...
       elif isinstance(dataset,(list,tuple)):
-        if not all([isinstance(ds,nc.Dataset) for ds in dataset]): raise TypeError
+        if not all([isinstance(ds,ncdataset_types) for ds in dataset]): raise TypeError
         datasets = dataset
         #filelist = [dataset.filepath() for dataset in datasets if hasattr(dataset,'filepath')]
         # N.B.: apparently filepath() tends to cause the netCDF library to crash... need to find a workaround...
@@ -603,7 +934,8 @@ class DatasetNetCDF(Dataset):
             if not isinstance(var,Variable): raise TypeError
             dataset.addVariable(var)      
         # create netcdf dataset/file
-        dataset = writeNetCDF(dataset, filename, ncformat='NETCDF4', zlib=True, writeData=False, close=False, feedback=False)
+        dataset = writeNetCDF(dataset, filename, ncformat='NETCDF4', zlib=zlib, writeData=False, close=False, 
+                              feedback=False, chunking=chunking)
         datasets = [dataset]
       # ... or open datasets from filelist
       else:
@@ -622,6 +954,9 @@ class DatasetNetCDF(Dataset):
               if isinstance(ncfile,(list,tuple)): tmpfile = [folder+ncf for ncf in ncfile]
               else: tmpfile = folder+ncfile # multifile via regular expressions
               datasets.append(nc.MFDataset(tmpfile), mode=ncmode, format=ncformat, clobber=False)
+            elif lindex and ncmode == 'r': # construct from metadata index; the file is opened on demand
+              tmpfile = folder+ncfile
+              datasets.append(DatasetProxy(tmpfile, folder=index_folder))
             else: # open a simple single-file dataset
               tmpfile = folder+ncfile
               datasets.append(nc.Dataset(tmpfile, mode=ncmode, format=ncformat, clobber=False))
@@ -751,12 +1086,12 @@ class DatasetNetCDF(Dataset):
               # N.B.: apparently len(dim) does not work properly - ncvar.shape is more reliable
               # create new variable using the override parameters in varatts
               variables[tmpatts['name']] = VarNC(ncvar=ncvar, axes=varaxes, dtype=strtype, 
-                                                 mode=mode, squeeze=squeeze, load=load, **tmpatts)
+                                                 mode=mode, squeeze=squeeze, load=load, cache=cache, **tmpatts)
             elif all([dim in axes for dim in ncvar.dimensions]):
               varaxes = [axes[dim] for dim in ncvar.dimensions] # collect axes
               # create new variable using the override parameters in varatts
               variables[tmpatts['name']] = VarNC(ncvar=ncvar, axes=varaxes, 
-                                                 mode=mode, squeeze=squeeze, load=load, **tmpatts)
+                                                 mode=mode, squeeze=squeeze, load=load, cache=cache, **tmpatts)
               # N.B.: using tmpatts['name'] as key is more reliable in preventing duplicate variables,
               #       because it also works when NetCDF names are different across files
             elif not any([dim in ignore_list for dim in ncvar.dimensions]): # legitimate omission
@@ -766,13 +1101,13 @@ class DatasetNetCDF(Dataset):
       if isinstance(variables,dict): variables = list(variables.values())
       if filelist is None: raise ArgumentError(filelist)
       if folder: filelist = [folder+filename for filename in filelist]
-      if isinstance(dataset,nc.Dataset):
+      if isinstance(dataset,ncdataset_types):
         datasets = [dataset]  # datasets is used later
         #if hasattr(dataset,'filepath'): filelist = [dataset.filepath()] # only available in newer versions
         # N.B.: apparently filepath() tends to cause the netCDF library to crash... need to find a workaround...
         if len(filelist) != 1: raise ValueError(filelist)
       elif isinstance(dataset,(list,tuple)):
-        if not all([isinstance(ds,nc.Dataset) for ds in dataset]): raise TypeError
+        if not all([isinstance(ds,ncdataset_types) for ds in dataset]): raise TypeError
         datasets = dataset
         #filelist = [dataset.filepath() for dataset in datasets if hasattr(dataset,'filepath')]
         # N.B.: apparently filepath() tends to cause the netCDF library to crash... need to find a workaround...
@@ -780,13 +1115,16 @@ class DatasetNetCDF(Dataset):
       else: raise ArgumentError(dataset)
       mode = 'r' # for now, only allow read
     # get attributes from NetCDF dataset
-    ncattrs = joinDicts(*[ds.__dict__ for ds in datasets])
+    ncattrs = joinDicts(*[{key:ds.getncattr(key) for key in ds.ncattrs()} for ds in datasets])
     # update NC atts with attributes passed to constructor
     if atts is not None: ncattrs.update(atts) # update with attributes passed to constructor
     self.__dict__['mode'] = mode
     # add NetCDF attributes
     self.__dict__['datasets'] = datasets
     self.__dict__['filelist'] = filelist
+    self.__dict__['zlib'] = zlib # compression and chunking of new variables
+    self.__dict__['chunking'] = chunking
+    self.__dict__['cache'] = cache
     # initialize Dataset using parent constructor
     #if axes: axes = tuple(set(axes.values())) # same axis can have multiple names here
     super(DatasetNetCDF,self).__init__(name=name, title=title, varlist=variables, axes=None, atts=ncattrs)
@@ -854,8 +1192,9 @@ class DatasetNetCDF(Dataset):
     return self.hasAxis(newaxis)        
   
   @ApplyTestOverList
-  def addVariable(self, var, asNC=None, copy=True, loverwrite=False, lautoTrim=False, deepcopy=False):
-    ''' Method to add a new Variable to the Dataset. '''
+  def addVariable(self, var, asNC=None, copy=True, loverwrite=False, lautoTrim=False, deepcopy=False, chunking=None):
+    ''' Method to add a new Variable to the Dataset; 'chunking' overrides the default chunking policy 
+        of the dataset for new NetCDF variables. '''
     if asNC is None: asNC = copy and 'w' in self.mode
     if asNC and 'w' not in self.mode: 
         raise NetCDFError("Cannot add new NetCDF Variables in read-only mode; open in write mode.")
@@ -884,7 +1223,9 @@ class DatasetNetCDF(Dataset):
             if not self.hasAxis(ax.name): 
               self.addAxis(ax, asNC=asNC, copy=copy, loverwrite=loverwrite, deepcopy=deepcopy)
           # add variable as a NetCDF variable             
-          var = asVarNC(var=var,ncvar=self.datasets[0], axes=self.axes, mode=self.mode, deepcopy=deepcopy)
+          if chunking is None: chunking = self.chunking
+          var = asVarNC(var=var,ncvar=self.datasets[0], axes=self.axes, mode=self.mode, deepcopy=deepcopy, 
+                        zlib=self.zlib, chunking=chunking, cache=self.cache)
         else: 
           var = var.copy(deepcopy=deepcopy) # or just add as a normal Variable
       else:
@@ -1011,6 +1352,8 @@ class DatasetNetCDF(Dataset):
     if 'w' in self.mode: self.sync() # 'if mode' is a precaution 
     # close files
     for ds in self.datasets: ds.close()
+    # N.B.: variable keys of the block cache are only unique among open files
+    if self.cache is not None: self.cache.clear()
 
 ## run a test    
 if __name__ == '__main__':
@@ -106,6 +106,142 @@ def shapiro_wrapper(data, reta=False, ignoreNaN=True):
   # N.B.: a only depends on the length of data, so it can be easily reused in array operation
 
 
+## vectorized two-sample kernels
+# N.B.: these functions operate on all grid points at once (along the last axis) and are used by the
+#       wrappers below, if an 'axis' argument is passed (i.e. apply_along_axis with laax=False); NaN's 
+#       are removed like in the wrappers and at least 3 valid values are required for a result
+
+# split merged sample array and move sample axis to the end
+def split_samples(data, size1, axis=-1, ignoreNaN=True):
+  ''' split merged sample array along 'axis' and move sample axis to the end; if ignoreNaN=False,
+      grid points with any NaN's are invalidated entirely (like without vectorization) '''
+  data = np.moveaxis(np.asarray(data, dtype=np.float64), axis, -1)
+  if not ignoreNaN:
+    data = np.where(np.isnan(data).any(axis=-1, keepdims=True), np.NaN, data)
+  return data[...,:size1], data[...,size1:]
+
+# helper function to select vectorized output (with parameter axis last, like the wrappers)
+def select_rho_pval(rho, pval, lrho=True, lpval=False):
+  if lrho and lpval: return np.stack((rho,pval), axis=-1)
+  elif lrho: return rho
+  elif lpval: return pval
+  else: raise ArgumentError
+
+# average ranks along last axis
+def nanrankdata(data):
+  ''' compute average ranks (ties receive the mean rank) along the last axis, ignoring NaN's; also 
+      returns the tie correction term sum(t**3-t) for every row '''
+  shape = data.shape; data = data.reshape((-1,shape[-1])); m,n = data.shape
+  idx = np.argsort(data, axis=-1, kind='mergesort') # NaN's are sorted to the end
+  srt = np.take_along_axis(data, idx, axis=-1)
+  lnew = np.ones(data.shape, dtype=np.bool_); lnew[:,1:] = srt[:,1:] != srt[:,:-1] # NaN's are never equal
+  gid = np.cumsum(lnew, axis=-1) - 1 + np.arange(m)[:,np.newaxis]*n # unique ID for each group of ties
+  cnt = np.bincount(gid.ravel(), minlength=m*n)
+  pos = np.bincount(gid.ravel(), weights=np.tile(np.arange(1,n+1, dtype=np.float64),m), minlength=m*n)
+  ranks = np.empty(data.shape, dtype=np.float64)
+  with np.errstate(invalid='ignore', divide='ignore'):
+    np.put_along_axis(ranks, idx, (pos/cnt)[gid], axis=-1)
+  ranks[np.isnan(data)] = np.NaN
+  ties = ( cnt.astype(np.float64)**3 - cnt ).reshape((m,n)).sum(axis=-1) # NaN's are not tied
+  return ranks.reshape(shape), ties.reshape(shape[:-1])
+
+# helper function to compute sample sizes, means, and variances along the last axis
+def _nanmoments(data):
+  n = np.invert(np.isnan(data)).sum(axis=-1)
+  with np.errstate(invalid='ignore', divide='ignore'):
+    mean = np.nansum(data, axis=-1) / n
+    var = np.nansum((data-mean[...,np.newaxis])**2, axis=-1) / (n-1)
+  return n, mean, var
+
+# vectorized Kolmogorov-Smirnov Test on 2 samples
+def ks_2samp_kernel(data1, data2):
+  ''' Kolmogorov-Smirnov Test on 2 samples along the last axis; the statistic is computed from a sorted
+      merge of both samples and p-values are asymptotic (like scipy.stats.ks_2samp with method='asymp';
+      by default, scipy uses exact p-values for small samples) '''
+  n1 = np.invert(np.isnan(data1)).sum(axis=-1); n2 = np.invert(np.isnan(data2)).sum(axis=-1)
+  data = np.concatenate((data1, data2), axis=-1)
+  with np.errstate(invalid='ignore', divide='ignore'):
+    steps = np.concatenate((np.repeat((1./n1)[...,np.newaxis], data1.shape[-1], axis=-1),
+                            np.repeat((-1./n2)[...,np.newaxis], data2.shape[-1], axis=-1)), axis=-1)
+  steps[np.isnan(data)] = 0. # NaN's are sorted to the end and do not contribute
+  idx = np.argsort(data, axis=-1, kind='mergesort')
+  srt = np.take_along_axis(data, idx, axis=-1)
+  cdiff = np.abs(np.cumsum(np.take_along_axis(steps, idx, axis=-1), axis=-1)) # difference of ECDFs
+  lend = np.ones(srt.shape, dtype=np.bool_); lend[...,:-1] = srt[...,1:] != srt[...,:-1] # end of ties
+  D = np.where(lend, cdiff, 0.).max(axis=-1)
+  lvalid = np.logical_and(n1 >= 3, n2 >= 3)
+  pval = np.zeros(D.shape) + np.NaN
+  en = np.round(n1[lvalid]*n2[lvalid]/(n1[lvalid]+n2[lvalid]).astype(np.float64)) # effective sample size
+  pval[lvalid] = np.clip(ss.kstwo.sf(D[lvalid], en), 0., 1.)
+  return pval
+
+# vectorized Student's T-test for two independent samples
+def ttest_ind_kernel(data1, data2, equal_var=True):
+  ''' Student's T-test (or Welch's T-test) for two independent samples along the last axis '''
+  n1, m1, v1 = _nanmoments(data1); n2, m2, v2 = _nanmoments(data2)
+  with np.errstate(invalid='ignore', divide='ignore'):
+    if equal_var:
+      df = n1 + n2 - 2.
+      denom = np.sqrt( ((n1-1)*v1 + (n2-1)*v2) / df * (1./n1 + 1./n2) )
+    else:
+      vn1 = v1/n1; vn2 = v2/n2
+      df = (vn1 + vn2)**2 / (vn1**2/(n1-1) + vn2**2/(n2-1))
+      denom = np.sqrt(vn1 + vn2)
+    pval = 2. * ss.t.sf(np.abs((m1-m2)/denom), df)
+  pval[np.logical_or(n1 < 3, n2 < 3)] = np.NaN
+  return pval
+
+# vectorized Mann-Whitney Rank Test on 2 samples
+def mannwhitneyu_kernel(data1, data2, use_continuity=True):
+  ''' Mann-Whitney Rank Test on 2 samples along the last axis; returns the one-sided p-value (normal 
+      approximation with tie correction), like the wrapper '''
+  ranks, ties = nanrankdata(np.concatenate((data1, data2), axis=-1))
+  n1 = np.invert(np.isnan(data1)).sum(axis=-1); n2 = np.invert(np.isnan(data2)).sum(axis=-1)
+  n = n1 + n2
+  with np.errstate(invalid='ignore', divide='ignore'):
+    u1 = n1*n2 + n1*(n1+1)/2. - np.nansum(ranks[...,:data1.shape[-1]], axis=-1)
+    bigu = np.maximum(u1, n1*n2 - u1)
+    T = 1. - ties/(n**3 - n).astype(np.float64) # tie correction
+    sd = np.sqrt(T*n1*n2*(n+1)/12.)
+    pval = ss.norm.sf(np.abs((bigu - n1*n2/2. - 0.5*use_continuity)/sd))
+  pval[np.logical_or(np.logical_or(n1 < 3, n2 < 3), T == 0)] = np.NaN # T=0: all values identical
+  return pval
+
+# vectorized Wilcoxon Ranksum Test on 2 samples
+def ranksums_kernel(data1, data2):
+  ''' Wilcoxon Ranksum Test on 2 samples along the last axis (no tie correction) '''
+  ranks, ties = nanrankdata(np.concatenate((data1, data2), axis=-1)); del ties
+  n1 = np.invert(np.isnan(data1)).sum(axis=-1); n2 = np.invert(np.isnan(data2)).sum(axis=-1)
+  with np.errstate(invalid='ignore', divide='ignore'):
+    s = np.nansum(ranks[...,:data1.shape[-1]], axis=-1)
+    z = (s - n1*(n1+n2+1)/2.) / np.sqrt(n1*n2*(n1+n2+1)/12.)
+    pval = 2. * ss.norm.sf(np.abs(z))
+  pval[np.logical_or(n1 < 3, n2 < 3)] = np.NaN
+  return pval
+
+# vectorized Pearson's and Spearman's Correlation Coefficients of 2 samples
+def corrcoef_kernel(data1, data2, lrank=False, dof=None):
+  ''' Pearson's (or Spearman's Rank-order, if lrank=True) Correlation Coefficient and p-value along the
+      last axis; NaN's are removed pairwise; 'dof' has the same meaning as in utils.stats '''
+  lnan = np.logical_or(np.isnan(data1), np.isnan(data2))
+  data1 = np.where(lnan, np.NaN, data1); data2 = np.where(lnan, np.NaN, data2)
+  if lrank: data1 = nanrankdata(data1)[0]; data2 = nanrankdata(data2)[0]
+  n, m1, v1 = _nanmoments(data1); m2 = _nanmoments(data2)[1]
+  with np.errstate(invalid='ignore', divide='ignore'):
+    xm = data1 - m1[...,np.newaxis]; ym = data2 - m2[...,np.newaxis]
+    rho = np.nansum(xm*ym, axis=-1) / np.sqrt(np.nansum(xm**2, axis=-1)*np.nansum(ym**2, axis=-1))
+    rho = np.clip(rho, -1., 1.)
+    if lrank: # same as utils.stats.spearmanr
+      df = ( n if dof is None else dof ) - 2.
+      pval = 2. * ss.t.sf(np.abs(rho * np.sqrt(df / ((rho+1.)*(1.-rho)))), df)
+    else: # same as utils.stats.pearsonr
+      df = n - 2. if dof is None else dof
+      pval = myss._betai(0.5*df, 0.5, df / (df + rho**2 * (df / ((1.-rho)*(1.+rho)))))
+      pval = np.where(np.abs(rho) == 1., 0., pval)
+  lnan = n < 3; rho[lnan] = np.NaN; pval[lnan] = np.NaN
+  return rho, pval
+
+
 ## bivariate statistical tests
     
 # Kolmogorov-Smirnov Test on 2 samples
@@ -117,17 +253,21 @@ def ks_2samp(sample1, sample2, lstatistic=False, ignoreNaN=True, **kwargs):
       distributions (normal and non-normal). '''
   if lstatistic: raise NotImplementedError("Return of test statistic is not yet implemented; only p-values are returned.")
   testfct = functools.partial(ks_2samp_wrapper, ignoreNaN=ignoreNaN)
-  pvar = apply_stat_test_2samp(sample1, sample2, fct=testfct, laax=True, 
+  pvar = apply_stat_test_2samp(sample1, sample2, fct=testfct, laax=False, 
                                lpval=True, lrho=False, **kwargs)
   return pvar
 kstest = ks_2samp # alias
 
 # apply-along-axis wrapper for the Kolmogorov-Smirnov Test on 2 samples
-def ks_2samp_wrapper(data, size1=None, ignoreNaN=True):
+def ks_2samp_wrapper(data, size1=None, axis=None, ignoreNaN=True):
   ''' Apply the Kolmogorov-Smirnov Test, to test whether two samples are drawn from the same
       underlying (continuous) distribution. This is a wrapper for the SciPy function that 
-      removes NaN's, allows application over a field, and only returns the p-value. '''
-  if ignoreNaN:
+      removes NaN's, allows application over a field, and only returns the p-value. 
+      If 'axis' is given, a vectorized implementation is applied along that axis. '''
+  if axis is not None:
+    data1, data2 = split_samples(data, size1, axis=axis, ignoreNaN=ignoreNaN)
+    return ks_2samp_kernel(data1, data2)
+  elif ignoreNaN:
     data1 = data[:size1]; data2 = data[size1:]
     nonans1 = np.invert(np.isnan(data1)) # test for NaN's
     nonans2 = np.invert(np.isnan(data2))
@@ -136,7 +276,7 @@ def ks_2samp_wrapper(data, size1=None, ignoreNaN=True):
   else:
     data1 = data[:size1]; data2 = data[size1:]
   # apply test
-  D, pval = ss.ks_2samp(data1, data2); del D
+  D, pval = ss.ks_2samp(data1, data2, method='asymp'); del D # same p-values as the vectorized kernel
   return pval  
 
 
@@ -145,7 +285,7 @@ def ttest_ind(sample1, sample2, equal_var=True, lstatistic=False, ignoreNaN=True
   ''' Apply the Stundent's T-test for two independent samples, to test whether the samples 
       are drawn from the same underlying (continuous) distribution; a high p-value means, 
       the two samples are likely drawn from the same distribution. 
-      The T-test implementation is vectoriezed (unlike all other tests).'''
+      The T-test implementation is vectorized (like all other tests).'''
   if lstatistic: raise NotImplementedError("Return of test statistic is not yet implemented; only p-values are returned.")
   testfct = functools.partial(ttest_ind_wrapper, ignoreNaN=ignoreNaN, equal_var=equal_var)
   pvar = apply_stat_test_2samp(sample1, sample2, fct=testfct, laax=False, 
@@ -167,9 +307,10 @@ def ttest_ind_wrapper(data, size1=None, axis=None, ignoreNaN=True, equal_var=Tru
   elif axis is None:
     data1 = data[:size1]; data2 = data[size1:]
   else:
-    data1, data2 = np.split(data, [size1], axis=axis)
+    data1, data2 = split_samples(data, size1, axis=axis, ignoreNaN=ignoreNaN)
+    return ttest_ind_kernel(data1, data2, equal_var=equal_var) # NaN-aware
   # apply test
-  D, pval = ss.ttest_ind(data1, data2, axis=axis, equal_var=equal_var); del D
+  D, pval = ss.ttest_ind(data1, data2, equal_var=equal_var); del D
   return pval  
 
 # Mann-Whitney Rank Test on 2 samples
@@ -186,7 +327,7 @@ def mannwhitneyu(sample1, sample2, ignoreNaN=True, lonesided=False, lstatistic=F
   if lstatistic: raise NotImplementedError("Return of test statistic is not yet implemented; only p-values are returned.")
   testfct = functools.partial(mannwhitneyu_wrapper, ignoreNaN=ignoreNaN, 
                               use_continuity=use_continuity)
-  pvar = apply_stat_test_2samp(sample1, sample2, fct=testfct, laax=True, 
+  pvar = apply_stat_test_2samp(sample1, sample2, fct=testfct, laax=False, 
                                lpval=True, lrho=False, **kwargs)
   if not lonesided: # transform to twosided (multiply p-value by 2)
     if isinstance(pvar,Variable): pvar.data_array *= 2.
@@ -198,11 +339,15 @@ def mannwhitneyu(sample1, sample2, ignoreNaN=True, lonesided=False, lstatistic=F
 mwtest = mannwhitneyu # alias
 
 # apply-along-axis wrapper for the Mann-Whitney Rank Test on 2 samples
-def mannwhitneyu_wrapper(data, size1=None, ignoreNaN=True, use_continuity=True, loneside=False):
+def mannwhitneyu_wrapper(data, size1=None, axis=None, ignoreNaN=True, use_continuity=True, loneside=False):
   ''' Apply the Mann-Whitney Rank Test, to test whether two samples are drawn from the same
       underlying (continuous) distribution. This is a wrapper for the SciPy function that 
-      removes NaN's, allows application over a field, and only returns the p-value. '''
-  if ignoreNaN:
+      removes NaN's, allows application over a field, and only returns the p-value. 
+      If 'axis' is given, a vectorized implementation is applied along that axis. '''
+  if axis is not None:
+    data1, data2 = split_samples(data, size1, axis=axis, ignoreNaN=ignoreNaN)
+    return mannwhitneyu_kernel(data1, data2, use_continuity=use_continuity)
+  elif ignoreNaN:
     data1 = data[:size1]; data2 = data[size1:]
     nonans1 = np.invert(np.isnan(data1)) # test for NaN's
     nonans2 = np.invert(np.isnan(data2))
@@ -211,7 +356,10 @@ def mannwhitneyu_wrapper(data, size1=None, ignoreNaN=True, use_continuity=True,
   else:
     data1 = data[:size1]; data2 = data[size1:]
   # apply test
-  D, pval = ss.mannwhitneyu(data1, data2, use_continuity=use_continuity); del D
+  # N.B.: newer versions of SciPy return two-sided p-values by default; the one-sided p-value (for the
+  #       larger U statistic, like the kernel) is computed explicitly, since mannwhitneyu doubles it
+  pval = min(ss.mannwhitneyu(data1, data2, use_continuity=use_continuity, alternative=alternative, 
+                             method='asymptotic')[1] for alternative in ('less','greater'))
   return pval  
 
 
@@ -225,17 +373,21 @@ def ranksums(sample1, sample2, lstatistic=False, ignoreNaN=True, **kwargs):
       Mann-Whitney Test and does not handle ties between ranks. '''
   if lstatistic: raise NotImplementedError("Return of test statistic is not yet implemented; only p-values are returned.")
   testfct = functools.partial(ranksums_wrapper, ignoreNaN=ignoreNaN)
-  pvar = apply_stat_test_2samp(sample1, sample2, fct=testfct, laax=True, 
+  pvar = apply_stat_test_2samp(sample1, sample2, fct=testfct, laax=False, 
                                lpval=True, lrho=False, **kwargs)
   return pvar
 wrstest = ranksums # alias
 
 # apply-along-axis wrapper for the Wilcoxon Ranksum Test on 2 samples
-def ranksums_wrapper(data, size1=None, ignoreNaN=True):
+def ranksums_wrapper(data, size1=None, axis=None, ignoreNaN=True):
   ''' Apply the Wilcoxon Ranksum Test, to test whether two samples are drawn from the same
       underlying (continuous) distribution. This is a wrapper for the SciPy function that 
-      removes NaN's, allows application over a field, and only returns the p-value. '''
-  if ignoreNaN:
+      removes NaN's, allows application over a field, and only returns the p-value. 
+      If 'axis' is given, a vectorized implementation is applied along that axis. '''
+  if axis is not None:
+    data1, data2 = split_samples(data, size1, axis=axis, ignoreNaN=ignoreNaN)
+    return ranksums_kernel(data1, data2)
+  elif ignoreNaN:
     data1 = data[:size1]; data2 = data[size1:]
     nonans1 = np.invert(np.isnan(data1)) # test for NaN's
     nonans2 = np.invert(np.isnan(data2))
@@ -262,19 +414,27 @@ def pearsonr(sample1, sample2, lpval=False, lrho=True, ignoreNaN=True, lstandard
   testfct = functools.partial(pearsonr_wrapper, lpval=lpval, lrho=lrho, ignoreNaN=ignoreNaN,
                               lstandardize=lstandardize, ldetrend=ldetrend, dof=dof,
                               lsmooth=lsmooth, window_len=window_len, window=window)
+  laax = lsmooth or ldetrend # true, if any of these, false otherwise
   rvar = apply_stat_test_2samp(sample1, sample2, fct=testfct, 
-                               lpval=lpval, lrho=lrho, laax=True, **kwargs)
+                               lpval=lpval, lrho=lrho, laax=laax, **kwargs)
   return rvar
 corrcoef = pearsonr
 
 # apply-along-axis wrapper for the Pearson's Correlation Coefficient on 2 samples
-def pearsonr_wrapper(data, size1=None, lpval=False, lrho=True, ignoreNaN=True, lstandardize=False, 
+def pearsonr_wrapper(data, size1=None, axis=None, lpval=False, lrho=True, ignoreNaN=True, lstandardize=False, 
                      lsmooth=False, window_len=11, window='hanning', ldetrend=False, dof=None):
   ''' Compute the Pearson's Correlation Coefficient of two samples. This is a wrapper 
       for the SciPy function allows application over a field, and returns 
-      the correlation coefficient and/or the p-value. '''
+      the correlation coefficient and/or the p-value. 
+      If 'axis' is given, a vectorized implementation is applied along that axis. '''
   # N.B.: the Numpy corrcoef function also only operates on flat arrays 
-  if ignoreNaN:
+  if axis is not None:
+    if lsmooth or ldetrend: raise NotImplementedError("Smoothing and detrending are not vectorized.")
+    # N.B.: standardization does not affect the correlation coefficient
+    data1, data2 = split_samples(data, size1, axis=axis, ignoreNaN=ignoreNaN)
+    rho, pval = corrcoef_kernel(data1, data2, lrank=False, dof=dof)
+    return select_rho_pval(rho, pval, lrho=lrho, lpval=lpval)
+  elif ignoreNaN:
     data1 = data[:size1]; data2 = data[size1:] # find NaN's
     nans1 = np.isnan(data1); nans2 = np.isnan(data2) # remove in both arrays
     nonans = np.invert(np.logical_or(nans1,nans2))
@@ -328,9 +488,14 @@ def spearmanr_wrapper(data, size1=None, axis=None, lpval=False, lrho=True, ignor
   ''' Compute the Spearman's Rank-order Correlation Coefficient of two samples. This is a wrapper 
       for the SciPy function allows application over a field, and returns 
       the correlation coefficient and/or the p-value. 
-      The SciPy implementation works along multiple axes (using Numpy's
-      apply_along_axis), but it is not truly vectorized. '''
-  if axis is None and ignoreNaN:
+      If 'axis' is given, a vectorized implementation is applied along that axis. '''
+  if axis is not None:
+    if lsmooth or ldetrend: raise NotImplementedError("Smoothing and detrending are not vectorized.")
+    # N.B.: standardization does not affect ranks
+    data1, data2 = split_samples(data, size1, axis=axis, ignoreNaN=ignoreNaN)
+    rho, pval = corrcoef_kernel(data1, data2, lrank=True, dof=dof)
+    return select_rho_pval(rho, pval, lrho=lrho, lpval=lpval)
+  elif ignoreNaN:
     data1 = data[:size1]; data2 = data[size1:] # find NaN's
     nans1 = np.isnan(data1); nans2 = np.isnan(data2) # remove in both arrays
     nonans = np.invert(np.logical_or(nans1,nans2))
@@ -338,14 +503,12 @@ def spearmanr_wrapper(data, size1=None, axis=None, lpval=False, lrho=True, ignor
       if lrho and lpval: return np.zeros(2)+np.NaN
       else: return np.NaN # need to conform to output size
     data1 = data1[nonans]; data2 = data2[nonans] # remove NaN's
-  elif axis is None:
-    data1 = data[:size1]; data2 = data[size1:]
   else:
-    data1, data2 = np.split(data, [size1], axis=axis)
+    data1 = data[:size1]; data2 = data[size1:]
   # pre-process data
   if lstandardize: 
-    data1 = standardize(data1, axis=axis, lcopy=False) # apply_stat_test_2samp alread
-    data2 = standardize(data2, axis=axis, lcopy=False) #   makes a copy, no need here
+    data1 = standardize(data1, axis=None, lcopy=False) # apply_stat_test_2samp alread
+    data2 = standardize(data2, axis=None, lcopy=False) #   makes a copy, no need here
   if lsmooth:
     window_len = min(data1.size,window_len) # automatically shring window
     data1 = smooth(data1, window_len=window_len, window=window)
@@ -353,10 +516,9 @@ def spearmanr_wrapper(data, size1=None, axis=None, lpval=False, lrho=True, ignor
   if ldetrend:
     data1 = detrend(data1); data2 = detrend(data2)
   # apply test
-  rho, pval = myss.spearmanr(data1, data2, axis=axis, dof=dof)
+  rho, pval = myss.spearmanr(data1, data2, dof=dof)
   # select output
-  if lrho and lpval: 
-    return np.concatenate((rho.reshape(rho.shape+(1,)),pval.reshape(pval.shape+(1,))), axis=pval.ndim)
+  if lrho and lpval: return np.asarray((rho,pval))
   elif lrho: return rho
   elif lpval: return pval
   else: raise ArgumentError  
@@ -626,6 +788,8 @@ def asDistVar(var, axis='time', dist=None, lflatten=False, name=None, atts=None,
   # create DistVar instance
   if dist.lower() == 'kde': dvar = VarKDE(samples=var.data_array, axis=iaxis, axes=axes, nsamples=nsamples, 
                                           lflatten=lflatten, atts=varatts, **dist_args)
+  elif dist.lower() == 'bkde': dvar = VarBKDE(samples=var.data_array, axis=iaxis, axes=axes, nsamples=nsamples, 
+                                              lflatten=lflatten, atts=varatts, **dist_args)
   elif hasattr(ss,dist):
     dvar = VarRV(dist=dist, samples=var.data_array, axis=iaxis, axes=axes, nsamples=nsamples,
                  lflatten=lflatten, atts=varatts, lcrossval=lcrossval, ncv=ncv, **dist_args)
@@ -1179,6 +1343,164 @@ class VarKDE(DistVar):
     assert cdf.shape == self.shape + (len(support),)
     return cdf
   
+## VarBKDE subclass and helper functions
+
+# N.B.: the binned KDE operates on all grid points at once, so that no per-point kernel objects are 
+#       necessary; the density is estimated on a regular support grid, which is shared by all grid
+#       points (grid bounds are stored with the parameters, so that it survives slicing and copying)
+
+# compute KDE bandwidths for each row of a 2D sample array
+def bkde_bandwidth(samples, bw_method=None):
+  ''' compute Gaussian kernel bandwidths for each row of a 2D sample array (NaN's are ignored); 
+      'bw_method' follows scipy.stats.gaussian_kde: 'scott', 'silverman', a scalar factor, 
+      or a callable that returns the factor as a function of the number of samples '''
+  n = np.isfinite(samples).sum(axis=-1)
+  with np.errstate(invalid='ignore', divide='ignore'):
+    mean = np.nansum(samples, axis=-1) / n
+    std = np.sqrt(np.nansum((samples-mean[:,np.newaxis])**2, axis=-1) / (n-1))
+    if bw_method is None or bw_method == 'scott': factor = n**(-1./5.)
+    elif bw_method == 'silverman': factor = (n*3./4.)**(-1./5.)
+    elif np.isscalar(bw_method) and not isinstance(bw_method,str): factor = np.zeros_like(std) + bw_method
+    elif callable(bw_method): factor = np.asarray(bw_method(n), dtype=np.float64)
+    else: raise ArgumentError("Invalid bandwidth method: '{}'".format(bw_method))
+    bandwidth = factor * std
+  # N.B.: same as gaussian_kde: variance (with ddof=1) scaled by the squared bandwidth factor
+  bandwidth[n < 2] = np.NaN; bandwidth[bandwidth == 0] = np.NaN # degenerate samples
+  return bandwidth
+
+# linear binning of samples onto a regular grid
+def bkde_bin(samples, lo, dx, ngrid):
+  ''' linear binning of the rows of a 2D sample array onto a regular grid; weights are normalized 
+      by the number of valid samples, so that each row sums to one (NaN's are ignored) '''
+  npt = samples.shape[0]
+  valid = np.isfinite(samples)
+  pos = np.where(valid, (samples-lo)/dx, 0.)
+  idx = np.clip(np.floor(pos).astype(np.int64), 0, ngrid-2)
+  wgt = valid / np.maximum(valid.sum(axis=-1),1)[:,np.newaxis]
+  frac = pos - idx; idx += np.arange(npt, dtype=np.int64)[:,np.newaxis]*ngrid # flat index
+  counts = np.bincount(idx.ravel(), weights=((1.-frac)*wgt).ravel(), minlength=npt*ngrid)
+  counts += np.bincount(idx.ravel()+1, weights=(frac*wgt).ravel(), minlength=npt*ngrid)
+  return counts.reshape((npt,ngrid))
+
+# convolve binned samples with Gaussian kernels using FFT
+def bkde_convolve(counts, bandwidth, dx):
+  ''' convolve the rows of binned sample weights with Gaussian kernels of different bandwidth via FFT '''
+  ngrid = counts.shape[-1]; nfft = 2*ngrid # zero-padding prevents wrap-around
+  lags = np.arange(nfft); lags = np.minimum(lags, nfft-lags)*dx # circular/symmetric lags
+  kernel = np.exp(-0.5*(lags[np.newaxis,:]/bandwidth[:,np.newaxis])**2)
+  kernel /= kernel.sum(axis=-1, keepdims=True)*dx # discrete normalization (conserves mass)
+  density = np.fft.irfft(np.fft.rfft(counts, n=nfft, axis=-1) * np.fft.rfft(kernel, axis=-1), n=nfft, axis=-1)
+  return np.maximum(density[:,:ngrid], 0.) # remove round-off errors
+
+# estimate binned KDE from sample array
+def bkde_estimate(samples, bw_method=None, ngrid=512, cut=3., chunksize=1000):
+  ''' estimate the density for each row of a 2D sample array on a shared regular grid; returns 
+      grid bounds and density values (NaN for invalid rows) in a 2D array '''
+  npt = samples.shape[0]
+  params = np.zeros((npt,ngrid+2), dtype=np.float64) + np.NaN
+  bandwidth = bkde_bandwidth(samples, bw_method=bw_method)
+  lvalid = np.isfinite(bandwidth)
+  if np.any(lvalid):
+    # shared grid: cover the samples plus 'cut' bandwidths on either side
+    with np.errstate(invalid='ignore'):
+      lo = np.nanmin(np.nanmin(samples[lvalid], axis=-1) - cut*bandwidth[lvalid])
+      hi = np.nanmax(np.nanmax(samples[lvalid], axis=-1) + cut*bandwidth[lvalid])
+    dx = (hi-lo)/(ngrid-1)
+    params[lvalid,0] = lo; params[lvalid,1] = hi
+    idx = np.where(lvalid)[0]
+    for i in range(0,len(idx),chunksize):
+      chunk = idx[i:i+chunksize]
+      counts = bkde_bin(samples[chunk], lo, dx, ngrid)
+      params[chunk,2:] = bkde_convolve(counts, bandwidth[chunk], dx)
+  return params
+
+# interpolate gridded values to support points
+def bkde_interp(params, values, support, left=0., right=0., fillValue=np.NaN):
+  ''' linear interpolation of gridded values (rows) to support points, using the grid bounds 
+      from the parameter array; values outside the grid are set to 'left' and 'right' '''
+  lo = params[:,0,np.newaxis]; hi = params[:,1,np.newaxis]; ngrid = values.shape[-1]
+  lvalid = np.isfinite(lo)
+  with np.errstate(invalid='ignore'):
+    pos = np.where(lvalid, (support[np.newaxis,:]-lo)*(ngrid-1)/(hi-lo), 0.)
+  idx = np.clip(np.floor(pos).astype(np.int64), 0, ngrid-2); frac = pos - idx
+  res = (1.-frac)*np.take_along_axis(values, idx, axis=-1) + frac*np.take_along_axis(values, idx+1, axis=-1)
+  res[pos < 0] = left; res[pos > ngrid-1] = right
+  res[~lvalid.ravel(),:] = fillValue
+  return res
+
+# cumulative distribution on the grid
+def bkde_cumsum(params):
+  ''' integrate gridded densities with a cumulative sum (trapezoidal rule) and normalize '''
+  density = params[:,2:]; dx = (params[:,1:2] - params[:,0:1]) / (density.shape[-1]-1)
+  cdf = np.zeros_like(density)
+  np.cumsum((density[:,1:]+density[:,:-1])*dx/2., axis=-1, out=cdf[:,1:])
+  with np.errstate(invalid='ignore', divide='ignore'):
+    cdf /= cdf[:,-1:] # N.B.: the grid extends far enough to contain (almost) all mass
+  return cdf
+
+# Subclass of DistVar implementing a binned Kernel Density Estimation
+class VarBKDE(DistVar):
+  ''' 
+    A subclass of DistVar implementing a binned Gaussian Kernel Density Estimation; samples at all grid 
+    points are binned onto a shared support grid and convolved with the kernel via FFT, so that 
+    estimation and evaluation are vectorized; parameters are the grid bounds and gridded densities.
+  ''' 
+  dist_type = 'bkde'
+  
+  # distribution-specific method; should be overloaded by subclass
+  def _estimate_distribution(self, samples, bw_method=None, ngrid=512, cut=3., chunksize=1000, ldebug=False, **kwargs):
+    ''' estimate gridded densities from sample array for all grid points and return parameters as ndarray  '''
+    if ngrid < 2: raise ArgumentError(ngrid)
+    shape = samples.shape[:-1]
+    params = bkde_estimate(samples.reshape((-1,samples.shape[-1])), bw_method=bw_method, ngrid=ngrid, 
+                           cut=cut, chunksize=chunksize)
+    if ldebug: print(("Invalid grid points (binned KDE): {:d}".format(int(np.isnan(params[:,0]).sum()))))
+    return params.reshape(shape+(ngrid+2,))
+  
+  def _flatParams(self):
+    ''' return parameter array as 2D array (grid points x parameters) '''
+    return self.data_array.reshape((-1,self.data_array.shape[-1]))
+
+  # distribution-specific method; should be overloaded by subclass
+  def _density_distribution(self, support):
+    ''' compute PDF at given support points for each grid point and return as ndarray '''
+    params = self._flatParams(); fillValue = self.fillValue or np.NaN
+    pdf = bkde_interp(params, params[:,2:], support, left=0., right=0., fillValue=fillValue)
+    pdf = pdf.reshape(self.shape[:-1]+(len(support),))
+    return pdf
+  
+  # distribution-specific method; should be overloaded by subclass
+  def _resample_distribution(self, support):
+    ''' draw n samples from the distribution for each grid point (inverse CDF) and return as ndarray '''
+    n = len(support) # in order to use _get_dist(), we have to pass a dummy support
+    params = self._flatParams(); fillValue = self.fillValue or np.NaN 
+    npt = params.shape[0]; ngrid = params.shape[1]-2
+    lvalid = np.isfinite(params[:,0])
+    cdf = bkde_cumsum(params)
+    cdf[~lvalid,:] = np.linspace(0,1,ngrid) # dummy values to retain sort order
+    # vectorized search: offset rows, so that the flattened CDF is monotonic
+    offset = 2.*np.arange(npt)[:,np.newaxis]
+    uniform = np.random.uniform(size=(npt,n))
+    idx = np.searchsorted((cdf+offset).ravel(), (uniform+offset).ravel(), side='right').reshape((npt,n))
+    idx = np.clip(idx - np.arange(npt)[:,np.newaxis]*ngrid, 1, ngrid-1)
+    c0 = np.take_along_axis(cdf, idx-1, axis=-1); c1 = np.take_along_axis(cdf, idx, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+      frac = np.where(c1 > c0, (uniform-c0)/(c1-c0), 0.5)
+    dx = (params[:,1:2]-params[:,0:1])/(ngrid-1)
+    samples = params[:,0:1] + dx*(idx-1+np.clip(frac,0,1))
+    samples[~lvalid,:] = fillValue
+    samples = samples.reshape(self.shape[:-1]+(n,)).astype(self.dtype, copy=False)
+    assert np.issubdtype(samples.dtype, self.dtype)
+    return samples
+  
+  # distribution-specific method; should be overloaded by subclass
+  def _cumulative_distribution(self, support):
+    ''' integrate PDF over given support (cumulative sum) to produce a CDF and return as ndarray '''
+    params = self._flatParams(); fillValue = self.fillValue or np.NaN
+    cdf = bkde_interp(params, bkde_cumsum(params), support, left=0., right=1., fillValue=fillValue)
+    cdf = cdf.reshape(self.shape[:-1]+(len(support),))
+    return cdf
+  
 ## VarRV subclass and helper functions
 
 # N.B.: need to define helper functions outside of class definition, otherwise pickle / multiprocessing 
@@ -16,10 +16,11 @@ import scipy.stats as ss
 
 # import modules to be tested
 import utils.nanfunctions as nf
-from utils.nctools import writeNetCDF
-from geodata.misc import isZero, isOne, isEqual, isNumber
+from utils.nctools import writeNetCDF, getChunkSizes, chunk_time
+from geodata.misc import isZero, isOne, isEqual, isNumber, EnsembleError
 from geodata.base import Variable, Axis, Dataset, Ensemble, concatVars, concatDatasets
-from geodata.stats import VarKDE, VarRV, asDistVar
+from geodata.lazy import LazyVar, asLazyVar
+from geodata.stats import VarKDE, VarBKDE, VarRV, asDistVar
 from geodata.stats import kstest, ttest, mwtest, wrstest, pearsonr, spearmanr
 from datasets.common import data_root
 
@@ -140,6 +141,14 @@ class BaseVarTest(unittest.TestCase):
     s = var - rav
     assert isZero(s.data_array)
     del s; gc.collect()
+    # lazy evaluation: expressions are only evaluated (in chunks) when data are requested
+    l = ( asLazyVar(var, chunksize=5) - rav ) * 2 + var
+    assert isinstance(l,LazyVar) and not l.data
+    e = ( var - rav ) * 2 + var
+    assert l.name == e.name and l.units == e.units and l.shape == e.shape
+    assert isEqual(l[1:3], e.data_array[1:3])
+    assert isEqual(l.getArray(), e.getArray()) and l.data
+    del l, e; gc.collect()
     m = var * rav
     assert isEqual(self.data**2, m.data_array)
     if (rav.data_array == 0).any(): # can't divide by zero!
@@ -247,14 +256,20 @@ class BaseVarTest(unittest.TestCase):
         var = self.var(time=slice(0,25), lat=(50,70), lon=(-130,-110))
       t,x,y = var.axes
     #     for dist in ('kde',):
-    if lsimple: dist_list = ('kde','DEFAULT','genextreme','gumbel_r','norm')
-    else: dist_list = ('kde','DEFAULT') # others take longer...
+    if lsimple: dist_list = ('kde','bkde','DEFAULT','genextreme','gumbel_r','norm')
+    else: dist_list = ('kde','bkde','DEFAULT') # others take longer...
     # also get recommendation
     # test distributions
     for dist in dist_list:
       # create VarKDE
       if dist == 'kde': 
         tmp = var.kde(axis=t.name, lflatten=False, ldebug=False)
+      elif dist == 'bkde': 
+        tmp = var.bkde(axis=t.name, lflatten=False, ldebug=False)
+        # the binned KDE should reproduce the SciPy KDE
+        support = np.linspace(*var.limits(), num=10)
+        kde = var.kde(axis=t.name, lflatten=False).PDF(support=support, asVar=False)
+        assert isEqual(tmp.PDF(support=support, asVar=False), kde, masked_equal=True, eps=1.e-2*kde.max())
       elif dist == 'DEFAULT': 
         tmp = var.fitDist(axis=t.name, 
 #                           nsamples=None if lsimple else 5,
@@ -285,7 +300,7 @@ class BaseVarTest(unittest.TestCase):
         isEqual(tmp1[:],tmp2[:])
       print("\n   ***   computed {:s} distribution   ***".format(dist.upper()))
       # some VarRV-specific stuff
-      if dist != 'kde':
+      if dist not in ('kde','bkde'):
         # run simple kstest test
         pval = distvar.fittest(var, asVar=False, lflatten=False, axis=-1, nsamples=None if lsimple else 8)
         assert np.mean(pval) >= 0, pval # this will usually be close to zero, since none of these are normally distributed
@@ -352,7 +367,7 @@ class BaseVarTest(unittest.TestCase):
       assert ma.all(np.diff(cvar.data_array, axis=-1) >= 0.)
       del cvar; gc.collect()
       # test some more distribution functions
-      if dist != 'kde':
+      if dist not in ('kde','bkde'):
         # test additional functions
         if lsimple: tests = ('pdf', 'logpdf', 'cdf', 'logcdf', 'sf', 'logsf', 'ppf', 'isf')
         else: tests = ('ppf',)
@@ -396,8 +411,15 @@ class BaseVarTest(unittest.TestCase):
     assert not ens.hasMember(var.name)
     # test call
     tes = ens(time=slice(0,3,2))
-    assert all(len(tax)==2 for tax in tes.time)      
-      
+    assert all(len(tax)==2 for tax in tes.time)
+    # concurrent execution: results in member order, errors are collected
+    ens.executor = 'thread'; ens.max_workers = 2
+    tes = ens(time=slice(0,3,2))
+    assert all(len(tax)==2 for tax in tes.time)
+    assert [member.name for member in tes] == [member.name for member in ens]
+    assert tes.executor == 'thread'
+    self.assertRaises(EnsembleError, ens.getAxis, 'no_such_axis') # raised by all members
+
   def testGridData(self):
     ''' test interpolation of point data to regular grid'''
     # get test objects
@@ -418,6 +440,22 @@ class BaseVarTest(unittest.TestCase):
         # check
         assert gridvar.hasAxis(x.name) and gridvar.hasAxis(y.name), gridvar
         assert gridvar.shape == (len(t),len(x),len(y)), gridvar
+        # interpolation weights are computed once for all slices and can be cached on disk
+        from scipy.interpolate import griddata
+        from geodata.base import interp_cache
+        var.data_array = rnd.randn(pts,len(t))
+        interp_cache.clear()
+        gridvar = var.gridVar(point_axis=s.name, coord_vars=(xv,yv), grid_axes=(x,y), method='linear', folder=self.folder)
+        gvec = (x[:].reshape((size,1)),y[:].reshape((1,size)))
+        griddat = griddata((xv[:],yv[:]), var.data_array[:,3], gvec, method='linear')
+        assert isEqual(gridvar.data_array[3,:], griddat, masked_equal=True), gridvar
+        # rescaled coordinates have to give the same result as griddata as well
+        rsvar = var.gridVar(point_axis=s.name, coord_vars=(xv,yv), grid_axes=(x,y), method='linear', rescale=True)
+        griddat = griddata((xv[:],yv[:]), var.data_array[:,3], gvec, method='linear', rescale=True)
+        assert isEqual(rsvar.data_array[3,:], griddat, masked_equal=True), rsvar
+        interp_cache.clear() # load weights from disk
+        assert isEqual(var.gridVar(point_axis=s.name, coord_vars=(xv,yv), grid_axes=(x,y), method='linear',
+                                   folder=self.folder).data_array, gridvar.data_array, masked_equal=True)
 
   def testIndexing(self):
     ''' test indexing and slicing '''
@@ -635,6 +673,11 @@ class BaseVarTest(unittest.TestCase):
     assert isEqual(qvar_min.data_array, qvar.data_array.min(axis=var.axisIndex(t.name)))
     assert isEqual(qvar_median.data_array, np.median(qvar.data_array,axis=var.axisIndex(t.name)))
     assert isEqual(qvar_max.data_array, qvar.data_array.max(axis=var.axisIndex(t.name)))
+    # streaming percentiles are exact for short time-series (but ignore missing values)
+    svar = var.percentile((0.,0.50,1.00), asVar=True, axis=t.name, lstream=True, chunksize=5)
+    assert svar.shape == qvar.shape and svar.hasAxis('percentile')
+    qdata = qvar.getArray(unmask=True, fillValue=np.NaN); lvalid = np.isfinite(qdata)
+    assert isEqual(svar.getArray(unmask=True, fillValue=np.NaN)[lvalid], qdata[lvalid])
     del data; gc.collect()
     # reduction fcts. of Variables ignore NaN values
     # test histogram
@@ -683,7 +726,16 @@ class BaseVarTest(unittest.TestCase):
       assert yvar.shape == var.shape[:tax]+(var.shape[0]/12,)+var.shape[tax+1:]
       cvar = var.climMean(lstrict=lstrict)
       assert len(cvar.getAxis('time')) == 12
-      assert cvar.shape == var.shape[:tax]+(12,)+var.shape[tax+1:]      
+      assert cvar.shape == var.shape[:tax]+(12,)+var.shape[tax+1:]
+      # several statistics in one pass
+      stats = [('jj','mean'),('djf','max'),('annual','std'),('mam','sum')]
+      svars = var.seasonalStatistics(stats, lstrict=lstrict)
+      assert [svar.name for svar in svars] == [var.name+'_jj_mean',var.name+'_djf_max',var.name+'_annual_std',var.name+'_mam_sum']
+      assert isEqual(svars[0].getArray(), yvar.getArray(), masked_equal=True)
+      assert isEqual(svars[1].getArray(), var.seasonalMax('djf',asVar=False,lstrict=lstrict), masked_equal=True)
+      assert isEqual(svars[2].getArray(), var.seasonalStd('annual',asVar=False,lstrict=lstrict), masked_equal=True)
+      assert isEqual(svars[3].getArray(), var.seasonalSum('mam',asVar=False,lstrict=lstrict), masked_equal=True)
+      assert all(svar.getAxis('year') is svars[0].getAxis('year') for svar in svars)
     if self.__class__ is BaseVarTest:
       # this only works with a specially prepared data field
       yfake = np.ones((var.shape[0]//12,)+var.shape[1:])
@@ -848,6 +900,11 @@ class BaseVarTest(unittest.TestCase):
     pvar = wrstest(sin, cos, axis='time')
     assert pvar.data_array.mean() < 0.5 # not all tests are that accurate...
     assert pvar.shape == var.shape[1:] # this will usually be close to zero, since none of these are normally distributed
+    # vectorized tests along an axis should agree with tests on individual time-series
+    for test in (kstest, ttest, mwtest, wrstest) if lsimple else ():
+      pvar = test(sin, cos, axis='time', asVar=False)
+      pval = test(sin.data_array[:,0,0], cos.data_array[:,0,0], lflatten=True, asVar=False)
+      assert isEqual(float(pvar[0,0]), float(pval), eps=1.e-6), (test.__name__, pvar[0,0], pval)
     del sin, cos, pvar; gc.collect() # free some memory - these can get large
     
     ## correlation coefficients
@@ -1417,7 +1474,7 @@ class BaseDatasetTest(unittest.TestCase):
   
 
 # import modules to be tested
-from geodata.netcdf import VarNC, AxisNC, DatasetNetCDF
+from geodata.netcdf import VarNC, AxisNC, DatasetNetCDF, DatasetProxy, indexFilename
 
 class NetCDFVarTest(BaseVarTest):  
   
@@ -1637,6 +1694,108 @@ class DatasetNetCDFTest(BaseDatasetTest):
     print(dataset)
     dataset.close()
 
+  def testChunking(self):
+    ''' test chunking policies and compression options for new NetCDF variables '''
+    filename = self.folder + 'test.nc'
+    if os.path.exists(filename): os.remove(filename)
+    # create NetCDF Dataset with time-series chunking as default
+    dataset = DatasetNetCDF(filelist=[filename], mode='w', chunking='timeseries',
+                            zlib=dict(zlib=True, complevel=4, shuffle=True))
+    t = Axis(name='time', units='month', coord=np.arange(24))
+    y = Axis(name='y', units='', coord=np.arange(10)); x = Axis(name='x', units='', coord=np.arange(15))
+    for ax in (t,y,x): dataset.addAxis(ax)
+    data = np.random.randn(24,10,15)
+    dataset.addVariable(Variable(name='ts', units='', axes=(t,y,x), data=data))
+    dataset.addVariable(Variable(name='map', units='', axes=(t,y,x), data=data), chunking='map')
+    assert dataset.ts.ncvar.chunking() == [24,10,15]
+    assert dataset.map.ncvar.chunking() == [1,10,15]
+    assert dataset.map.ncvar.filters()['complevel'] == 4
+    dataset.sync(); dataset.close()
+    # write with writeNetCDF and lossy compression
+    dataset = Dataset(name='test', varlist=[Variable(name='ts', units='', axes=(t,y,x), data=data)])
+    writeNetCDF(dataset, filename, chunking='map', varchunking=dict(ts=dict(time=12)), lsd=2)
+    ncfile = nc.Dataset(filename)
+    assert ncfile.variables['ts'].chunking() == [12,10,15]
+    assert np.allclose(ncfile.variables['ts'][:], data, atol=0.01)
+    ncfile.close()
+    # unlimited or empty time dimensions get a default time chunk
+    assert getChunkSizes(('time','y','x'), (None,10,15), np.float64, chunking='timeseries') == (chunk_time,10,15)
+    assert getChunkSizes(('time','y','x'), (0,10,15), np.float64, chunking='timeseries', timechunk=12) == (12,10,15)
+    if os.path.exists(filename): os.remove(filename)
+
+  def testSlicedAccess(self):
+    ''' test file access through sliced variables (indices are relative to the slice) '''
+    filename = self.folder + 'test.nc'
+    if os.path.exists(filename): os.remove(filename)
+    t = Axis(name='time', units='month', coord=np.arange(24))
+    x = Axis(name='x', units='', coord=np.arange(15))
+    data = np.random.randn(24,15)
+    writeNetCDF(Dataset(name='test', varlist=[Variable(name='ts', units='K', axes=(t,x), data=data)]), filename)
+    for cache in (None,16):
+      dataset = DatasetNetCDF(filelist=[filename], mode='r', cache=cache)
+      svar = dataset.ts(time=slice(12,24), lidx=True)
+      assert not svar.data and svar.shape == (12,15)
+      assert isEqual(svar[:], data[12:24,:])
+      assert isEqual(svar[0:6,:], data[12:18,:])
+      assert isEqual(svar[-3:,2:5], data[21:24,2:5])
+      assert np.isclose(svar[-1,3], data[23,3])
+      assert isEqual(svar[[0,-1],:], data[[12,23],:])
+      # slices with a stride
+      svar = dataset.ts(time=slice(1,24,2), lidx=True)
+      assert svar.shape == (12,15)
+      assert isEqual(svar[2:5,:], data[5:11:2,:])
+      assert isEqual(svar[::-1,:], data[23:0:-2,:])
+      dataset.close()
+    os.remove(filename)
+
+  def testMetadataIndex(self):
+    ''' test construction of a dataset from a persisted metadata index '''
+    filename = self.folder + 'test.nc'
+    if os.path.exists(filename): os.remove(filename)
+    t = Axis(name='time', units='month', coord=np.arange(24))
+    x = Axis(name='x', units='', coord=np.arange(15))
+    data = np.random.randn(24,15)
+    writeNetCDF(Dataset(name='test', varlist=[Variable(name='ts', units='K', axes=(t,x), data=data)]), filename)
+    idxfile = indexFilename(filename, folder=self.folder)
+    if os.path.exists(idxfile): os.remove(idxfile)
+    # first pass creates the index, second pass uses it
+    for i in range(2):
+      dataset = DatasetNetCDF(filelist=[filename], mode='r', lindex=True, index_folder=self.folder)
+      assert os.path.exists(idxfile) and isinstance(dataset.dataset,DatasetProxy)
+      assert dataset.ts.units == 'K' and dataset.ts.shape == data.shape
+      assert isEqual(dataset.time[:], t[:]) and dataset.dataset._dataset is None # file not opened yet
+      assert isEqual(dataset.ts[:], data) and dataset.dataset._dataset is not None
+      dataset.close()
+    # modifying the file invalidates the index
+    ncfile = nc.Dataset(filename, mode='a'); ncfile.variables['x'][:] = np.arange(15)+1; ncfile.close()
+    dataset = DatasetNetCDF(filelist=[filename], mode='r', lindex=True, index_folder=self.folder)
+    assert isEqual(dataset.x[:], np.arange(15)+1)
+    dataset.close()
+    os.remove(idxfile); os.remove(filename)
+
+  def testBlockCache(self):
+    ''' test reading NetCDF data through a block cache '''
+    if self.dataset_name != 'GPCC': return # only implemented for GPCC
+    dataset = DatasetNetCDF(name=self.dataset_name, folder=self.folder, filelist=['gpcc_test/full_data_v6_precip_25.nc'], 
+                            varlist=['p'], varatts=dict(p=dict(name='precip')), cache=16)
+    var = dataset.precip; cache = dataset.cache
+    assert var.cache is cache and not var.data
+    # read the same slices repeatedly (second pass should be served from cache)
+    slcs = [(slice(0,12),slice(None),slice(None)), (5,slice(10,40),slice(None,None,2)), (slice(None),[3,7],[10,2])]
+    for i in range(2):
+      for slc in slcs:
+        data = var[slc]
+        assert np.all(data.mask == self.data[slc].mask)
+        assert isEqual(data.filled(0), self.data[slc].filled(0)) 
+    assert cache.hits > 0 and 0 < cache.nbytes <= cache.memory
+    # slices should also use the cache of the parent
+    svar = var(time=slice(0,12), lidx=True)
+    assert svar.cache is cache
+    assert isEqual(svar[:].filled(0), self.data[0:12,:].filled(0))
+    assert isEqual(svar[:].filled(0), self.data[0:12,:].filled(0)) # repeated access
+    dataset.close()
+    assert len(cache) == 0
+
   def testStringVar(self):
     ''' test behavior of string variables in a netcdf dataset '''
     filename = self.folder + 'test.nc'
@@ -1747,6 +1906,61 @@ class GDALVarTest(NetCDFVarTest):
     # do standard tests
     super(GDALVarTest,self).testIndexing()
 
+  def testShapeMask(self):
+    ''' test rasterization of shapes with fractional coverage and cached masks '''
+    from osgeo import ogr, osr
+    from geodata.gdal import GridDefinition, Shape, ShapeMask, mask_cache
+    folder = workdir + '/shape_masks/'
+    if os.path.exists(folder): shutil.rmtree(folder)
+    os.mkdir(folder)
+    # create a shapefile with a rectangle that partially covers grid cells
+    shpfile = folder + 'rectangle.shp'
+    drv = ogr.GetDriverByName('ESRI Shapefile')
+    ds = drv.CreateDataSource(shpfile)
+    srs = osr.SpatialReference(); srs.ImportFromEPSG(4326)
+    lyr = ds.CreateLayer('rectangle', srs, ogr.wkbPolygon)
+    feat = ogr.Feature(lyr.GetLayerDefn())
+    feat.SetGeometry(ogr.CreateGeometryFromWkt('POLYGON ((2.5 2.5, 5.25 2.5, 5.25 4, 2.5 4, 2.5 2.5))'))
+    lyr.CreateFeature(feat); feat = None; ds = None # write to disk
+    # rasterize on a simple geographic grid
+    griddef = GridDefinition(name='test', projection=None, geotransform=(0,1,0,0,0,1), size=(10,8))
+    shape = Shape(shapefile=shpfile)
+    shpmask = shape.getShapeMask(griddef=griddef, subgrid=4, folder=folder)
+    assert isinstance(shpmask, ShapeMask) and shpmask.mapshape == (8,10)
+    mask = shape.rasterize(griddef=griddef) # burned directly, not cached
+    assert np.all( shpmask.getMask() == mask.astype(np.bool_) )
+    frac = shpmask.getFraction()
+    assert isEqual(frac.sum(), 2.75*1.5), frac.sum() # exact on the sub-grid
+    assert isEqual(frac[3,2], 0.5) and isEqual(frac[2,5], 0.125) and isEqual(frac[3,4], 1.)
+    # cached masks are reused, and can be loaded from disk
+    assert shape.getShapeMask(griddef=griddef, subgrid=4, folder=folder) is shpmask
+    mask_cache.clear()
+    assert len([f for f in os.listdir(folder) if f.endswith('_mask.npz')]) == 1
+    assert np.all( shape.getShapeMask(griddef=griddef, subgrid=4, folder=folder).getFraction() == frac )
+
+  def testStationLocator(self):
+    ''' test batched location of stations on a grid, using a spatial index '''
+    from geodata.gdal import getGridDef, getStationLocator, locator_cache
+    var = self.var
+    griddef = getGridDef(var)
+    locator = getStationLocator(griddef=griddef, xlon=var.xlon, ylat=var.ylat)
+    assert getStationLocator(griddef=griddef, xlon=var.xlon, ylat=var.ylat) is locator
+    # random stations (some outside of the domain)
+    lons = np.random.uniform(-200,200,size=100); lats = np.random.uniform(-100,100,size=100)
+    if not griddef.isProjected:
+      ix, iy, lvalid = locator.query(lons, lats, k=1, lcache=False)
+      lons, lats = locator.transform(lons, lats)
+      for n in range(len(lons)):
+        i = var.xlon.getIndex(lons[n], mode='closest', outOfBounds=True)
+        j = var.ylat.getIndex(lats[n], mode='closest', outOfBounds=True)
+        assert lvalid[n] == ( i is not None and j is not None )
+        if lvalid[n]: assert ix[n,0] == i and iy[n,0] == j
+    # k nearest neighbours are sorted by distance and cached
+    ix, iy, lvalid = locator.query(lons, lats, k=4, folder=workdir)
+    assert ix.shape == (100,4) and iy.shape == (100,4) and lvalid.shape == (100,)
+    assert locator.query(lons, lats, k=4, folder=workdir)[0] is ix
+    locator_cache.clear()
+
   def testMapReduction(self):
     # test mapMean
     var = self.var
@@ -1785,6 +1999,12 @@ class GDALVarTest(NetCDFVarTest):
     #print data.shape, geotransform
     assert data2D.ndim == 2
     assert np.any(data2D.mask), data2D
+    # compare to fast parser (reads directly from gzip stream, without GDAL)
+    data2Dnp, geotransform2Dnp = readASCIIraster(filepath, lgzip=None, lgdal=False, dtype=np.float, lmask=True, 
+                                                 fillValue=None, lgeotransform=True, lna=False)
+    assert np.allclose(geotransform2Dnp, geotransform2D), geotransform2Dnp
+    assert np.all(data2Dnp.mask == data2D.mask)
+    assert np.allclose(data2Dnp.filled(0), data2D.filled(0))
     
 #     ## multi-dimensional case: load a bunch of compressed 2D raster files
 #     file_pattern = ascii_folder+'/CA_hist/rain/{YEAR:04d}/rain_{MONTH:02d}.asc.gz'
@@ -1826,6 +2046,13 @@ class GDALVarTest(NetCDFVarTest):
     assert np.all(data.mask[1,:] == data2D.mask), data.mask[1,:]
     assert np.all(data.mask[2,:] == data2D.mask), data.mask[2,:]
     assert np.all(data.mask[3,:] == True), data.mask[3,:]
+    # load the same variable in parallel
+    pvar = rasterVariable(name='precip', units='mm/day', axes=axes, atts=None, plot=None, dtype=np.float32, 
+                          projection=None, griddef=None, file_pattern=file_pattern, lgzip=None, lgdal=False, 
+                          lmask=True, fillValue=None, lskipMissing=True, year=list(range(1980,1983+1)), 
+                          path_params=dict(NAME='rain'), NP=2)
+    assert np.all(pvar.data_array.mask == data.mask)
+    assert np.allclose(pvar.data_array.filled(0), data.filled(0))
     
   def testWriteASCII(self):
     ''' test function to write Arc/Info ASCII Grid / ASCII raster files '''
@@ -1845,6 +2072,18 @@ class GDALVarTest(NetCDFVarTest):
     filelist = var.ASCII_raster(folder=folder, lcoord=True, formatter=formatter,
                                 prefix=var.atts.long_name, ext='')
     for filepath in filelist: assert os.path.exists(filepath), filepath
+    # direct export without GDAL (same file names and contents, written in parallel)
+    from utils.ascii import exportASCIIraster, readASCIIraster
+    os.mkdir(folder+'direct/')
+    dirlist = exportASCIIraster(var, folder=folder+'direct/', lcoord=True, formatter=formatter,
+                                prefix=var.atts.long_name, ext='', NP=2, lthreads=True, blocksize=3)
+    assert [os.path.basename(filepath) for filepath in dirlist] == [os.path.basename(filepath) for filepath in filelist]
+    for filepath,dirpath in zip(filelist,dirlist):
+      data, geotransform = readASCIIraster(filepath, lgdal=True, lmask=False)
+      ddata, dgeotransform = readASCIIraster(dirpath, lgdal=False, lmask=False)
+      assert np.allclose(data, ddata) and np.allclose(geotransform, dgeotransform)
+    dirlist = exportASCIIraster(var, folder=folder+'direct/', lgzip=True)
+    for filepath in dirlist: assert os.path.exists(filepath) and filepath[-7:] == '.asc.gz', filepath
 
 
 class DatasetGDALTest(DatasetNetCDFTest):  
@@ -1988,6 +2227,38 @@ class DatasetGDALTest(DatasetNetCDFTest):
       # this filename should exist
       filepath = '{:s}/TEST_{:s}_Time_{:04.0f}'.format(folder,self.var.name,dataset.axes['time'][0])
       assert os.path.exists(filepath), filepath
+
+  def testExportASCII(self):
+    ''' test direct export of unloaded NetCDF variables to ASCII raster files '''
+    from utils.ascii import exportASCIIraster, readASCIIraster
+    # write a small NetCDF file (lat/lon grid)
+    filename = self.folder + 'test_ascii.nc'
+    if os.path.exists(filename): os.remove(filename)
+    t = Axis(name='time', units='month', coord=np.arange(7))
+    y = Axis(name='lat', units='deg N', coord=np.linspace(40,50,6))
+    x = Axis(name='lon', units='deg E', coord=np.linspace(-100,-86,8))
+    data = rnd.randn(len(t),len(y),len(x)).astype(np.float32)
+    writeNetCDF(Dataset(name='test', varlist=[Variable(name='test', units='', axes=(t,y,x), data=data)]), filename)
+    dataset = addGDALtoDataset(DatasetNetCDF(filelist=[filename], mode='r'))
+    var = dataset.test
+    assert var.gdal and not var.data
+    # clean/create folder for test data
+    folder = '{:s}/ASCII_raster/'.format(workdir)
+    if os.path.exists(folder): shutil.rmtree(folder)
+    os.mkdir(folder)
+    # blocks that split the time axis are read directly from file
+    filelist = exportASCIIraster(var, folder=folder, NP=2, blocksize=3)
+    assert len(filelist) == len(t) and not var.data
+    for n,filepath in enumerate(filelist):
+      ascii, geotransform = readASCIIraster(filepath, lgdal=False, lmask=False)
+      assert np.allclose(ascii, data[n]), filepath
+    # a variable that was already sliced along the first axis
+    filelist = exportASCIIraster(var(time=slice(2,5)), folder=folder, prefix='sliced', blocksize=2)
+    assert len(filelist) == 3
+    for n,filepath in enumerate(filelist):
+      ascii, geotransform = readASCIIraster(filepath, lgdal=False, lmask=False)
+      assert np.allclose(ascii, data[n+2]), filepath
+    dataset.close()
         
     
 if __name__ == "__main__":
@@ -66,7 +66,26 @@ class MultiProcessTest(unittest.TestCase):
     run_test(test_noaax, kw=1, laax=False) # without Numpy's apply_along_axis
     run_test(test_aax, kw=1, laax=True) # Numpy's apply_along_axis
 
-  
+  def testPersistentPool(self):
+    ''' test reuse of the worker pool and shared memory transport in apply_along_axis '''
+    from processing import multiprocess
+    from processing.multiprocess import apply_along_axis, test_aax, closePool
+    import functools
+    ff = functools.partial(test_aax, kw=1)
+    data = np.arange(50000, dtype='float').reshape((500,100))
+    res = np.apply_along_axis(ff, 1, data)
+    # shared memory and pickled chunks, using the same pool
+    pres = apply_along_axis(ff, 1, data, NP=NP, lshared=True)
+    pool = multiprocess.worker_pool
+    assert pool is not None
+    assert isEqual(pres, res)
+    pres = apply_along_axis(ff, 1, data, NP=NP, lshared=False)
+    assert multiprocess.worker_pool is pool
+    assert isEqual(pres, res)
+    # shut down pool
+    closePool()
+    assert multiprocess.worker_pool is None
+
   def testAsyncPool(self):
     ''' test asyncPool wrapper '''    
     from processing.multiprocess import asyncPoolEC, test_func_dec, test_func_ec
@@ -78,6 +97,37 @@ class MultiProcessTest(unittest.TestCase):
     assert ec == 4
     ec = asyncPoolEC(test_func_ec, args, kwargs, NP=NP, ldebug=ldebug, ltrialnerror=False)
     assert ec == 0
+
+  def testJobScheduler(self):
+    ''' test dependency-aware job scheduler with memory budget and state file '''
+    from processing.scheduler import JobScheduler, Job
+    from processing.multiprocess import test_func_ec
+    statefile = 'test_scheduler_state.json'
+    if os.path.exists(statefile): os.remove(statefile)
+    kwargs = dict(wait=1)
+    # job 'b' fails (exit code 1), so that 'c' has to be skipped
+    jobs = [Job('a', test_func_ec, args=(0,), kwargs=kwargs, memory=100),
+            Job('b', test_func_ec, args=(1,), kwargs=kwargs, depends='a', memory=100),
+            Job('c', test_func_ec, args=(0,), kwargs=kwargs, depends='b'),
+            Job('d', test_func_ec, args=(0,), kwargs=kwargs, memory=150)]
+    scheduler = JobScheduler(jobs, statefile=statefile)
+    ec = scheduler.run(NP=NP, memory=200, ldebug=ldebug)
+    assert ec == 2
+    assert scheduler.jobs['c'].state == 'skipped' and scheduler.jobs['d'].state == 'done'
+    # resume: completed jobs are not repeated
+    jobs = [Job('a', test_func_ec, args=(1,), kwargs=kwargs), # would fail, if it was repeated
+            Job('c', test_func_ec, args=(0,), kwargs=kwargs, depends='a')]
+    ec = JobScheduler(jobs, statefile=statefile).run(NP=NP, ldebug=ldebug)
+    assert ec == 0
+    os.remove(statefile)
+    # a job whose worker is killed (e.g. by the OOM killer) fails and its dependencies are skipped
+    from processing.multiprocess import test_func_kill
+    jobs = [Job('a', test_func_kill, args=(0,)), Job('b', test_func_ec, args=(0,), kwargs=kwargs, depends='a'),
+            Job('c', test_func_ec, args=(0,), kwargs=kwargs)]
+    scheduler = JobScheduler(jobs)
+    assert scheduler.run(NP=NP, ldebug=ldebug, timeout=1) == 2
+    assert scheduler.jobs['a'].state == 'failed' and scheduler.jobs['b'].state == 'skipped'
+    assert scheduler.jobs['c'].state == 'done'
     
 
   
@@ -157,7 +207,25 @@ class DatasetsTest(unittest.TestCase):
         assert args['arg5'] == arg5
         n += 1
     assert n == len(arg_list)
-    
+
+  def testSelectElements(self):
+    ''' test selection of common elements (e.g. stations) from several datasets '''
+    from datasets.common import selectElements
+    # three datasets with overlapping station axes (ascending and descending)
+    coords = ([1,3,5,7,9], [1,2,3,4,5,6,7,8], [9,7,5,3,0])
+    datasets = []
+    for i,coord in enumerate(coords):
+      stn = Axis(name='station', units='#', coord=np.asarray(coord))
+      var = Variable(name='stn_zs', units='m', axes=(stn,), data=np.asarray(coord, dtype=np.float64)*100.)
+      datasets.append(Dataset(name='test{:d}'.format(i), varlist=[var]))
+    selected = selectElements(datasets, axis='station')
+    for ds in selected: assert np.all(ds.getAxis('station').coord == (3,5,7))
+    # element-wise and vectorized test functions should give the same result
+    testFct = lambda idx, ds, axis: ds.stn_zs.data_array[idx] < 600.
+    selected = selectElements(datasets, axis='station', testFct=testFct, lall=True)
+    selected += selectElements(datasets, axis='station', testFct=testFct, lall=True, lvectorized=True)
+    for ds in selected: assert np.all(ds.getAxis('station').coord == (3,5))
+
 #   def testLoadDataset(self):
 #     ''' test universal dataset loading function '''
 #     from datasets.common import loadDataset
@@ -313,6 +381,127 @@ class DatasetsTest(unittest.TestCase):
     #  -> /home/data/Code/PyGeoData/src/utils/nanfunctions.py
     # But diff first, to check for actual updates!
     # P/S at the moment I'm importing the custom nanfunctions directly
+
+  def testArchiveCatalog(self):
+    ''' test SQLite archive catalog with incremental rescans and fast-path lookups '''
+    import utils.catalog as catalog
+    import netCDF4 as nc
+    import shutil, tempfile
+    folder = tempfile.mkdtemp()
+    def writeFile(filename, varlist):
+      with nc.Dataset(os.path.join(folder,filename), mode='w') as ncfile:
+        ncfile.createDimension('time', 12)
+        for varname in varlist: ncfile.createVariable(varname, 'f4', ('time',))
+    writeFile('wrfsrfc_d01_arb2_clim_1979-1994.nc', ['T2','precip'])
+    writeFile('wrfsrfc_d01_monthly.nc', ['T2'])
+    os.mkdir(os.path.join(folder,'sub')); writeFile('sub/cru_clim_1979-2009.nc', ['precip'])
+    archive = catalog.ArchiveCatalog(os.path.join(folder,'catalog.db'))
+    assert archive.scan(folder, dataset='WRF', experiment='test', lrecursive=True, lvariables=True) == 3
+    entry = archive.lookup(os.path.join(folder,'wrfsrfc_d01_arb2_clim_1979-1994.nc'))
+    assert entry['mode'] == 'climatology' and entry['grid'] == 'arb2' and entry['period'] == '1979-1994'
+    assert entry['domain'] == 'd01' and entry['variables'] == ['T2','precip']
+    assert archive.query(dataset='WRF', variable='precip', mode='climatology') == [entry['path']]
+    assert len(archive.query(variable='precip')) == 2 # also in sub-folder
+    # incremental rescan: only new or vanished files are updated
+    assert archive.scan(folder, lrecursive=True) == 0
+    os.remove(os.path.join(folder,'wrfsrfc_d01_monthly.nc'))
+    writeFile('sub/cru_monthly.nc', ['precip'])
+    assert archive.scan(folder, lrecursive=True) == 2
+    assert archive.lookup(os.path.join(folder,'wrfsrfc_d01_monthly.nc')) == dict() # scanned, but missing
+    assert archive.lookup('/no/such/folder/file.nc') is None # not in catalog
+    open(os.path.join(folder,'grid.pickle'), 'w').close() # does not match the scan pattern
+    assert archive.lookup(os.path.join(folder,'grid.pickle')) is None
+    # fast-path functions use the default catalog
+    catalog.setCatalog(archive)
+    try:
+      filepath = os.path.join(folder,'sub','cru_monthly.nc')
+      assert catalog.fileExists(filepath) and not catalog.fileExists(os.path.join(folder,'missing.nc'))
+      assert catalog.getModTime(filepath) == os.path.getmtime(filepath)
+      assert catalog.fileExists(__file__) # falls back to file system
+      filepath = os.path.join(folder,'grid.pickle') # not covered by the scan pattern
+      assert catalog.getModTime(filepath) == os.path.getmtime(filepath)
+      assert not catalog.updateFile(filepath) and catalog.fileExists(filepath)
+      writeFile('new_clim.nc', ['T2'])
+      assert not catalog.fileExists(os.path.join(folder,'new_clim.nc')) # catalog is stale...
+      catalog.updateFile(os.path.join(folder,'new_clim.nc')) # ... until the file is registered
+      assert catalog.fileExists(os.path.join(folder,'new_clim.nc'))
+    finally: catalog.setCatalog(None)
+    shutil.rmtree(folder)
+
+
+## tests for bias correction methods
+class BiasCorrectionTest(unittest.TestCase):  
+   
+  def setUp(self):
+    ''' create a monthly time-series and monthly climatologies '''
+    self.nyears = 10
+    time = Axis(name='time', units='month', coord=np.arange(self.nyears*12))
+    clim = Axis(name='time', units='month', coord=np.arange(1,13))
+    y = Axis(name='y', units='', coord=np.arange(4)); x = Axis(name='x', units='', coord=np.arange(5))
+    shape = (len(time),len(y),len(x))
+    # one ratio variable (fluxes) and one difference variable
+    self.data = dict(T2=np.random.randn(*shape)+273.15, precip=np.random.rand(*shape))
+    varlist = [Variable(name=name, units=units, axes=(time,y,x), data=self.data[name]) 
+               for name,units in (('T2','K'),('precip','mm/day'))]
+    varlist.append(Variable(name='zs', units='m', axes=(y,x), data=np.random.rand(len(y),len(x))))
+    self.dataset = Dataset(name='test', varlist=varlist)
+    def climDataset(name, scale):
+      return Dataset(name=name, varlist=[Variable(name=name, units=units, axes=(clim,y,x), 
+                                                  data=np.random.rand(12,len(y),len(x))+scale) 
+                                         for name,units in (('T2','K'),('precip','mm/day'))])
+    self.model = climDataset('model', 1.); self.obs = climDataset('obs', 2.)
+    self.obs.name = 'obs'; self.obs.title = 'Observations'
+      
+  def tearDown(self):
+    ''' clean up '''
+    gc.collect()
+
+  def testDeltaCorrectArray(self):
+    ''' test broadcasting of monthly corrections against the tiled (extended) climatology '''
+    from processing.bc_methods import Delta
+    bc = Delta(varlist=['T2','precip'])
+    bc.train(self.model, self.obs)
+    assert bc._operation == dict(T2='diff', precip='ratio')
+    for varname in ('T2','precip'):
+      var = self.dataset[varname]; correction = bc._correction[varname]
+      extended = bc._extendClim(correction, var, 'time')
+      if bc._operation[varname] == 'ratio': expected = var.data_array * extended
+      else: expected = var.data_array + extended
+      assert isEqual(bc._correctArray(var.data_array, varname, tidx=0), expected)
+      assert isEqual(bc._correctVar(var, time_axis='time'), expected)
+      # time axis in the middle
+      data = np.moveaxis(var.data_array, 0, 1); tcorr = np.moveaxis(correction, 0, 1)
+      tvar = Variable(name=varname, units=var.units, axes=(var.axes[1],var.axes[0],var.axes[2]), data=data)
+      extended = bc._extendClim(tcorr, tvar, 'time')
+      if bc._operation[varname] == 'ratio': expected = data * extended
+      else: expected = data + extended
+      bc._correction[varname] = tcorr
+      assert isEqual(bc._correctArray(data, varname, tidx=1), expected)
+      bc._correction[varname] = correction
+
+  def testCorrectNC(self):
+    ''' test streaming bias correction of a NetCDF dataset in chunks along the time axis '''
+    from processing.bc_methods import Delta
+    from geodata.netcdf import DatasetNetCDF
+    import shutil, tempfile
+    folder = tempfile.mkdtemp()
+    filename = os.path.join(folder,'test_monthly.nc')
+    writeNetCDF(self.dataset, filename)
+    bc = Delta(varlist=['T2','precip'])
+    bc.train(self.model, self.obs)
+    dataset = DatasetNetCDF(filelist=[filename], mode='r')
+    # chunks of two years split the record (or five years, if the file stores single precision)
+    stepsize = dataset.T2.dtype.itemsize*4*5/1024.**2 # one time step in MB
+    bcds = bc.correctNC(dataset, os.path.join(folder,'test_bc_monthly.nc'), chunksize=30*stepsize)
+    assert not dataset.T2.data and not bcds.T2.data
+    for varname in ('T2','precip'):
+      assert bcds[varname].atts['bc_method'] == bc.name
+      expected = bc._correctVar(self.dataset[varname], time_axis='time')
+      assert isEqual(bcds[varname][:], expected, masked_equal=True), varname
+    assert isEqual(bcds.zs[:], self.dataset.zs.data_array, masked_equal=True) # just copied
+    assert bcds.atts['bc_obs_name'] == 'obs'
+    bcds.close(); dataset.close()
+    shutil.rmtree(folder)
     
     
 if __name__ == "__main__":
@@ -322,7 +511,11 @@ if __name__ == "__main__":
 #     specific_tests += ['ApplyAlongAxis']
 #     specific_tests += ['AsyncPool']    
 #     specific_tests += ['ExpArgList']
+#     specific_tests += ['SelectElements']
 #     specific_tests += ['LoadStandardDeviation']
+#     specific_tests += ['ArchiveCatalog']
+#     specific_tests += ['DeltaCorrectArray']
+#     specific_tests += ['CorrectNC']
 
 ## N.B.: these three tests are currently commented out and need to be revised completely;
 ##       most of the dataset/ensemble loading functionality is no handled in the Projects repo
@@ -335,6 +528,7 @@ if __name__ == "__main__":
     # list of variable tests
     tests += ['MultiProcess']
     tests += ['Datasets'] 
+    tests += ['BiasCorrection']
     
 
     # construct dictionary of test classes defined above
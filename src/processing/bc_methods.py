@@ -15,7 +15,7 @@ import pandas as pd
 from warnings import warn
 # internal imports
 from geodata.misc import isEqual, DataError, VariableError
-from geodata.netcdf import DatasetNetCDF, VarNC
+from geodata.netcdf import DatasetNetCDF, VarNC, asDatasetNC
 
 
 # some helper stuff for validation
@@ -163,16 +163,7 @@ class BiasCorrection(object):
             bcds = dataset.copy(axesdeep=True, varsdeep=False) # make a copy, but don't duplicate data
             
         # prepare variable map, so we can iterate easily
-        itermap = dict()
-        for varname in bcds.variables.keys():
-            if hasattr(self,'_correct_'+varname): 
-                itermap[varname] = '_correct_by_built-in_method'
-            elif varname in self._correction: 
-                itermap[varname] = varname
-            elif varmap is not None and varname in varmap:
-                if varmap[varname] in self._correction: 
-                  itermap[varname] = varmap[varname]
-            
+        itermap = self._getIterMap(bcds, varmap=varmap)
 
         # loop over variables in soon-to-be bias-corrected dataset
         for varname,bcvar in itermap.items():
@@ -197,29 +188,102 @@ class BiasCorrection(object):
                         # load corrected data
                         newvar.load(corrected_array)
                 # save meta data about bias correction
-                newvar.atts['bc_method']    = self.name
-                newvar.atts['bc_long_name'] = self.long_name
-                newvar.atts['bc_version']   = self.version
-                newvar.atts['bc_variable']  = bcvar
-                if varname in self.var_notes: 
-                    newvar.atts['bc_note']  = self.var_notes[varname]
-                elif bcvar in self.var_notes: 
-                    newvar.atts['bc_note']  = self.var_notes[bcvar]
-                else:
-                    newvar.atts['bc_note']  = ''
-                newvar.atts['bc_obs_name']  = self.obs_name
-                newvar.atts['bc_obs_title'] = self.obs_title
+                self._addVarAtts(newvar, varname, bcvar)
                 if newvar is not bcds[varname]: 
                     bcds[varname] = newvar # attach new (non-NC) var
         # save meta data about bias correction
+        self._addDatasetAtts(bcds)
+        # return bias-corrected dataset
+        return bcds
+    
+    def correctNC(self, dataset, filename, varlist=None, varmap=None, time_axis='time', chunksize=500, **kwargs):
+        ''' apply bias correction to a NetCDF dataset and write the result to a new NetCDF file; variables are 
+            streamed in chunks of whole years along the time axis (of approximately 'chunksize' MB), so that 
+            they never have to be loaded entirely; returns the new DatasetNetCDF (not loaded) '''
+        if not isinstance(dataset,DatasetNetCDF): raise TypeError(dataset)
+        # create new file with the same structure and coordinates (unloaded variables are not written)
+        # N.B.: DatasetNetCDF.copy would either load all data or skip the coordinates
+        bcds = asDatasetNC(dataset, ncfile=filename, mode='wr')
+        itermap = self._getIterMap(bcds, varmap=varmap)
+        # loop over variables and stream data into new file
+        for varname,oldvar in dataset.variables.items():
+            newvar = bcds[varname]
+            bcvar = itermap.get(varname,None) if varlist is None or varname in varlist else None
+            if bcvar == '_correct_by_built-in_method':
+                # custom correction methods operate on entire datasets
+                fctname = '_correct_'+varname
+                newvar.load(getattr(self, fctname)(varname=varname, dataset=dataset, time_axis=time_axis, **kwargs))
+                newvar.sync(); newvar.unload()
+            elif bcvar is not None and self._correction[bcvar] is not None:
+                # use default correction (scale of shift based on units), one chunk at a time
+                self._streamVar(oldvar, newvar, varname=bcvar, time_axis=time_axis, chunksize=chunksize)
+            else: 
+                self._streamVar(oldvar, newvar, varname=None, time_axis=time_axis, chunksize=chunksize) # just copy
+            if bcvar is not None: self._addVarAtts(newvar, varname, bcvar)
+        # save meta data about bias correction
+        self._addDatasetAtts(bcds)
+        bcds.sync()
+        # return bias-corrected dataset
+        return bcds
+    
+    def _streamVar(self, oldvar, newvar, varname=None, time_axis='time', chunksize=500):
+        ''' copy data from a VarNC to a new VarNC in chunks of whole years along the time axis and apply 
+            bias correction to each chunk (unless varname is None) '''
+        if oldvar.data or oldvar.strvar or not oldvar.hasAxis(time_axis):
+            # small or already loaded variables are copied at once
+            data = oldvar.getArray(unmask=False, copy=False) if oldvar.data else oldvar[:]
+            tidx = oldvar.axisIndex(time_axis) if oldvar.hasAxis(time_axis) else 0
+            if varname is not None: data = self._correctArray(data, varname=varname, tidx=tidx)
+            newvar.load(data); newvar.sync(); newvar.unload()
+        else:
+            tidx = oldvar.axisIndex(time_axis); tlen = oldvar.shape[tidx]
+            # chunk length in whole years, so that the monthly correction can be broadcast
+            stepsize = oldvar.dtype.itemsize * np.prod(oldvar.shape, dtype=np.float64) / tlen / (1024.*1024.) # in MB
+            nchk = max(1, int(chunksize/stepsize/12))*12 if stepsize > 0 else tlen
+            for i in range(0,tlen,nchk):
+                slcs = [slice(None)]*oldvar.ndim; slcs[tidx] = slice(i,min(i+nchk,tlen))
+                data = oldvar[tuple(slcs)] # read directly from file
+                if varname is not None: data = self._correctArray(data, varname=varname, tidx=tidx)
+                newvar.ncvar[tuple(slcs)] = data
+                del data
+            newvar.ncvar.group().sync()
+    
+    def _getIterMap(self, dataset, varmap=None):
+        ''' determine which variables will be corrected and which correction will be applied to them '''
+        itermap = dict()
+        for varname in dataset.variables.keys():
+            if hasattr(self,'_correct_'+varname): 
+                itermap[varname] = '_correct_by_built-in_method'
+            elif varname in self._correction: 
+                itermap[varname] = varname
+            elif varmap is not None and varname in varmap:
+                if varmap[varname] in self._correction: 
+                  itermap[varname] = varmap[varname]
+        return itermap
+    
+    def _addVarAtts(self, newvar, varname, bcvar):
+        ''' save meta data about bias correction in variable attributes '''
+        newvar.atts['bc_method']    = self.name
+        newvar.atts['bc_long_name'] = self.long_name
+        newvar.atts['bc_version']   = self.version
+        newvar.atts['bc_variable']  = bcvar
+        if varname in self.var_notes: 
+            newvar.atts['bc_note']  = self.var_notes[varname]
+        elif bcvar in self.var_notes: 
+            newvar.atts['bc_note']  = self.var_notes[bcvar]
+        else:
+            newvar.atts['bc_note']  = ''
+        newvar.atts['bc_obs_name']  = self.obs_name
+        newvar.atts['bc_obs_title'] = self.obs_title
+    
+    def _addDatasetAtts(self, bcds):
+        ''' save meta data about bias correction in dataset attributes '''
         bcds.atts['bc_method']    = self.name
         bcds.atts['bc_long_name'] = self.long_name
         bcds.atts['bc_version']   = self.version
         bcds.atts['bc_note']      = self.note
         bcds.atts['bc_obs_name']  = self.obs_name
         bcds.atts['bc_obs_title'] = self.obs_title
-        # return bias-corrected dataset
-        return bcds
     
     def _correctVar(self, var, varname=None, **kwargs):
         ''' apply bias correction to new variable and return bias-corrected data;
@@ -227,6 +291,11 @@ class BiasCorrection(object):
         if varname is None: varname = var.name # allow for variable mapping
         return var.data_array # do nothing, just return input
     
+    def _correctArray(self, data, varname, tidx=0):
+        ''' apply bias correction to a chunk of data (containing whole years, if the time axis is monthly); 
+            this method should be implemented for each method '''
+        return data # do nothing, just return input
+    
     def _getVarlist(self, dataset, observations):
         ''' find all valid candidate variables for bias correction present in both input datasets '''
         varlist = []
@@ -322,6 +391,7 @@ class Delta(BiasCorrection):
     
     def _extendClim(self, correction, var, time_axis):
         # extend monthly normal correction factors to multiple years
+        # N.B.: this materializes the full-length correction; _correctArray broadcasts instead
         tidx = var.axisIndex(time_axis)
         assert var.ndim == correction.ndim, var
         assert correction.shape[tidx] == 12
@@ -351,18 +421,35 @@ class Delta(BiasCorrection):
             raise ValueError("No bias-correction values were found for variable '{}'.".format(varname))
         if '_operation' not in self.__dict__:
             warn("The '_operation' dictionary was not found in the BiasCorrection instance '{}';\n it is likely an older version of the Class and should be recomputed.")
-        # format correction
+        # apply correction by broadcasting (without extending the climatology)
+        data = self._correctArray(var.data_array, varname=varname, tidx=var.axisIndex(time_axis))
+        # return bias-corrected data (copy)
+        return data
+    
+    def _correctArray(self, data, varname, tidx=0, out=None):
+        ''' apply the monthly correction to an array with whole years along the time axis (tidx); the time 
+            axis is viewed as (years,12), so that the correction can be broadcast without tiling '''
         correction = self._correction[varname]
-        if isinstance(correction,np.ndarray):
-            correction = self._extendClim(correction, var, time_axis)
+        if isinstance(correction,np.ndarray) and correction.ndim > 0:
+            assert data.ndim == correction.ndim, data.shape
+            assert correction.shape[tidx] == 12
+            if data.shape[tidx]%12 != 0: 
+                raise DataError("Time axis has to contain whole years: {}".format(data.shape))
+            shape = data.shape
+            # insert a years dimension in front of the month dimension
+            data = data.reshape(shape[:tidx]+(shape[tidx]//12,12)+shape[tidx+1:])
+            correction = correction.reshape(correction.shape[:tidx]+(1,12)+correction.shape[tidx+1:])
+            if out is not None: out = out.reshape(data.shape)
+        else: shape = None
         # decide between difference or ratio based on variable type
         if self._operation[varname] == 'ratio': # ratio for fluxes
-            data = var.data_array * correction
+            data = np.multiply(data, correction, out=out)
         elif self._operation[varname] == 'diff': # default behavior is differences
-            data = var.data_array + correction
+            data = np.add(data, correction, out=out)
         else:
             raise ValueError(self._operation[varname])
-        # return bias-corrected data (copy)
+        # restore original shape
+        if shape is not None: data = data.reshape(shape)
         return data
       
     def correctionByTime(self, varname, time, ldt=True, time_idx=0, **kwargs):
@@ -663,4 +750,4 @@ class MyBC(AABC):
             if self._snwmlt is None:
                 self._correct_snwmlt(varname=varname, dataset=dataset, time_axis=time_axis, **kwargs)
             self._liqwatflx = self._liqprec + self._snwmlt
-        return self._liqwatflx
\ No newline at end of file
+        return self._liqwatflx
\ No newline at end of file
@@ -24,6 +24,7 @@ from utils.nctools import writeNetCDF
 # new variable functions and bias-correction 
 import processing.newvars as newvars
 from processing.bc_methods import findPicklePath
+from utils.ascii import exportASCIIdataset
 
 ## helper classes to handle different file formats
 
@@ -114,6 +115,11 @@ class ASCII_raster(FileFormat):
   def __init__(self, project=None, folder=None, prefix=None, bc_method=None, **expargs):
     ''' take arguments that have been passed from caller and initialize parameters '''
     self.project = project; self.folder_pattern = folder; self.prefix_pattern = prefix; self.bc_method = bc_method
+    # options for the direct exporter (lgdal=True uses the recursive GDAL-based exporter instead)
+    self.lgdal = expargs.pop('lgdal',False)
+    self.writer_arguments = {key:expargs.pop(key) for key in ('NP','lthreads','lgzip','fmt','blocksize') if key in expargs}
+    if self.lgdal and self.writer_arguments: 
+      raise ArgumentError("Options {} are not supported by the GDAL exporter.".format(list(self.writer_arguments.keys())))
     self.export_arguments = expargs
   
   @property
@@ -203,7 +209,11 @@ class ASCII_raster(FileFormat):
   def exportDataset(self, dataset):
     ''' method to write a Dataset instance to disk in the given format; this will be format specific '''
     # export dataset to raster format
-    filedict = dataset.ASCII_raster(prefix=self.prefix, varlist=None, folder=self.folder, **self.export_arguments)
+    if self.lgdal: # one GDAL dataset per file
+      filedict = dataset.ASCII_raster(prefix=self.prefix, varlist=None, folder=self.folder, **self.export_arguments)
+    else: # format blocks of rasters directly and write files concurrently
+      filedict = exportASCIIdataset(dataset, prefix=self.prefix, varlist=None, folder=self.folder, 
+                                    **dict(self.export_arguments, **self.writer_arguments))
     # check first and last
     if not os.path.exists(list(filedict.values())[0][0]): raise IOError(list(filedict.values())[0][0]) # random check
     if not os.path.exists(list(filedict.values())[-1][-1]): raise IOError(list(filedict.values())[-1][-1]) # random check
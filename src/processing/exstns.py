@@ -22,6 +22,7 @@ from datasets import gridded_datasets
 from processing.multiprocess import asyncPoolEC
 from processing.process import CentralProcessingUnit
 from processing.misc import getMetaData, getTargetFile, getExperimentList, loadYAML
+from utils.catalog import fileExists, getModTime, getFileSize, updateFile
 
 
 # worker function that is to be passed to asyncPool for parallel execution; use of the decorator is assumed
@@ -75,11 +76,11 @@ def performExtraction(dataset, mode, stnfct, dataargs, loverwrite=False, varlist
       tmpfilename = tmppfx + filename      
     filepath = avgfolder + filename
     tmpfilepath = avgfolder + tmpfilename
-    if os.path.exists(filepath): 
+    if fileExists(filepath): # N.B.: uses archive catalog, if available
       if not loverwrite: 
-        age = datetime.fromtimestamp(os.path.getmtime(filepath))
+        age = datetime.fromtimestamp(getModTime(filepath))
         # if source file is newer than sink file or if sink file is a stub, recompute, otherwise skip
-        if age > srcage and os.path.getsize(filepath) > 1e5: lskip = True
+        if age > srcage and getFileSize(filepath) > 1e5: lskip = True
         # N.B.: NetCDF files smaller than 100kB are usually incomplete header fragments from a previous crashed
 
   
@@ -140,6 +141,7 @@ def performExtraction(dataset, mode, stnfct, dataargs, loverwrite=False, varlist
         sink.unload(); sink.close(); del sink # destroy all references 
         if os.path.exists(filepath): os.remove(filepath) # remove old file
         os.rename(tmpfilepath,filepath)
+        updateFile(filepath) # register new file with archive catalog
       # N.B.: there is no temporary file if the dataset is returned, because an open file can't be renamed
         
     # clean up and return
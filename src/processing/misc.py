@@ -16,6 +16,7 @@ from datetime import datetime
 from geodata.misc import DatasetError, DateError, isInt, ArgumentError
 from utils.misc import namedTuple
 from datasets.common import getFileName
+from utils.catalog import fileExists, getModTime
 
 
 # load YAML configuration file
@@ -145,9 +146,9 @@ def getSourceAge(filelist=None, fileclasses=None, filetypes=None, exp=None, doma
   # if complete file list is given, just check each file
   if filelist:
     for filepath in filelist:
-      if not os.path.exists(filepath): raise IOError("Source file '{:s}' does not exist!".format(filepath))        
-      # determine age of source file
-      fileage = datetime.fromtimestamp(os.path.getmtime(filepath))          
+      if not fileExists(filepath): raise IOError("Source file '{:s}' does not exist!".format(filepath))        
+      # determine age of source file (from catalog, if available)
+      fileage = datetime.fromtimestamp(getModTime(filepath))          
       if srcage < fileage: srcage = fileage # use latest modification date
   else:    
     # prepare period and grid strings
@@ -163,9 +164,9 @@ def getSourceAge(filelist=None, fileclasses=None, filetypes=None, exp=None, doma
         if lclim: filename = fileclass.climfile.format(domain,gridstr,periodstr) # insert domain number, grid, and period
         elif lts: filename = fileclass.tsfile.format(domain,gridstr) # insert domain number, and grid
       filepath = '{:s}/{:s}'.format(exp.avgfolder,filename)
-      if not os.path.exists(filepath): raise IOError("Source file '{:s}' does not exist!".format(filepath))        
-      # determine age of source file
-      fileage = datetime.fromtimestamp(os.path.getmtime(filepath))          
+      if not fileExists(filepath): raise IOError("Source file '{:s}' does not exist!".format(filepath))        
+      # determine age of source file (from catalog, if available)
+      fileage = datetime.fromtimestamp(getModTime(filepath))          
       if srcage < fileage: srcage = fileage # use latest modification date
   # return latest modification date
   return srcage
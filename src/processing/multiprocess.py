@@ -8,7 +8,9 @@ A simple script to test the usage of pool and how to return values...
 '''
 
 import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
 import logging
+import atexit
 import sys
 import gc # garbage collection
 import types
@@ -96,6 +98,11 @@ def test_func_dec(n, wait=1, lparallel=False, pidstr='', logger=None, ldebug=Fal
   assert int(pidstr[-3:-1]) == pid
   
 
+def test_func_kill(n, lparallel=True, pidstr='', logger=None, ldebug=False):
+  ''' test function that kills its own worker process (like the OOM killer) '''
+  if lparallel: os.kill(os.getpid(), 9) # SIGKILL
+  return n
+
 ## production functions
 
 # a decorator class that handles loggers and exit codes for functions inside asyncPool_EC  
@@ -248,14 +255,74 @@ def asyncPoolEC(func, args, kwargs, NP=1, ldebug=False, ltrialnerror=True):
   # return with exit code
   return exitcode
 
-def apply_along_axis(fct, axis, data, NP=0, chunksize=200, ldebug=False, laax=True, *args, **kwargs):
+## persistent worker pool for apply_along_axis
+
+default_NP = None # default number of workers; if None, OMP_NUM_THREADS or the number of CPUs is used
+worker_pool = None # the pool is created lazily and reused between calls
+worker_NP = None # number of workers in the current pool
+
+def setDefaultNP(NP=None):
+  ''' set the default number of workers for apply_along_axis (None: OMP_NUM_THREADS or number of CPUs);
+      an existing pool of a different size is replaced on the next call '''
+  global default_NP
+  if NP is not None and not isinstance(NP,(int,np.integer)): raise TypeError(NP)
+  default_NP = NP
+  
+def getDefaultNP():
+  ''' return the default number of workers: the configured default, OMP_NUM_THREADS, or the number of CPUs '''
+  if default_NP is not None: return int(default_NP)
+  elif os.getenv('OMP_NUM_THREADS'): return int(os.environ['OMP_NUM_THREADS'])
+  else: return multiprocessing.cpu_count()
+
+def getPool(NP=None):
+  ''' return the persistent worker pool (create it, if it does not exist or has the wrong size) '''
+  global worker_pool, worker_NP
+  if NP is None: NP = getDefaultNP()
+  if worker_pool is not None and worker_NP != NP: closePool()
+  if worker_pool is None:
+    worker_pool = multiprocessing.Pool(processes=NP)
+    worker_NP = NP
+  return worker_pool
+
+def closePool():
+  ''' shut down the persistent worker pool (also called at exit) '''
+  global worker_pool, worker_NP
+  if worker_pool is not None:
+    worker_pool.close()
+    worker_pool.join()
+  worker_pool = None; worker_NP = None
+# make sure worker processes are cleaned up
+atexit.register(closePool)
+
+def shared_chunk_helper(shmname, shape, dtype, start, end, fct, laax, args, kwargs):
+  ''' helper function for apply_along_axis that attaches to a shared memory block and applies 
+      fct to a chunk of rows (a view, not a copy) '''
+  shm = shared_memory.SharedMemory(name=shmname)
+  # N.B.: attaching registers the block with the resource tracker of the worker, which would try to 
+  #       release it again at exit; the block is owned (and unlinked) by the parent process
+  try: resource_tracker.unregister(shm._name, 'shared_memory')
+  except Exception: pass
+  try:
+    chunk = np.ndarray(shape, dtype=dtype, buffer=shm.buf)[start:end,:]
+    if laax: result = np.apply_along_axis(fct, 1, chunk, *args, **kwargs)
+    else: result = fct(chunk, *args, **kwargs)
+    # N.B.: the result must not reference the shared memory, since it will be released
+    if isinstance(result,np.ndarray) and np.may_share_memory(result, chunk): result = result.copy()
+    del chunk
+  finally: shm.close()
+  return result
+
+def apply_along_axis(fct, axis, data, NP=0, chunksize=200, ldebug=False, laax=True, *args, lshared=True, **kwargs):
   ''' a parallelized version of numpy's apply_along_axis; the preferred way of passing arguments is,
       by using functools.partial, but arguments can also be passed to this function; the call-signature
-      is the same as for np.apply_along_axis, except for NP=OMP_NUM_THREADS, chunksize=200, 
-      ldebug=False, and laax=True; the latter can be set to False, if fct is fully vectorized and only
-      the parallelization feature is required, otherwise Numpy's apply_along_axis will be called within
-      child processes. '''  
-  if NP == 0: NP = int(os.environ['OMP_NUM_THREADS'])
+      is the same as for np.apply_along_axis, except for NP=getDefaultNP(), chunksize=200, 
+      ldebug=False, laax=True, and lshared=True (keyword only); laax can be set to False, if fct is fully vectorized 
+      and only the parallelization feature is required, otherwise Numpy's apply_along_axis will be 
+      called within child processes. A persistent pool of workers is used and, if lshared is True, 
+      (unmasked, non-object) data is passed to workers via shared memory, rather than pickling chunks. '''  
+  if NP == 0 or NP is None: NP = getDefaultNP()
+  # N.B.: daemonic processes (e.g. workers of asyncPoolEC) can not have children
+  if multiprocessing.current_process().daemon: NP = 1
   # pre-processing: move sampel axis to the back
   if not axis == data.ndim-1:
     data = np.rollaxis(data, axis=axis, start=data.ndim) # roll sample axis to last (innermost) position
@@ -287,25 +354,34 @@ def apply_along_axis(fct, axis, data, NP=0, chunksize=200, ldebug=False, laax=Tr
       nc = int(arraysize//chunksize) # number of chunks; use integer division
       if arraysize%chunksize != 0: nc += 1
       cs = chunksize
-    chunks = [data[i*cs:(i+1)*cs,:] for i in range(nc)] # views on subsets of the data
-    # initialize worker pool
-    if ldebug: print('\n   ***   firing up pool (using async results)   ***')
-    if ldebug: print(('         OMP_NUM_THREADS = {:d}\n'.format(NP)))
-    pool = multiprocessing.Pool(processes=NP)
-    results = [] # list of resulting chunks (concatenated later    
-    for n in range(nc):
-      # run computation on individual subsets/chunks
-      if ldebug: print(('   Starting Chunk #{:d}'.format(n+1)))
-      if laax: # use Numpy's apply_along_axis
-        result = pool.apply_async(np.apply_along_axis, (fct,1,chunks[n],)+args, kwargs)
-      else: # for ufunc-like functions that can operate on multi-dimensional arrays
-        result = pool.apply_async(fct, (chunks[n],)+args, kwargs)
-      results.append(result)
-    pool.close()
-    pool.join()
-    if ldebug: print('\n   ***   joined worker pool (getting results)   ***\n')
-    # retrieve and assemble results 
-    results = tuple(result.get() for result in results)
+    # get persistent worker pool
+    if ldebug: print('\n   ***   using persistent pool (with async results)   ***')
+    if ldebug: print(('         NP = {:d}\n'.format(NP)))
+    pool = getPool(NP)
+    # shared memory only works for plain numeric arrays
+    lshared = lshared and not isinstance(data,np.ma.MaskedArray) and data.dtype.kind in 'biufc'
+    shm = None
+    try:
+      if lshared:
+        shm = shared_memory.SharedMemory(create=True, size=max(1,data.nbytes))
+        np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data # only one copy
+      results = [] # list of resulting chunks (concatenated later    
+      for n in range(nc):
+        # run computation on individual subsets/chunks
+        if ldebug: print(('   Starting Chunk #{:d}'.format(n+1)))
+        if lshared: # pass name of shared memory block and chunk bounds
+          result = pool.apply_async(shared_chunk_helper, (shm.name, data.shape, data.dtype, n*cs, min((n+1)*cs,arraysize), 
+                                                          fct, laax, args, kwargs))
+        elif laax: # use Numpy's apply_along_axis
+          result = pool.apply_async(np.apply_along_axis, (fct,1,data[n*cs:(n+1)*cs,:],)+args, kwargs)
+        else: # for ufunc-like functions that can operate on multi-dimensional arrays
+          result = pool.apply_async(fct, (data[n*cs:(n+1)*cs,:],)+args, kwargs)
+        results.append(result)
+      # retrieve and assemble results 
+      results = tuple(result.get() for result in results)
+      if ldebug: print('\n   ***   retrieved results from worker pool   ***\n')
+    finally:
+      if shm is not None: shm.close(); shm.unlink() # release shared memory
     results = np.concatenate(results, axis=0) 
   # check and reshape
   assert results.shape[0] == arraysize
@@ -12,21 +12,137 @@ Simple methods for copying and averaging variables will already be provided in t
 # external imports
 import numpy as np
 import numpy.ma as ma
+import scipy.sparse as sparse
 import functools
+from multiprocessing.pool import ThreadPool
 import shutil
 import gc
 from osgeo import gdal, osr
 # internal imports
 from geodata.misc import VariableError, AxisError, PermissionError, DatasetError, GDALError, ArgumentError #, DateError
 from geodata.base import Axis, Dataset, Variable
-from geodata.netcdf import DatasetNetCDF, asDatasetNC
+from geodata.netcdf import DatasetNetCDF, VarNC, asDatasetNC
 from utils.nctools import writeNetCDF
-from geodata.gdal import addGDALtoDataset, GridDefinition, gdalInterp, Shape
+from geodata.gdal import addGDALtoDataset, GridDefinition, gdalInterp, Shape, sphericalMetric, getRegridWeights,\
+  getStationLocator, station_neighbours
 from collections import OrderedDict
 # default data types
 dtype_int = np.dtype('int16')
 dtype_float = np.dtype('float32')
 
+
+def getShapeWeights(masks, griddef=None):
+  ''' Assemble a sparse weight matrix (shapes x grid cells) from a list of rasterized 2D shape masks 
+      (in (y,x) order, True inside the shape) or fractional coverage arrays (floats between 0 and 1); 
+      on geographic grids cells are weighted with the spherical metric, on projected grids all cells 
+      have equal weight. Shapes without overlap (None) produce empty rows. The grid cells are 
+      flattened in C-order, i.e. as (y,x).reshape(-1). '''
+  if not isinstance(masks,(list,tuple)): raise TypeError(masks)
+  if griddef.__class__.__name__ != GridDefinition.__name__: raise TypeError(griddef)
+  ye = len(griddef.ylat); xe = len(griddef.xlon); ncell = ye*xe
+  # cell weights (only dependent on latitude, if at all)
+  if griddef.isProjected: metric = np.ones((ye,xe), dtype=np.float64)
+  else: 
+    metric = sphericalMetric(griddef.ylat.coord, integral=False, asVar=False).astype(np.float64)
+    metric = np.repeat(metric.reshape((ye,1)), xe, axis=1)
+  metric = metric.ravel()
+  # collect non-zero entries of all masks
+  rows = []; cols = []; vals = []
+  for i,mask in enumerate(masks):
+    if mask is not None:
+      if mask.shape != (ye,xe): raise AxisError("Mask shape does not match grid: {} != {}".format(mask.shape,(ye,xe)))
+      idx = np.flatnonzero(mask) # flattened (y,x) indices of cells inside the shape
+      cols.append(idx); rows.append(np.zeros_like(idx)+i)
+      if np.issubdtype(mask.dtype,np.inexact): vals.append(metric[idx]*mask.ravel()[idx]) # fractional coverage
+      else: vals.append(metric[idx])
+  if rows: 
+    rows = np.concatenate(rows); cols = np.concatenate(cols); vals = np.concatenate(vals)
+  else: 
+    rows = np.zeros((0,), dtype=np.int64); cols = np.zeros((0,), dtype=np.int64); vals = np.zeros((0,))
+  weights = sparse.csr_matrix((vals,(rows,cols)), shape=(len(masks),ncell), dtype=np.float64)
+  # return sparse matrix
+  return weights
+
+def applySparseWeights(weights, data, memory=500):
+  ''' Compute weighted averages for all rows of a sparse weight matrix at once (e.g. shapes from 
+      getShapeWeights or target grid cells from getRegridWeights); the first axis of 'data' has to be 
+      the flattened (y,x) grid cell axis and all other axes are flattened and processed in chunks of 
+      approximately 'memory' MB. Masked and non-finite values are excluded from the averages (the 
+      weights are renormalized); rows without valid values become NaN. '''
+  if not sparse.isspmatrix_csr(weights): raise TypeError(weights)
+  ncell = data.shape[0]; rshape = data.shape[1:]
+  if ncell != weights.shape[1]: raise AxisError("Grid size does not match weights: {} != {}".format(ncell,weights.shape[1]))
+  data = data.reshape((ncell,-1)) # combine all remaining axes
+  nrec = data.shape[1]
+  lmasked = isinstance(data,ma.MaskedArray); linexact = np.issubdtype(data.dtype,np.inexact)
+  # chunk length in records (the remaining axis)
+  chunk = max(1, int( memory * 1024.**2 / ( ncell * 8. * 3 ) )) # three float64 temporaries per chunk
+  avgdata = np.zeros((weights.shape[0],nrec), dtype=np.float64)
+  for n in range(0,nrec,chunk):
+    slc = slice(n,min(n+chunk,nrec))
+    values = data[:,slc]
+    # determine valid values and zero out the rest
+    if lmasked: 
+      valid = ~ma.getmaskarray(values)
+      values = values.filled(0)
+    else: valid = None
+    values = values.astype(np.float64) # always a copy
+    if linexact:
+      finite = np.isfinite(values)
+      valid = finite if valid is None else valid & finite
+    if valid is None: valid = np.ones(values.shape, dtype=np.float64)
+    else: 
+      values[~valid] = 0.
+      valid = valid.astype(np.float64)
+    # weighted sums of values and of valid weights for all shapes in one product
+    vsum = weights.dot(values); wsum = weights.dot(valid)
+    with np.errstate(invalid='ignore', divide='ignore'):
+      avgdata[:,slc] = vsum / wsum # zero weights give NaN
+  # restore remaining axes
+  return avgdata.reshape((weights.shape[0],)+rshape)
+
+def periodicMean(data, interval, axis=0, NP=None, ntiles=None):
+  ''' Compute the average over all periods of length 'interval' along 'axis' (e.g. a monthly climatology 
+      from monthly data with interval=12, or a diurnal cycle from 6-hourly data with interval=4) in a 
+      single vectorized pass; incomplete periods at the end of the record are included and masked values 
+      are excluded. Returns the averages (NaN where no valid values are available) and the number of valid 
+      values that went into each average. If NP > 1, spatial tiles are processed by a pool of threads 
+      (numpy releases the GIL during reductions). '''
+  if not isinstance(interval,(int,np.integer)) or interval < 1: raise ArgumentError(interval)
+  data = np.moveaxis(data, axis, 0) # works with masked arrays, too
+  nt = data.shape[0]; rshape = data.shape[1:]
+  data = data.reshape((nt,-1)) # combine all remaining axes
+  ncol = data.shape[1]; nper,nrem = divmod(nt,interval); nfull = nper*interval
+  lmasked = isinstance(data,ma.MaskedArray)
+  sums = np.zeros((interval,ncol), dtype=np.float64)
+  counts = np.zeros((interval,ncol), dtype=np.int64)
+  # reduce one tile of columns: sum over complete periods using a reshape, then add the incomplete period
+  def reduceTile(slc):
+    tile = data[:,slc]
+    if lmasked:
+      valid = ~ma.getmaskarray(tile); tile = tile.filled(0)
+      if nper > 0: counts[:,slc] = valid[:nfull].reshape((nper,interval,-1)).sum(axis=0)
+      if nrem > 0: counts[:nrem,slc] += valid[nfull:]
+    else:
+      counts[:,slc] = nper; counts[:nrem,slc] += 1
+    if nper > 0: sums[:,slc] = tile[:nfull].reshape((nper,interval,-1)).sum(axis=0, dtype=np.float64)
+    if nrem > 0: sums[:nrem,slc] += tile[nfull:]
+  # process tiles (optionally in parallel)
+  if NP is None or NP < 2 or ncol < 2: reduceTile(slice(None))
+  else:
+    if ntiles is None: ntiles = 4*NP
+    bounds = np.linspace(0, ncol, min(ntiles,ncol)+1).astype(np.int64)
+    tiles = [slice(bounds[k],bounds[k+1]) for k in range(len(bounds)-1)]
+    pool = ThreadPool(NP)
+    pool.map(reduceTile, tiles)
+    pool.close(); pool.join()
+  # normalize (zero counts give NaN) and restore shape
+  with np.errstate(invalid='ignore', divide='ignore'):
+    means = sums / counts
+  means = np.moveaxis(means.reshape((interval,)+rshape), 0, axis)
+  counts = np.moveaxis(counts.reshape((interval,)+rshape), 0, axis)
+  return means, counts
+
 class ProcessError(Exception):
   ''' Error class for exceptions occurring in methods of the CPU (CentralProcessingUnit). '''
   pass
@@ -64,6 +180,8 @@ class CentralProcessingUnit():
     else: self.target = self.output 
     # whether or not to print status output
     self.feedback = feedback
+    # name of the axis along which variables are currently streamed (None: no streaming)
+    self.stream = None
         
   def getTmp(self, asNC=False, filename=None, deepcopy=False, **kwargs):
     ''' Get a copy of the temporary data in dataset format. '''
@@ -120,8 +238,23 @@ class CentralProcessingUnit():
     if close: output.close()
     else: return output
 
-  def process(self, function, flush=False):
-    ''' This method applies the desired operation/function to each variable in varlist. '''
+  def getTargetAxis(self, axis):
+    ''' Return the target axis corresponding to a source axis; in streaming mode the (sliced) source 
+        axis is returned for the streaming axis, since the target axis covers the entire record. '''
+    if self.stream is not None and axis.name == self.stream: return axis
+    else: return self.target.getAxis(axis.name)
+  
+  def process(self, function, flush=False, lstream=False, streamAxis='time', chunksize=500):
+    ''' This method applies the desired operation/function to each variable in varlist; the function 
+        returns a new Variable or a list of new Variables (e.g. several statistics), which replace the 
+        original Variable in the target dataset. If 'lstream' is True, NetCDF variables are read in chunks along 'streamAxis' and each chunk 
+        is processed and written directly to the target NetCDF file ('chunksize' is approximately 
+        the size of a chunk in MB); the operation must not change the length of the streaming axis. 
+        Streaming is supported by ShapeAverage, Extract and Regrid, and by Climatology and Shift along 
+        other axes; Climatology and Shift along the streaming axis and SeasonalStatistics are rejected 
+        before processing starts (see checkStream). '''
+    if lstream and not flush: 
+      raise ProcessError("Streaming requires flushing directly to disk (flush=True).")
     if flush: # this function is to save RAM by flushing results to disk immediately
       if not isinstance(self.output,DatasetNetCDF):
         raise ProcessError("Flush can only be used with NetCDF Datasets (and not with temporary storage).\n{:}".format(self.output))
@@ -143,18 +276,35 @@ class CentralProcessingUnit():
             # "in-place" operations
             srcds = self.target
             var = srcds.variables[varname]         
-            newvar = function(var) # perform actual processing
-            if newvar.ndim != var.ndim or newvar.shape != var.shape: raise VariableError('{:}\n\n{:}'.format(var,newvar))
-            if newvar is not var: self.target.replaceVariable(var,newvar)
+            newvars = function(var) # perform actual processing
+            if isinstance(newvars,(list,tuple)):
+              # several new variables replace the old one
+              newvars = list(newvars)
+              if not any(newvar.name == varname for newvar in newvars): self.target.removeVariable(var)
+              for newvar in newvars:
+                if newvar is var: continue
+                elif newvar.name == varname: self.target.replaceVariable(var,newvar)
+                else: self.target.addVariable(newvar, loverwrite=True)
+            else:
+              newvar = newvars; newvars = [newvar]
+              if newvar.ndim != var.ndim or newvar.shape != var.shape: raise VariableError('{:}\n\n{:}'.format(var,newvar))
+              if newvar is not var: self.target.replaceVariable(var,newvar)
           elif self.source.hasVariable(varname):        
             srcds = self.source
             var = srcds.variables[varname]         
             ldata = var.data # whether data was pre-loaded 
-            # perform operation from source and copy results to target
-            newvar = function(var) # perform actual processing
-            if not ldata: var.unload() # if it was already loaded, don't unload        
-            self.target.addVariable(newvar, copy=True) # copy=True allows recasting as, e.g., a NC variable
-            newvar.unload() # since we already made a copy
+            if ( lstream and not ldata and isinstance(var,VarNC) and var.hasAxis(streamAxis) 
+                 and var.dtype.kind in 'iuf' ):
+              # process and write chunks along the streaming axis
+              newvars = [self.processStream(function, var, streamAxis=streamAxis, chunksize=chunksize)]
+            else:
+              # perform operation from source and copy results to target
+              newvars = function(var) # perform actual processing
+              if not isinstance(newvars,(list,tuple)): newvars = [newvars]
+              if not ldata: var.unload() # if it was already loaded, don't unload        
+              for newvar in newvars:
+                self.target.addVariable(newvar, copy=True) # copy=True allows recasting as, e.g., a NC variable
+                newvar.unload() # since we already made a copy
           else:
             srcds = self.source # need to define for error message below
             raise DatasetError("Variable '{:s}' not found in input dataset.".format(varname))
@@ -171,15 +321,66 @@ class CentralProcessingUnit():
           else:
             print(("ERROR: an error occurred while processing Variable '{:s}' from Dataset '{:s}'.".format(varname,srcds.name)))
           raise # raise previous exception
-        assert varname == newvar.name
+        assert len(newvars) > 1 or varname == newvars[0].name
         # flush data to disk immediately      
         if flush: 
-          newvar.unload() # again, free memory
-          self.output.variables[varname].unload()
-        del var, newvar # free space; already added to new dataset
+          for newvar in newvars:
+            newvar.unload() # again, free memory
+            self.output.variables[newvar.name].unload()
+        del var, newvars # free space; already added to new dataset
     # after everything is said and done:
     self.source = self.target # set target to source for next time
     
+  def checkStream(self, operation, axes=None, lstream=False, streamAxis='time', **kwargs):
+    ''' Raise a ProcessError before processing starts, if an operation changes the length of the 
+        streaming axis ('axes' are the axes that are changed; None means the operation can not be 
+        streamed at all); additional keyword arguments (options for process) are ignored. '''
+    if lstream and ( axes is None or streamAxis in axes ):
+      raise ProcessError("{:s} changes the streaming axis '{:s}' and can not be used with lstream=True.".format(operation,streamAxis))
+
+  def processStream(self, function, var, streamAxis='time', chunksize=500):
+    ''' Apply the operation/function to chunks of a NetCDF variable along the streaming axis and write 
+        the results directly into a new variable in the target NetCDF dataset; only one chunk is kept 
+        in memory at a time. Returns the (unloaded) target variable. '''
+    if not isinstance(self.target,DatasetNetCDF): raise ProcessError(self.target)
+    iax = var.axisIndex(streamAxis); nstr = var.shape[iax]
+    # determine chunk length from the size of a single step along the streaming axis
+    stepsize = var.dtype.itemsize * np.prod(var.shape, dtype=np.float64) / nstr / (1024.*1024.) # in MB
+    nchk = max(1, int(chunksize/stepsize)) if stepsize > 0 else nstr
+    tgtvar = None
+    self.stream = streamAxis # signal streaming mode to processing functions
+    try:
+      for i in range(0,nstr,nchk):
+        slc = slice(i,min(i+nchk,nstr))
+        chkvar = var(lidx=True, lsqueeze=False, **{streamAxis:slc}) # a VarNC slice, not loaded yet
+        newchk = function(chkvar) # perform actual processing
+        if ( isinstance(newchk,(list,tuple)) or not newchk.hasAxis(streamAxis) 
+             or len(newchk.getAxis(streamAxis)) != slc.stop-slc.start ):
+          raise ProcessError("Streaming requires operations that preserve the streaming axis '{:s}'.".format(streamAxis))
+        if tgtvar is None:
+          # create target NetCDF variable without data, using the full target axes
+          axes = tuple(self.target.getAxis(ax.name) if ax.name == streamAxis else ax for ax in newchk.axes)
+          tmpvar = Variable(name=newchk.name, units=newchk.units, axes=axes, dtype=newchk.dtype, 
+                            atts=newchk.atts.copy(), plot=newchk.plot.copy())
+          self.target.addVariable(tmpvar, asNC=True, copy=True)
+          tgtvar = self.target.variables[newchk.name]
+          if newchk.masked and newchk.fillValue is not None:
+            tgtvar.ncvar.setncattr('missing_value',newchk.fillValue) # used by NetCDF module to fill masked values
+          tax = newchk.axisIndex(streamAxis)
+        # write chunk directly to disk
+        tslcs = [slice(None)]*newchk.ndim; tslcs[tax] = slc
+        tgtvar.ncvar[tuple(tslcs)] = newchk.getArray(unmask=False, copy=False)
+        tgtvar.ncvar.group().sync()
+        if self.feedback: print(' {:d}/{:d}'.format(slc.stop,nstr), end=' ')
+        # clean up, before the next chunk is loaded
+        newchk.unload(); chkvar.unload() 
+        del newchk, chkvar
+        gc.collect()
+    finally: 
+      self.stream = None
+    # return target variable (not loaded)
+    return tgtvar
+    
     
   ## functions (or function pairs, rather) that perform operations on the data
   # every function pair needs to have a setup function and a processing function
@@ -187,11 +388,15 @@ class CentralProcessingUnit():
   
   # function pair to average data over a given collection of shapes      
   def ShapeAverage(self, shape_dict=None, shape_name=None, shpax=None, xlon=None, ylat=None, 
-                   memory=500, **kwargs):
+                   memory=500, lsparse=True, lfraction=True, lcache=True, **kwargs):
     ''' Average over a limited area of a gridded datasets; calls processAverageShape. 
         A dictionary of NamedShape objects is expected to define the averaging areas. 
         'memory' controls the garbage collection interval and approximately corresponds 
-        to MB in temporary (it does not include loading the variable into RAM, though). '''
+        to MB in temporary (it does not include loading the variable into RAM, though). 
+        If 'lsparse' is True, all shapes are averaged at once using a sparse weight matrix 
+        (and 'memory' controls the chunk size), otherwise each shape is averaged separately. 
+        If 'lfraction' is True, the sparse weights account for the fractional coverage of grid cells 
+        by shapes. Rasterized masks are cached in memory and on disk, if 'lcache' is True. '''
     if not self.source.gdal: raise DatasetError("Source dataset must be GDAL enabled! {:s} is not.".format(self.source.name))
     if not isinstance(shape_dict,OrderedDict): raise TypeError(shape_dict)
     if not all(isinstance(shape,Shape) for shape in shape_dict.values()): raise TypeError(shape)
@@ -253,13 +458,21 @@ class CentralProcessingUnit():
     mask_array = np.zeros((len(shpax),)+srcgrd.size[::-1], dtype=np.bool) 
     # N.B.: rasterize() returns mask in (y,x) shape, size is ordered as (x,y)
     shape_masks = []; shp_full = []; shp_empty = []; shp_encl = []
+    lfraction = lfraction and lsparse # fractional coverage only works with sparse weights
+    shape_fracs = []
     for i,shape in enumerate(shape_dict.values()):
-      mask = shape.rasterize(griddef=srcgrd, asVar=False, invert=False)
+      shpmask = shape.getShapeMask(griddef=srcgrd, lcache=lcache) # binary mask and fractional coverage
+      mask = shpmask.getMask(invert=False)
       mask_array[i,:] = mask
       masksum = mask.sum() 
       lfull = masksum == mask.size; shp_full.append( lfull )
-      lempty = masksum == 0; shp_empty.append( lempty )
-      shape_masks.append( mask if not lempty else None )
+      if lfraction:
+        frac = shpmask.getFraction()
+        lempty = len(shpmask.frac) == 0 # shapes can overlap with the grid without containing cell centers
+        shape_fracs.append( frac if not lempty else None )
+      else: lempty = masksum == 0
+      shp_empty.append( lempty )
+      shape_masks.append( mask if masksum > 0 else None )
       if lempty: shp_encl.append( False )
       else:
         shp_encl.append( np.all( mask[[0,-1],:] == False ) and np.all( mask[:,[0,-1]] == False ) )
@@ -286,19 +499,23 @@ class CentralProcessingUnit():
     tgt.addVariable(Variable(data=shp_empty, axes=(shpax,), atts=atts), asNC=True, copy=True)
     # save all the meta data
     tgt.sync()
+    # assemble sparse weight matrix for all shapes
+    if lsparse: weights = getShapeWeights(shape_fracs if lfraction else shape_masks, griddef=srcgrd)
+    else: weights = None
     # prepare function call    
     function = functools.partial(self.processShapeAverage, masks=shape_masks, ylat=ylat, xlon=xlon, 
-                                 shpax=shpax, memory=memory) # already set parameters
+                                 shpax=shpax, memory=memory, weights=weights) # already set parameters
     # start process
     if self.feedback: print('\n   +++   processing shape/area averaging   +++   ') 
-    self.process(function, **kwargs) # currently 'flush' is the only kwarg
+    self.process(function, **kwargs) # 'flush' and streaming options
     if self.feedback: print('\n')
     if self.tmp: self.tmpput = self.target
     if ltmptoo and self.tmp: assert self.tmpput.name == 'tmptoo' # set above, when temp. dataset is created    
   # the previous method sets up the process, the next method performs the computation
-  def processShapeAverage(self, var, masks=None, ylat=None, xlon=None, shpax=None, memory=500):
+  def processShapeAverage(self, var, masks=None, ylat=None, xlon=None, shpax=None, memory=500, weights=None):
     ''' Compute masked area averages from variable data. 'memory' controls the garbage collection 
-        interval approximately corresponds to MB in RAM.'''
+        interval approximately corresponds to MB in RAM. If a sparse weight matrix is passed, all 
+        shapes are averaged in one pass (and 'memory' controls the chunk size). '''
     # process gdal variables (if a variable has a horiontal grid, it should be GDAL enabled)
     if var.gdal and ( np.issubdtype(var.dtype,np.integer) or np.issubdtype(var.dtype,np.inexact) ):
       if self.feedback: print(('\n'+var.name), end=' ')
@@ -310,7 +527,7 @@ class CentralProcessingUnit():
       axes = [tgt.getAxis(shpax.name)]      
       for ax in var.axes:
         if ax not in (xlon,ylat) and ax.name != shpax.name: # these axes are just transferred 
-          axes.append(tgt.getAxis(ax.name))
+          axes.append(self.getTargetAxis(ax))
       # N.B.: shape axis well be outer axis
       axes = tuple(axes)
       # pre-allocate
@@ -329,7 +546,15 @@ class CentralProcessingUnit():
       # functionality for horizontal masks of the Variable class (which creates a lot of overhead);
       # then the masked average is taken and the process is repeated for the next shape/mask.
       # Using mapMean creates a lot of overhead and there are probably more efficient ways to do it. 
-      if var.ndim == 2:
+      if weights is not None:
+        # move map axes to the front, flatten them, and apply all shape weights at once
+        data = var.getArray(unmask=False, copy=False)
+        data = np.moveaxis(data, (var.axisIndex(ylat.name),var.axisIndex(xlon.name)), (0,1))
+        data = data.reshape((len(ylat)*len(xlon),)+data.shape[2:])
+        tgtdata[:] = applySparseWeights(weights, data, memory=memory)
+        del data
+        if self.feedback: print(varname, len(masks))
+      elif var.ndim == 2:
         for i,mask in enumerate(masks): 
           if mask is None: tgtdata[i] = np.NaN # NaN for missing values (i.e. no overlap)
           else: tgtdata[i] = var.mapMean(mask=mask, invert=True, asVar=False, squeeze=True) # compute the averages
@@ -353,7 +578,7 @@ class CentralProcessingUnit():
       # create new Variable
       assert shape == tgtdata.shape
       newvar = var.copy(axes=axes, data=tgtdata) # new axes and data
-      del tgtdata, mask # clean up (just to make sure)      
+      del tgtdata # clean up (just to make sure)      
       gc.collect() # clean
     else:
       var.load() # need to load variables into memory to copy it (and we are not doing anything else...)
@@ -361,9 +586,10 @@ class CentralProcessingUnit():
     # return variable
     return newvar
   # function pair to extract station data from a time-series (or climatology)      
-  def Extract(self, template=None, stnax=None, xlon=None, ylat=None, laltcorr=True, **kwargs):
+  def Extract(self, template=None, stnax=None, xlon=None, ylat=None, laltcorr=True, lcache=True, **kwargs):
     ''' Extract station data points from gridded datasets; calls processExtract. 
-        A station dataset can be passed as template (must have station coordinates. '''
+        A station dataset can be passed as template (must have station coordinates. 
+        Station indices are cached for each combination of stations and source grid, if lcache is True. '''
     if not self.source.gdal: raise DatasetError("Source dataset must be GDAL enabled! {:s} is not.".format(self.source.name))
     if template is None: raise NotImplementedError()
     elif isinstance(template, Dataset):
@@ -406,66 +632,31 @@ class CentralProcessingUnit():
       if template.hasVariable('lon'): lons = template.lon.getArray()
       else: lons = template.stn_lon.getArray()
     else: raise NotImplementedError("Cannot extract station data without a station template Dataset")
-    # adjust longitudes
-    if srcgrd.isProjected:
-      if lons.max() > 180.: lons = np.where(lons > 180., 360.-lons, lons)
-      # reproject coordinate
-      latlon = osr.SpatialReference() 
-      latlon.SetWellKnownGeogCS('WGS84') # a normal lat/lon coordinate system
-      tx = osr.CoordinateTransformation(latlon,srcgrd.projection)
-      xs = []; ys = [] 
-      for i in range(len(lons)):
-        x,y,z = tx.TransformPoint(lons[i].astype(np.float64),lats[i].astype(np.float64))
-        xs.append(x); ys.append(y); del z
-      lons = np.array(xs); lats = np.array(ys)
-      #lons,lats = tx.TransformPoints(lons,lats) # doesn't seem to work...
-    else:
-      if lons.min() < 0. and xlon.coord.max() > 180.: lons = np.where(lons < 0., lons + 360., lons)
-      elif lons.max() > 180. and xlon.coord.min() < 0.: lons = np.where(lons > 180., 360.-lons, lons)
-      else: pass # source and template do not conflict
-    # generate index list
-    ixlon = []; iylat = []; istn = []; zs_err = [] # also record elevation error
+    # locate stations on the source grid: all coordinates are transformed at once and the closest grid 
+    # cells are found using a (cached) spatial index; with elevation correction, the closest cells are 
+    # candidates and the one with the smallest elevation error is selected
     lzs = src.hasVariable('zs')
     lstnzs = template.hasVariable('zs') or  template.hasVariable('stn_zs')
-    if laltcorr and lzs and lstnzs:
+    laltcorr = laltcorr and lzs and lstnzs
+    locator = getStationLocator(griddef=srcgrd, xlon=xlon, ylat=ylat, lcache=lcache)
+    ix, iy, lvalid = locator.query(lons, lats, k=station_neighbours if laltcorr else 1, lcache=lcache, 
+                                   lfeedback=self.feedback)
+    istn = np.flatnonzero(lvalid); ix = ix[istn,:]; iy = iy[istn,:]
+    if lzs and lstnzs:
       if src.zs.ndim > 2: src.zs = src.zs(time=0, lidx=True) # first time-slice (for CESM)
       if src.zs.ndim != 2 or not src.gdal or src.zs.units != 'm': raise VariableError(src)
-      # consider altidue of surrounding points as well      
       zs = src.zs.getArray(unmask=True,fillValue=-300)
       if template.hasVariable('zs'): stn_zs = template.zs.getArray(unmask=True,fillValue=-300)
       else: stn_zs = template.stn_zs.getArray(unmask=True,fillValue=-300)
-      if src.zs.axisIndex(xlon.name) == 0: zs.transpose() # assuming lat,lon or y,x order is more common
-      ye,xe = zs.shape # assuming order lat,lon or y,x
-      xe -= 1; ye -= 1 # last valid index, not length
-      for n,lon,lat in zip(range(len(stnax)),lons,lats):
-        ip = xlon.getIndex(lon, mode='left', outOfBounds=True)
-        jp = ylat.getIndex(lat, mode='left', outOfBounds=True)
-        if ip is not None and jp is not None:
-          # find neighboring point with smallest altitude error 
-#           ip = im+1 if im < xe else im  
-#           jp = jm+1 if jm < ye else jm
-          im = ip-1 if ip > 0 else ip  
-          jm = jp-1 if jp > 0 else jp
-          zdiff = np.Infinity # initialize, so that it triggers at least once
-          # check four closest grid points
-          for i in im,ip:
-            for j in jm,jp:
-              ze = zs[j,i]-stn_zs[n]
-              zd = np.abs(ze) # compute elevation error
-              if zd < zdiff: ii,jj,zdiff,zerr = i,j,zd,ze # preliminary selection, triggers at least once               
-          ixlon.append(ii); iylat.append(jj); istn.append(n); zs_err.append(zerr) # final selection          
-    else: 
-      # just choose horizontally closest point 
-      for n,lon,lat in zip(range(len(stnax)),lons,lats):
-        i = xlon.getIndex(lon, mode='closest', outOfBounds=True)
-        j = ylat.getIndex(lat, mode='closest', outOfBounds=True)
-        if i is not None and j is not None: 
-          if lzs: # compute elevation error
-            zs_err.append(zs[j,i]-stn_zs[n])          
-          ixlon.append(i); iylat.append(j); istn.append(n)
-    # N.B.: it is necessary to append, because we don't know the number of valid points
-    ixlon = np.array(ixlon, dtype='int'); iylat = np.array(iylat, dtype='int')
-    istn = np.array(istn, dtype='int'); zs_err = np.array(zs_err, dtype='float')
+      if src.zs.axisIndex(xlon.name) == 0: zs = zs.transpose() # assuming lat,lon or y,x order is more common
+      zerr = zs[iy,ix] - stn_zs[istn].reshape((len(istn),1)) # elevation errors of all candidates
+      ik = np.argmin(np.abs(zerr), axis=1) # ties are resolved in favor of the closest cell
+      ixlon = ix[np.arange(len(istn)),ik]; iylat = iy[np.arange(len(istn)),ik] 
+      zs_err = zerr[np.arange(len(istn)),ik].astype('float')
+    else:
+      ixlon = ix[:,0]; iylat = iy[:,0] # just choose horizontally closest point
+      lzs = False # no elevation error without station elevation
+    ixlon = ixlon.astype('int'); iylat = iylat.astype('int'); istn = istn.astype('int')
     # prepare target dataset
     # N.B.: attributes should already be set in target dataset (by caller module)
     #       we are also assuming the new dataset has no axes yet
@@ -498,7 +689,7 @@ class CentralProcessingUnit():
     function = functools.partial(self.processExtract, ixlon=ixlon, iylat=iylat, ylat=ylat, xlon=xlon, stnax=stnax) # already set parameters
     # start process
     if self.feedback: print('\n   +++   processing point-data extraction   +++   ') 
-    self.process(function, **kwargs) # currently 'flush' is the only kwarg
+    self.process(function, **kwargs) # 'flush' and streaming options
     if self.feedback: print('\n')
     if self.tmp: self.tmpput = self.target
     if ltmptoo and self.tmp: assert self.tmpput.name == 'tmptoo' # set above, when temp. dataset is created    
@@ -515,7 +706,7 @@ class CentralProcessingUnit():
       axes = [tgt.getAxis(stnax.name)]      
       for ax in var.axes:
         if ax.name not in (xlon.name,ylat.name) and ax.name != stnax.name: # these axes are just transferred 
-          axes.append(tgt.getAxis(ax.name))
+          axes.append(self.getTargetAxis(ax))
       axes = tuple(axes)
       shape = tuple(len(ax) for ax in axes)
       srcdata = var.getArray(copy=False) # don't make extra copy
@@ -542,8 +733,9 @@ class CentralProcessingUnit():
     
   # function pair to compute a climatology from a time-series      
   def Regrid(self, griddef=None, projection=None, geotransform=None, size=None, xlon=None, ylat=None, 
-             lmask=True, int_interp=None, float_interp=None, **kwargs):
-    ''' Setup climatology and start computation; calls processClimatology. '''
+             lmask=True, int_interp=None, float_interp=None, lweights=True, **kwargs):
+    ''' Setup regridding and start computation; calls processRegrid. If 'lweights' is True, cached 
+        sparse interpolation weights are applied to all bands at once, instead of calling GDAL. '''
     # make temporary gdal dataset
     if self.source is self.target:
       if self.tmp: assert self.source == self.tmpput and self.target == self.tmpput
@@ -613,18 +805,21 @@ class CentralProcessingUnit():
     else: float_interp = gdalInterp(float_interp)      
     # prepare function call    
     function = functools.partial(self.processRegrid, ylat=ylat, xlon=xlon, lwrapSrc=lwrapSrc, lwrapTgt=lwrapTgt, # already set parameters
-                                 lmask=lmask, int_interp=int_interp, float_interp=float_interp)
+                                 lmask=lmask, int_interp=int_interp, float_interp=float_interp,
+                                 srcgrd=srcgrd if lweights else None, tgtgrd=griddef if lweights else None)
     # start process
     if self.feedback: print('\n   +++   processing regridding   +++   ') 
-    self.process(function, **kwargs) # currently 'flush' is the only kwarg
+    self.process(function, **kwargs) # 'flush' and streaming options
     # now make sure we have a GDAL dataset!
     self.target = addGDALtoDataset(self.target, griddef=griddef)
     if self.feedback: print('\n')
     if self.tmp: self.tmpput = self.target
     if ltmptoo and self.tmp: assert self.tmpput.name == 'tmptoo' # set above, when temp. dataset is created    
   # the previous method sets up the process, the next method performs the computation
-  def processRegrid(self, var, ylat=None, xlon=None, lwrapSrc=False, lwrapTgt=False, lmask=True, int_interp=None, float_interp=None):
-    ''' Compute a climatology from a variable time-series. '''
+  def processRegrid(self, var, ylat=None, xlon=None, lwrapSrc=False, lwrapTgt=False, lmask=True, int_interp=None, float_interp=None,
+                    srcgrd=None, tgtgrd=None):
+    ''' Regrid a variable to the target grid, either using GDAL directly, or, if source and target grid 
+        definitions are passed, by applying cached sparse interpolation weights. '''
     # process gdal variables
     if var.gdal:
       if self.feedback: print(('\n'+var.name), end=' ')
@@ -635,30 +830,49 @@ class CentralProcessingUnit():
       # create new Variable
       var.load() # most rebust way to determine the dtype! and we need it later anyway
       newvar = var.copy(axes=axes, data=None, projection=self.target.projection) # and, of course, load new data
-      # if necessary, shift array back, to ensure proper wrapping of coordinates
-      # prepare regridding
-      # get GDAL dataset instances
-      srcdata = var.getGDAL(load=True, wrap360=lwrapSrc)
-      tgtdata = newvar.getGDAL(load=False, wrap360=lwrapTgt, allocate=True, fillValue=var.fillValue)
       # determine GDAL interpolation
       if 'gdal_interp' in var.__dict__: gdal_interp = var.gdal_interp
       elif 'gdal_interp' in var.atts: gdal_interp = var.atts['gdal_interp'] 
       else: # use default based on variable type
         if np.issubdtype(var.dtype, np.integer): gdal_interp = int_interp # can't process logicals anyway...
         else: gdal_interp = float_interp                          
-      # perform regridding
-      err = gdal.ReprojectImage(srcdata, tgtdata, var.projection.ExportToWkt(), newvar.projection.ExportToWkt(), gdal_interp)
-      #print srcdata.ReadAsArray().std(), tgtdata.ReadAsArray().std()
-      #print var.projection.ExportToWkt()
-      #print newvar.projection.ExportToWkt()
-      del srcdata # clean up (just to make sure)
-      # N.B.: the target array should be allocated and prefilled with missing values, otherwise ReprojectImage
-      #       will just fill missing values with zeros!  
-      if err != 0: raise GDALError('ERROR CODE {:}'.format(err))
-      #tgtdata.FlushCash()  
-      # load data into new variable
-      newvar.loadGDAL(tgtdata, mask=lmask, wrap360=lwrapTgt, fillValue=var.fillValue)      
-      del tgtdata # clean up (just to make sure)
+      if isinstance(gdal_interp,str): gdal_interp = gdalInterp(gdal_interp)
+      if srcgrd is not None and tgtgrd is not None:
+        # apply sparse interpolation weights to all bands at once (weights are computed only once per grid pair)
+        weights = getRegridWeights(srcgrd, tgtgrd, interpolation=gdal_interp, lwrapSrc=lwrapSrc, lwrapTgt=lwrapTgt)
+        iy = var.axisIndex(var.ylat); ix = var.axisIndex(var.xlon)
+        srcdata = np.moveaxis(var.getArray(unmask=False, copy=False), (iy,ix), (0,1))
+        srcdata = srcdata.reshape((srcdata.shape[0]*srcdata.shape[1],)+srcdata.shape[2:])
+        tgtdata = applySparseWeights(weights, srcdata)
+        tgtdata = np.moveaxis(tgtdata.reshape((len(ylat),len(xlon))+tgtdata.shape[1:]), (0,1), (iy,ix))
+        del srcdata # clean up (just to make sure)
+        # convert to original dtype and mask missing values
+        fillValue = var.fillValue if var.fillValue is not None else ma.default_fill_value(var.dtype)
+        mask = ~np.isfinite(tgtdata)
+        if np.issubdtype(var.dtype, np.integer): tgtdata = np.round(tgtdata) # GDAL also rounds
+        tgtdata[mask] = fillValue; tgtdata = tgtdata.astype(var.dtype)
+        if lmask: tgtdata = ma.masked_array(tgtdata, mask=mask, fill_value=fillValue)
+        newvar.load(tgtdata)
+        del tgtdata # clean up (just to make sure)
+      else:
+        # if necessary, shift array back, to ensure proper wrapping of coordinates
+        # prepare regridding
+        # get GDAL dataset instances
+        srcdata = var.getGDAL(load=True, wrap360=lwrapSrc)
+        tgtdata = newvar.getGDAL(load=False, wrap360=lwrapTgt, allocate=True, fillValue=var.fillValue)
+        # perform regridding
+        err = gdal.ReprojectImage(srcdata, tgtdata, var.projection.ExportToWkt(), newvar.projection.ExportToWkt(), gdal_interp)
+        #print srcdata.ReadAsArray().std(), tgtdata.ReadAsArray().std()
+        #print var.projection.ExportToWkt()
+        #print newvar.projection.ExportToWkt()
+        del srcdata # clean up (just to make sure)
+        # N.B.: the target array should be allocated and prefilled with missing values, otherwise ReprojectImage
+        #       will just fill missing values with zeros!  
+        if err != 0: raise GDALError('ERROR CODE {:}'.format(err))
+        #tgtdata.FlushCash()  
+        # load data into new variable
+        newvar.loadGDAL(tgtdata, mask=lmask, wrap360=lwrapTgt, fillValue=var.fillValue)      
+        del tgtdata # clean up (just to make sure)
     else:
       var.load() # need to load variables into memory, because we are not doing anything else...
       newvar = var # just pass over the variable to the new dataset
@@ -666,11 +880,13 @@ class CentralProcessingUnit():
     return newvar
   
   # function pair to compute a climatology from a time-series      
-  def Climatology(self, timeAxis='time', climAxis=None, period=None, offset=0, shift=0, timeSlice=None, **kwargs):
-    ''' Setup climatology and start computation; calls processClimatology. '''
+  def Climatology(self, timeAxis='time', climAxis=None, period=None, offset=0, shift=0, timeSlice=None, NP=None, **kwargs):
+    ''' Setup climatology and start computation; calls processClimatology. The length of 'climAxis' 
+        determines the periodicity (default: 12 months); with NP > 1 spatial tiles are reduced in parallel. '''
     if period is not None and not isinstance(period,(np.integer,int)): raise TypeError(period) # period in years
     if not isinstance(offset,(np.integer,int)): raise TypeError(offset) # offset in years (from start of record)
     if not isinstance(shift,(np.integer,int)): raise TypeError(shift) # shift in month (if first month is not January)
+    self.checkStream('Climatology', axes=(timeAxis,), **kwargs) # reduces the time axis
     # construct new time axis for climatology
     if climAxis is None:        
       climAxis = Axis(name=timeAxis, units='month', length=12, coord=np.arange(1,13,1), dtype=dtype_int) # monthly climatology
@@ -695,19 +911,19 @@ class CentralProcessingUnit():
           print("Variable '{}' of type '{}' will be converted to '{}'".format(var.name,var.dtype,dtype_float))
     # prepare function call
     function = functools.partial(self.processClimatology, # already set parameters
-                                 timeAxis=timeAxis, climAxis=climAxis, timeSlice=timeSlice, shift=shift)
+                                 timeAxis=timeAxis, climAxis=climAxis, timeSlice=timeSlice, shift=shift, NP=NP)
     # start process
     if self.feedback: print('\n   +++   processing climatology   +++   ')     
     if self.source.gdal: griddef = self.source.griddef
     else: griddef = None 
-    self.process(function, **kwargs) # currently 'flush' is the only kwarg    
+    self.process(function, **kwargs) # 'flush' and streaming options    
     # add GDAL to target
     if griddef is not None:
       self.target = addGDALtoDataset(self.target, griddef=griddef)
     # N.B.: if the dataset is empty, it wont do anything, hence we do it now    
     if self.feedback: print('\n')    
   # the previous method sets up the process, the next method performs the computation
-  def processClimatology(self, var, timeAxis='time', climAxis=None, timeSlice=None, shift=0):
+  def processClimatology(self, var, timeAxis='time', climAxis=None, timeSlice=None, shift=0, NP=None):
     ''' Compute a climatology from a variable time-series. '''
     # process variable that have a time axis
     if var.hasAxis(timeAxis):
@@ -715,49 +931,19 @@ class CentralProcessingUnit():
       # prepare averaging
       tidx = var.axisIndex(timeAxis)
       interval = len(climAxis)
-      newshape = list(var.shape)
-      newshape[tidx] = interval # shape of the climatology field  
-      if not (interval == 12): raise NotImplementedError(interval)
       # load data
+      dataarray = var.getArray(unmask=False, copy=False)
       if timeSlice is not None:
-        idx = tuple([timeSlice if ax.name == timeAxis else slice(None) for ax in var.axes])
-      else: idx = None
-      dataarray = var.getArray(unmask=False, copy=False)[idx]
+        dataarray = dataarray[tuple([timeSlice if ax.name == timeAxis else slice(None) for ax in var.axes])]
       if np.issubdtype(var.dtype,np.integer): dtype = dtype_float
       else: dtype = var.dtype          
-      if var.masked: avgdata = ma.zeros(newshape, dtype=dtype) # allocate array
-      else: avgdata = np.zeros(newshape, dtype=dtype) # allocate array    
-      # average data
-      timelength = dataarray.shape[tidx]
-      if timelength % interval == 0:
-        # use array indexing
-        climelts = np.arange(interval, dtype=dtype_int)
-        for t in range(0,timelength,interval):
-          if self.feedback: print(('.'), end=' ') # t/interval+1
-          avgdata += dataarray.take(t+climelts, axis=tidx)
-        del dataarray # clean up
-        # normalize
-        avgdata /= (timelength//interval) 
-      else: 
-        # simple indexing
-        climcnt = np.zeros(interval, dtype=dtype_int)
-        for t in range(timelength):
-          if self.feedback and t%interval == 0: print(('.'), end=' ') # t/interval+1
-          idx = int(t%interval)
-          climcnt[idx] += 1
-          if dataarray.ndim == 1:
-            avgdata[idx] = avgdata[idx] + dataarray[t]
-          else: 
-            avgdata[idx,:] = avgdata[idx,:] + dataarray[t,:]
-        del dataarray # clean up
-        # normalize
-        for i in range(interval):
-          if avgdata.ndim == 1:
-            if climcnt[i] > 0: avgdata[i] /= climcnt[i]
-            else: avgdata[i] = 0 if np.issubdtype(var.dtype, np.integer) else np.NaN
-          else:
-            if climcnt[i] > 0: avgdata[i,:] /= climcnt[i]
-            else: avgdata[i,:] = 0 if np.issubdtype(var.dtype, np.integer) else np.NaN
+      # average data (all periods at once; partial periods and masked values are handled)
+      avgdata, climcnt = periodicMean(dataarray, interval, axis=tidx, NP=NP)
+      del dataarray # clean up
+      if np.issubdtype(var.dtype, np.integer): avgdata[climcnt == 0] = 0
+      avgdata = avgdata.astype(dtype)
+      if var.masked: avgdata = ma.masked_where(climcnt == 0, avgdata, copy=False)
+      del climcnt
       # shift data (if first month was not January)
       if shift != 0: avgdata = np.roll(avgdata, shift, axis=tidx)
       # create new Variable
@@ -772,7 +958,45 @@ class CentralProcessingUnit():
       newvar = var.copy()
     # return variable
     return newvar
-  
+
+  # function pair to compute annual time-series of several seasonal statistics in one pass
+  def SeasonalStatistics(self, stats=None, timeAxis='time', statargs=None, **kwargs):
+    ''' Setup computation of seasonal statistics and start computation; calls processSeasonalStatistics.
+        'stats' is a list of (season, operation) tuples (default: seasonal and annual means); each
+        Variable is only read and reshaped once and produces one new Variable for each statistic
+        (see Variable.seasonalStatistics, which also receives 'statargs'); Variables without time 
+        axis are copied. '''
+    if stats is None: stats = [(season,'mean') for season in ('djf','mam','jja','son','annual')]
+    if not isinstance(stats,(list,tuple)): raise TypeError(stats)
+    if statargs is None: statargs = dict()
+    self.checkStream('SeasonalStatistics', axes=None, **kwargs) # several new Variables with new axes
+    # add variables that will cause errors to ignorelist (e.g. strings)
+    for varname,var in self.source.variables.items():
+      if var.hasAxis(timeAxis) and var.dtype.kind == 'S': self.ignorelist.append(varname)
+    # prepare function call
+    function = functools.partial(self.processSeasonalStatistics, # already set parameters
+                                 stats=stats, timeAxis=timeAxis, **statargs)
+    # start process
+    if self.feedback: print('\n   +++   processing seasonal statistics   +++   ')
+    if self.source.gdal: griddef = self.source.griddef
+    else: griddef = None
+    self.process(function, **kwargs) # 'flush' option (each Variable produces several new Variables)
+    # add GDAL to target
+    if griddef is not None:
+      self.target = addGDALtoDataset(self.target, griddef=griddef)
+    if self.feedback: print('\n')
+  # the previous method sets up the process, the next method performs the computation
+  def processSeasonalStatistics(self, var, stats=None, timeAxis='time', **kwargs):
+    ''' Compute a list of annual time-series of seasonal statistics from a monthly time-series. '''
+    if var.hasAxis(timeAxis) and var.dtype.kind in 'iuf':
+      if self.feedback: print(('\n'+var.name), end=' ')
+      newvars = var.seasonalStatistics(stats, asVar=True, taxis=timeAxis, **kwargs)
+    else:
+      var.load() # need to load variables into memory, because we are not doing anything else...
+      newvars = [var.copy()]
+    # return list of new variables
+    return newvars
+
   def Shift(self, shift=0, axis=None, byteShift=False, **kwargs):
     ''' Method to initialize shift along a coordinate axis. '''
     # kwarg input
@@ -789,6 +1013,7 @@ class CentralProcessingUnit():
       else: raise AxisError("Axis '{}' not found in Dataset.".format(axis))
     else: 
       if not isinstance(axis,Axis): raise TypeError(axis)
+    self.checkStream('Shift', axes=(axis.name,), **kwargs) # chunks would be rolled separately
     # apply shift to new axis
     if byteShift:
       # shift coordinate vector like data
@@ -817,7 +1042,7 @@ class CentralProcessingUnit():
                                  shift=shift, axis=axis)
     # start process
     if self.feedback: print('\n   +++   processing shift/roll   +++   ')     
-    self.process(function, **kwargs) # currently 'flush' is the only kwarg    
+    self.process(function, **kwargs) # 'flush' and streaming options    
     if self.feedback: print('\n')
   # the previous method sets up the process, the next method performs the computation
   def processShift(self, var, shift=None, axis=None):
@@ -22,6 +22,7 @@ from datasets.common import addLengthAndNamesOfMonth, getCommonGrid
 from processing.multiprocess import asyncPoolEC
 from processing.process import CentralProcessingUnit
 from processing.misc import getMetaData, getTargetFile, getExperimentList, loadYAML
+from utils.catalog import fileExists, getModTime, getFileSize, updateFile
 
 
 # worker function that is to be passed to asyncPool for parallel execution; use of the decorator is assumed
@@ -65,14 +66,14 @@ def performRegridding(dataset, mode, griddef, dataargs, loverwrite=False, varlis
       tmpfilename = tmppfx + filename      
     filepath = avgfolder + filename
     tmpfilepath = avgfolder + tmpfilename
-    if os.path.exists(filepath): 
+    if fileExists(filepath): # N.B.: uses archive catalog, if available
       if not loverwrite: 
-        age = datetime.fromtimestamp(os.path.getmtime(filepath))
+        age = datetime.fromtimestamp(getModTime(filepath))
         # if source file is newer than sink file or if sink file is a stub, recompute, otherwise skip
-        if age > srcage and os.path.getsize(filepath) > 1e6: 
+        if age > srcage and getFileSize(filepath) > 1e6: 
           lskip = True
           if hasattr(griddef, 'filepath') and griddef.filepath is not None:
-            gridage = datetime.fromtimestamp(os.path.getmtime(griddef.filepath))
+            gridage = datetime.fromtimestamp(getModTime(griddef.filepath))
             if age < gridage: lskip = False
         # N.B.: NetCDF files smaller than 1MB are usually incomplete header fragments from a previous crashed
   
@@ -145,6 +146,7 @@ def performRegridding(dataset, mode, griddef, dataargs, loverwrite=False, varlis
         sink.unload(); sink.close(); del sink # destroy all references 
         if os.path.exists(filepath): os.remove(filepath) # remove old file
         os.rename(tmpfilepath,filepath) # this would also overwrite the old file...
+        updateFile(filepath) # register new file with archive catalog
       # N.B.: there is no temporary file if the dataset is returned, because an open file can't be renamed
         
     # clean up and return
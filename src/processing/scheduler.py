@@ -0,0 +1,276 @@
+'''
+A dependency-aware job scheduler for batch processing: jobs form a directed acyclic graph (e.g. shape
+averaging can depend on regridding), jobs are admitted to a pool of workers based on a memory budget
+(memory estimates can be derived from the size of the input NetCDF files), and the state of each job
+is recorded in a state file, so that an interrupted batch can be resumed.
+Worker functions follow the same conventions as for asyncPoolEC (see processing.multiprocess); the batch
+drivers use the scheduler instead of asyncPoolEC, if a memory budget is configured (e.g. shpavg.py).
+'''
+
+import os
+import json
+import logging
+import multiprocessing
+import queue
+import numpy as np
+import netCDF4 as nc
+from datetime import datetime
+# internal imports
+from processing.multiprocess import TrialNError
+from geodata.misc import DatasetError, DateError
+
+
+## memory estimates
+
+def estimateMemory(filelist, factor=2., lcompressed=True):
+  ''' estimate the memory footprint (in MB) of a job from the size of its input NetCDF files; if
+      lcompressed is True, the uncompressed size of all variables is computed from the file headers,
+      otherwise the file size is used; 'factor' accounts for temporary arrays and output '''
+  if isinstance(filelist,str): filelist = [filelist]
+  if not isinstance(filelist,(list,tuple)): raise TypeError(filelist)
+  size = 0.
+  for filepath in filelist:
+    if not os.path.exists(filepath): continue # may not exist yet, if it is created by another job
+    if lcompressed:
+      with nc.Dataset(filepath, mode='r') as ncfile:
+        for ncvar in ncfile.variables.values():
+          size += np.prod(ncvar.shape, dtype=np.float64) * ncvar.dtype.itemsize if ncvar.dtype != str else 0
+    else: size += os.path.getsize(filepath)
+  return factor * size / (1024.*1024.)
+
+def estimateSourceMemory(dataset, mode, dataargs, factor=2.):
+  ''' estimate the memory footprint (in MB) of a batch job from the source files of a dataset; the source
+      is constructed like in the worker functions (see processing.misc.getMetaData), but not loaded;
+      returns 0, if the source is not available (the job will fail anyway) '''
+  from processing.misc import getMetaData # imports all dataset modules
+  try:
+    loadfct = getMetaData(dataset, mode, dataargs.copy())[1] # N.B.: getMetaData modifies dataargs
+    source = loadfct(); filelist = list(source.filelist); source.close()
+  except (IOError, DatasetError, DateError): return 0.
+  return estimateMemory(filelist, factor=factor)
+
+def getJobName(dataset, mode, dataargs):
+  ''' a unique and reproducible job name for a batch job (used in the state file) '''
+  exp = dataargs.get('experiment',None)
+  name = [dataset if exp is None else exp.name, mode]
+  for key in ('filetypes','domain','resolution','grid','period'):
+    value = dataargs.get(key,None)
+    if isinstance(value,(list,tuple)): value = '-'.join(str(v) for v in value)
+    if value: name.append(str(value))
+  return '_'.join(name)
+
+
+## job definition
+
+class Job(object):
+  '''
+    A class that holds a single job: the worker function with arguments, the names of the jobs it
+    depends on, a memory estimate (in MB), and a priority (higher priorities are started first).
+  '''
+
+  def __init__(self, name, func, args=None, kwargs=None, depends=None, memory=None, filelist=None, priority=0):
+    ''' initialize job; if no memory estimate is given, it is computed from 'filelist' (if given) '''
+    if not isinstance(name,str): raise TypeError(name)
+    if not callable(func): raise TypeError(func)
+    self.name = name
+    self.func = func
+    self.args = tuple(args) if args is not None else tuple()
+    self.kwargs = kwargs.copy() if kwargs is not None else dict()
+    if depends is None: depends = []
+    elif isinstance(depends,str): depends = [depends]
+    self.depends = list(depends)
+    if memory is None: memory = estimateMemory(filelist) if filelist else 0.
+    self.memory = float(memory)
+    self.priority = priority
+    self.state = 'pending' # pending, running, done, failed, or skipped
+
+  def __str__(self):
+    return "Job '{:s}' ({:s}; {:.0f} MB; depends on: {:s})".format(self.name, self.state, self.memory, ', '.join(self.depends))
+
+
+## scheduler
+
+# worker processes report the jobs they start, so that jobs on killed workers can be detected
+_started = None # queue for start notifications (set in worker processes)
+
+def _initWorker(started):
+  ''' initializer for worker processes: save queue for start notifications '''
+  global _started
+  _started = started
+
+def _runJob(name, func, args, kwargs):
+  ''' execute a job in a worker process and report the process ID to the scheduler first '''
+  _started.put((name, os.getpid()))
+  return func(*args, **kwargs)
+
+def _isAlive(pid):
+  ''' check if a (worker) process still exists '''
+  try: os.kill(pid, 0)
+  except ProcessLookupError: return False
+  except PermissionError: return True # exists, but belongs to somebody else
+  return True
+
+class JobScheduler(object):
+  '''
+    A scheduler that executes a DAG of jobs on a pool of workers, subject to a memory budget; jobs
+    are only started when all their dependencies have completed successfully, and jobs that depend on
+    failed jobs are skipped. If a state file is given, completed jobs are recorded and not repeated.
+  '''
+
+  def __init__(self, jobs=None, statefile=None):
+    ''' initialize with a list of jobs (more can be added later) and an optional state file '''
+    self.jobs = dict() # jobs by name
+    self.order = [] # order in which jobs were added (for deterministic scheduling)
+    self.statefile = statefile
+    if jobs is not None:
+      for job in jobs: self.addJob(job)
+
+  def addJob(self, job=None, **kwargs):
+    ''' add a Job instance (or construct one from keyword arguments) '''
+    if job is None: job = Job(**kwargs)
+    if not isinstance(job,Job): raise TypeError(job)
+    if job.name in self.jobs: raise ValueError("Job '{:s}' already exists!".format(job.name))
+    self.jobs[job.name] = job; self.order.append(job.name)
+    return job
+
+  def checkGraph(self):
+    ''' check that all dependencies exist and that there are no cycles '''
+    for job in self.jobs.values():
+      for dep in job.depends:
+        if dep not in self.jobs: raise ValueError("Dependency '{:s}' of job '{:s}' not found!".format(dep,job.name))
+    # depth-first search for cycles
+    marks = dict()
+    def visit(name):
+      if marks.get(name) == 'active': raise ValueError("Cyclic dependency involving job '{:s}'!".format(name))
+      if name not in marks:
+        marks[name] = 'active'
+        for dep in self.jobs[name].depends: visit(dep)
+        marks[name] = 'done'
+    for name in self.order: visit(name)
+
+  def loadState(self):
+    ''' load job states from state file; only completed jobs are retained '''
+    if self.statefile and os.path.exists(self.statefile):
+      with open(self.statefile, 'r') as f: states = json.load(f)
+      for name,state in states.items():
+        if name in self.jobs and state == 'done': self.jobs[name].state = 'done'
+
+  def saveState(self):
+    ''' save current job states to state file (written to a temporary file first) '''
+    if self.statefile:
+      states = {name:self.jobs[name].state for name in self.order}
+      tmpfile = self.statefile + '.tmp'
+      with open(tmpfile, 'w') as f: json.dump(states, f, indent=2)
+      os.replace(tmpfile, self.statefile)
+
+  def readyJobs(self):
+    ''' return list of pending jobs, whose dependencies are done, sorted by priority and memory '''
+    ready = [self.jobs[name] for name in self.order if self.jobs[name].state == 'pending' and
+             all(self.jobs[dep].state == 'done' for dep in self.jobs[name].depends)]
+    ready.sort(key=lambda job: (-job.priority, -job.memory)) # stable sort, i.e. retain order otherwise
+    return ready
+
+  def skipFailed(self):
+    ''' mark pending jobs, which depend on failed or skipped jobs, as skipped; returns names '''
+    skipped = []; lchange = True
+    while lchange:
+      lchange = False
+      for name in self.order:
+        job = self.jobs[name]
+        if job.state == 'pending' and any(self.jobs[dep].state in ('failed','skipped') for dep in job.depends):
+          job.state = 'skipped'; skipped.append(name); lchange = True
+    return skipped
+
+  def run(self, NP=1, memory=None, ldebug=False, ltrialnerror=True, timeout=10.):
+    '''
+      Execute all jobs on NP workers, such that the sum of the memory estimates of running jobs does not
+      exceed 'memory' (in MB; None means no limit); a job that exceeds the budget on its own is only
+      started when no other jobs are running. Worker functions receive the same keyword arguments as
+      with asyncPoolEC (lparallel, ldebug, logger). Every 'timeout' seconds, the scheduler checks if
+      the workers of running jobs are still alive; jobs on workers that were killed (e.g. by the OOM
+      killer) are marked as failed. Returns the number of failed or skipped jobs.
+    '''
+    if NP is not None and not isinstance(NP,(int,np.integer)): raise TypeError(NP)
+    self.checkGraph()
+    self.loadState()
+    lparallel = not ( NP is not None and NP == 1 )
+    if NP is None: NP = multiprocessing.cpu_count()
+    # set up logging
+    logger = logging.getLogger('scheduler.JobScheduler')
+    logger.setLevel(logging.DEBUG if ldebug else logging.INFO)
+    if not logger.handlers:
+      ch = logging.StreamHandler(); ch.setFormatter(logging.Formatter('%(message)s'))
+      logger.addHandler(ch)
+    logger.info(datetime.today())
+    ndone = sum(job.state == 'done' for job in self.jobs.values())
+    logger.info('\nJOBS: {:d} ({:d} already completed), THREADS: {:s}, MEMORY: {:s}, DEBUG: {:s}\n'.format(
+                len(self.jobs), ndone, str(NP), str(memory), str(ldebug)))
+    # helper to start a job and to finish it
+    def jobArgs(job):
+      kwargs = job.kwargs.copy()
+      kwargs['ldebug'] = ldebug; kwargs['lparallel'] = lparallel; kwargs['logger'] = logger.name
+      func = TrialNError(job.func) if ltrialnerror else job.func
+      return func, job.args, kwargs
+    def finishJob(job, ec):
+      job.state = 'done' if not ec else 'failed'
+      logger.debug("Job '{:s}' finished with exit code {:d}".format(job.name, ec or 0))
+      for name in self.skipFailed(): logger.info("Skipping job '{:s}' (failed dependency)".format(name))
+      self.saveState()
+    ## schedule and run jobs
+    if lparallel:
+      started = multiprocessing.SimpleQueue() # start notifications from workers (written synchronously)
+      pool = multiprocessing.Pool(processes=NP, initializer=_initWorker, initargs=(started,))
+      finished = queue.Queue() # callbacks are executed in a thread of the parent process
+      running = dict(); used = 0.; pids = dict(); llost = False
+      try:
+        while True:
+          # admit new jobs, subject to number of workers and memory budget
+          for job in self.readyJobs():
+            if len(running) >= NP: break
+            if memory is not None and running and used + job.memory > memory: continue
+            func, args, kwargs = jobArgs(job)
+            job.state = 'running'; running[job.name] = job; used += job.memory
+            logger.debug("Starting job '{:s}' ({:.0f} MB in use)".format(job.name, used))
+            pool.apply_async(_runJob, (job.name, func, args, kwargs),
+                             callback=lambda ec, name=job.name: finished.put((name,ec)),
+                             error_callback=lambda err, name=job.name: finished.put((name,1)))
+          if not running: break # nothing is running and nothing can be started: done
+          # wait for a job to finish
+          try: 
+            name, ec = finished.get(timeout=timeout)
+          except queue.Empty:
+            # N.B.: the pool replaces workers that were killed, but their jobs are lost without a callback
+            while not started.empty():
+              name, pid = started.get(); pids[name] = pid
+            for name in [name for name in running if name in pids and not _isAlive(pids[name])]:
+              logger.info("Job '{:s}' failed: worker process {:d} was terminated".format(name, pids[name]))
+              finished.put((name,1)); llost = True
+            continue
+          if name not in running: continue # job was already marked as failed
+          job = running.pop(name); used -= job.memory
+          finishJob(job, ec)
+      finally:
+        # N.B.: lost jobs are never completed, so the pool would wait for them forever
+        if llost: pool.terminate()
+        else: pool.close()
+        pool.join()
+    else:
+      # run jobs in order of readiness in the current process
+      ready = self.readyJobs()
+      while ready:
+        job = ready[0]
+        func, args, kwargs = jobArgs(job)
+        job.state = 'running'
+        finishJob(job, func(*args, **kwargs))
+        ready = self.readyJobs()
+    ## evaluate job states
+    nfail = sum(job.state in ('failed','skipped','pending') for job in self.jobs.values())
+    nop = len(self.jobs) - nfail
+    if nfail == 0:
+      logger.info('\n   >>>   All {:d} jobs completed successfully!!!   <<<   \n'.format(nop))
+    else:
+      logger.info('\n   ===   {:2d} jobs completed successfully!    ===   \n'.format(nop) +
+                  '\n   ###   {:2d} jobs did not complete/failed!   ###   \n'.format(nfail))
+    logger.info(datetime.today())
+    # return number of failures as exit code
+    return nfail
@@ -22,6 +22,7 @@ from datasets import gridded_datasets
 from processing.misc import getMetaData, getTargetFile, getExperimentList, loadYAML,\
   getProjectVars
 from processing.multiprocess import asyncPoolEC
+from processing.scheduler import JobScheduler, estimateSourceMemory, getJobName
 from processing.process import CentralProcessingUnit
 
 
@@ -115,7 +116,7 @@ def performShapeAverage(dataset, mode, shape_name, shape_dict, dataargs, loverwr
     CPU = CentralProcessingUnit(source, sink, varlist=varlist, tmp=False, feedback=ldebug)
   
     # extract data at station locations
-    CPU.ShapeAverage(shape_dict=shape_dict, shape_name=shape_name, flush=True)
+    CPU.ShapeAverage(shape_dict=shape_dict, shape_name=shape_name, lcache=True, flush=True) # cache shape masks
     # get results    
     CPU.sync(flush=True)
     
@@ -173,6 +174,8 @@ if __name__ == '__main__':
     NP = NP or config['NP']
     loverwrite = config['loverwrite']
     lappend = config['lappend']
+    memory = config.get('memory',None) # memory budget in MB (uses the job scheduler)
+    statefile = config.get('statefile',None) # record completed jobs, so that a batch can be resumed
     # source data specs
     modes = config['modes']
     varlist = config['varlist']
@@ -199,6 +202,7 @@ if __name__ == '__main__':
   else:
 #     NP = 1 ; ldebug = True # for quick computations
     NP = 8; ldebug = False # for quick computations
+    memory = None; statefile = None # no memory budget (use asyncPoolEC)
 #     modes = ('time-series','climatology')
     modes = ('climatology',)
 #     modes = ('time-series',) 
@@ -426,6 +430,15 @@ if __name__ == '__main__':
   kwargs = dict(loverwrite=loverwrite, varlist=varlist)
           
   ## call parallel execution function
-  ec = asyncPoolEC(performShapeAverage, args, kwargs, NP=NP, ldebug=ldebug, ltrialnerror=True)
+  if memory is None:
+    ec = asyncPoolEC(performShapeAverage, args, kwargs, NP=NP, ldebug=ldebug, ltrialnerror=True)
+  else:
+    # admit jobs subject to a memory budget (estimated from the source files; largest jobs first)
+    scheduler = JobScheduler(statefile=statefile)
+    for arg in args:
+      dataset, mode, dataargs = arg[0], arg[1], arg[4]
+      scheduler.addJob(name=getJobName(dataset, mode, dataargs), func=performShapeAverage, args=arg, kwargs=kwargs,
+                       memory=estimateSourceMemory(dataset, mode, dataargs))
+    ec = scheduler.run(NP=NP, memory=memory, ldebug=ldebug, ltrialnerror=True)
   # exit with fraction of failures (out of 10) as exit code
   exit(int(10+int(10.*ec/len(args))) if ec > 0 else 0)
@@ -11,6 +11,9 @@ import numpy as np
 import numpy.ma as ma
 import gzip, shutil, tempfile
 import os, gc
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from collections import deque
 # internal imports
 from geodata.base import Variable, Axis, Dataset
 from geodata.gdal import addGDALtoDataset, addGDALtoVar, getAxes
@@ -36,12 +39,31 @@ def samplingUnits(sampling):
         raise NotImplementedError(sampling)
     return units 
 
+def getRasterPool(NP=None, lthreads=False):
+    ''' return a process or thread pool for reading rasters (or None, if NP is None or 1) '''
+    if NP is None or NP == 1: return None
+    if NP == 0: NP = multiprocessing.cpu_count()
+    return ThreadPool(processes=NP) if lthreads else multiprocessing.Pool(processes=NP)
+
+def imapBounded(pool, func, tasks, window=None):
+    ''' apply func to tasks (tuples of args and kwargs) in order, like Pool.imap, but with at most 'window' 
+        results pending at any time, so that peak memory is bounded; runs serially, if pool is None '''
+    if pool is None:
+        for args,kwargs in tasks: yield func(*args, **kwargs)
+    else:
+        if window is None: window = pool._processes
+        pending = deque()
+        for args,kwargs in tasks:
+            if len(pending) >= window: yield pending.popleft().get()
+            pending.append(pool.apply_async(func, args, kwargs))
+        while pending: yield pending.popleft().get()
+
 ## functions to convert a raster dataset to NetCDF (time-step by time-step)
 
 def convertRasterToNetCDF(filepath=None, raster_folder=None, raster_path_func=None, start_date=None, end_date=None, sampling='M', 
                           ds_atts=None, vardefs=None, projection=None, geotransform=None, size=None,  griddef=None, 
                           lgzip=None, lgdal=True, lmask=True, lskipMissing=True, lfeedback=True, var_start_idx=None,
-                          loverwrite=False, use_netcdf_tools=True, lzlib=True, **ncargs):
+                          loverwrite=False, use_netcdf_tools=True, lzlib=True, NP=None, lthreads=False, **ncargs):
     ''' function to load a set of raster variables that are stored in a systematic directory tree into a NetCDF dataset
         Variables are defined as follows:
           vardefs[varname] = dict(name=string, units=string, axes=tuple of strings, atts=dict, plot=dict, dtype=np.dtype, fillValue=value)
@@ -49,6 +71,9 @@ def convertRasterToNetCDF(filepath=None, raster_folder=None, raster_path_func=No
         the latter is constructed from start_date, end_date and sampling and stored following CF convention. 
         The path to raster files is constructed as raster_folder+raster_path, where raster_path is the output of 
         raster_path_func(datetime, varname, **varatts), which has to be defined by the user.        
+        If NP > 1, rasters are read and decoded by a pool of NP processes (or threads, if lthreads=True), 
+        while the main process writes each raster slab to the NetCDF variable in order; at most NP 
+        slabs are held in memory at any time.
     '''
     import pandas as pd
     import netCDF4 as nc
@@ -171,7 +196,8 @@ def convertRasterToNetCDF(filepath=None, raster_folder=None, raster_path_func=No
     # get fillValues
     fillValues = {varname:varatts.get('fillValue',None) for varname,varatts in vardefs.items()}
                 
-    ## loop over datetimes
+    ## construct list of rasters to read (in the order they are written)
+    tasks = []; task_info = []
     for i,dt64 in enumerate(datetime64_array):
         
         datetime = pd.to_datetime(dt64)
@@ -179,47 +205,58 @@ def convertRasterToNetCDF(filepath=None, raster_folder=None, raster_path_func=No
         ## loop over variables
         for varname,varatts in vardefs.items():
           
-            i0 = var_start_idx[varname]
             # skip existing data
-            if i >= i0:
-                # actually add data now
-                if i0 == i and i > 0 and lfeedback:
-                    print("{}: appending after {} timesteps.".format(varname,i))
-                nc_name = varatts.get('name',varname)
-                fillValue = fillValues[varname]
+            if i >= var_start_idx[varname]:
                 # construct file names
                 raster_path = raster_path_func(datetime, varname, **varatts)
                 raster_path = raster_folder + raster_path
-                if lfeedback: print(raster_path)
-                # load raster data and save to NetCDF
                 if lgzip is None: # will only trigger once
                     lgzip = raster_path.endswith('.gz')
-                if os.path.exists(raster_path):
-                    raster_data, geotrans, nodata = readASCIIraster(raster_path, lgzip=lgzip, lgdal=lgdal, dtype=varatts.get('dtype',np.float32), 
-                                                                    lmask=lmask, fillValue=None, lgeotransform=True, lna=True)
-                    assert all(np.isclose(geotrans,griddef.geotransform)), geotrans           
-                    if fillValue is None: 
-                        fillValues[varname] = nodata # remember for next field
-                    elif fillValue != nodata:
-                        raise NotImplementedError('No data/fill values need to be consistent: {} != {}'.format(fillValue,nodata)) 
-                    # scale, if appropriate
-                    if 'scalefactor' in varatts: raster_data *= varatts['scalefactor']
-                    if 'offset' in varatts: raster_data += varatts['offset']
-                elif lskipMissing:
-                    print("Skipping missing raster: '{}'".format(raster_path))  
-                    # create an array of missing data
-                    if lmask:
-                        raster_data = np.ma.masked_all(shape=var_shp[1:], dtype=varatts['dtype']) # no time dim; all masked
-                    elif fillValue is not None:
-                        raster_data = np.full(shape=var_shp[1:], fill_value=fillValue, dtype=varatts['dtype']) # no time dim; all filled
-                    else:
-                        NotImplementedError("Need to be able to generate missing data in order to skip missing raster.")
-                # save data to NetCDF
+                kwargs = dict(lgzip=lgzip, lgdal=lgdal, dtype=varatts.get('dtype',np.float32), 
+                              scalefactor=varatts.get('scalefactor',None), offset=varatts.get('offset',None))
+                tasks.append(((raster_path,),kwargs)); task_info.append((i,varname,raster_path))
+                
+    ## read rasters (possibly in parallel) and save each slab to NetCDF, as soon as it is available
+    pool = getRasterPool(NP=NP, lthreads=lthreads)
+    try:
+        for (i,varname,raster_path),raster in zip(task_info, imapBounded(pool, readRasterSlab, tasks)):
+            
+            varatts = vardefs[varname]; i0 = var_start_idx[varname]
+            # actually add data now
+            if i0 == i and i > 0 and lfeedback:
+                print("{}: appending after {} timesteps.".format(varname,i))
+            nc_name = varatts.get('name',varname)
+            fillValue = fillValues[varname]
+            if lfeedback: print(raster_path)
+            # check raster data
+            if raster is not None:
+                raster_data, geotrans, nodata = raster
+                assert all(np.isclose(geotrans,griddef.geotransform)), geotrans           
+                if fillValue is None: 
+                    fillValues[varname] = nodata # remember for next field
+                elif fillValue != nodata:
+                    raise NotImplementedError('No data/fill values need to be consistent: {} != {}'.format(fillValue,nodata)) 
+            elif lskipMissing:
+                print("Skipping missing raster: '{}'".format(raster_path))  
+                # create an array of missing data
                 if lmask:
-                    if fillValue is not None: raster_data = raster_data.filled(fillValue)
-                    else: raster_data = raster_data.filled() # hopefully default was set...
-                ncds.variables[nc_name][i,:,:] = raster_data
-        ## maybe compute some derived variables?
+                    raster_data = np.ma.masked_all(shape=var_shp[1:], dtype=varatts['dtype']) # no time dim; all masked
+                elif fillValue is not None:
+                    raster_data = np.full(shape=var_shp[1:], fill_value=fillValue, dtype=varatts['dtype']) # no time dim; all filled
+                else:
+                    raise NotImplementedError("Need to be able to generate missing data in order to skip missing raster.")
+            else:
+                raise IOError(raster_path)
+            # save data to NetCDF
+            if lmask:
+                if fillValue is not None: raster_data = raster_data.filled(fillValue)
+                else: raster_data = raster_data.filled() # hopefully default was set...
+            ncds.variables[nc_name][i,:,:] = raster_data
+            del raster, raster_data
+    finally:
+        if pool is not None: 
+            pool.close(); pool.join()
+    ## maybe compute some derived variables?
 
     # set missing value flags (fillValue may have to be inferred from ascii, hence set last)
     for varname,fillValue in fillValues.items():
@@ -234,6 +271,17 @@ def convertRasterToNetCDF(filepath=None, raster_folder=None, raster_path_func=No
     ncds.sync(); ncds.close()
     return filepath
 
+def readRasterSlab(raster_path, lgzip=None, lgdal=True, dtype=np.float32, scalefactor=None, offset=None):
+    ''' read a single raster file for convertRasterToNetCDF and apply scaling and offset; returns a masked 
+        array, the geotransform and the no-data value, or None, if the file does not exist '''
+    if not os.path.exists(raster_path): return None
+    raster_data, geotrans, nodata = readASCIIraster(raster_path, lgzip=lgzip, lgdal=lgdal, dtype=dtype, 
+                                                    lmask=True, fillValue=None, lgeotransform=True, lna=True)
+    # scale, if appropriate
+    if scalefactor is not None: raster_data *= scalefactor
+    if offset is not None: raster_data += offset
+    return raster_data, geotrans, nodata
+
 ## functions to construct Variables and Datasets from ASCII raster data
 
 def rasterDataset(name=None, title=None, vardefs=None, axdefs=None, atts=None, projection=None, griddef=None,
@@ -389,8 +437,10 @@ def rasterVariable(name=None, units=None, axes=None, atts=None, plot=None, dtype
 ## functions to load ASCII raster data
 
 def readRasterArray(file_pattern, lgzip=None, lgdal=True, dtype=np.float32, lmask=True, fillValue=None, lfeedback=False,
-                    lgeotransform=True, axes=None, lna=False, lskipMissing=False, path_params=None, **kwargs):
-    ''' function to load a multi-dimensional numpy array from several structured ASCII raster files '''
+                    lgeotransform=True, axes=None, lna=False, lskipMissing=False, path_params=None, NP=None, 
+                    lthreads=False, **kwargs):
+    ''' function to load a multi-dimensional numpy array from several structured ASCII raster files; if NP > 1, 
+        raster files are read by a pool of NP processes (or threads, if lthreads=True) '''
     
     if axes is None: raise NotImplementedError
     #TODO: implement automatic detection of axes arguments and axes order
@@ -452,39 +502,46 @@ def readRasterArray(file_pattern, lgzip=None, lgdal=True, dtype=np.float32, lmas
       data[:i0,:,:] = ma.masked if lmask else fillValue # mask all invalid rasters up to first valid raster
     data[i0,:,:] = data2D # add first (valid) raster
     
-    # loop over remaining 2D raster files
-    for i,file_kwargs in enumerate(file_kwargs_list[i0:]):
-        
+    # read remaining 2D raster files (possibly in parallel)
+    raster_kwargs = dict(lgzip=lgzip, lgdal=lgdal, dtype=dtype, lna=False, lmask=lmask, fillValue=fillValue, 
+                         lgeotransform=lgeotransform, **kwargs)
+    tasks = []
+    for file_kwargs in file_kwargs_list[i0+1:]:
         path_params.update(file_kwargs) # update axes parameters
-        filepath = file_pattern.format(**path_params) # construct file name
-        if os.path.exists(filepath):
-            if lfeedback: print('.', end=' ') # indicate data with bar/pipe
-            # read 2D raster file
-            data2D = readASCIIraster(filepath, lgzip=lgzip, lgdal=lgdal, dtype=dtype, lna=False,
-                                     lmask=lmask, fillValue=fillValue, lgeotransform=lgeotransform, **kwargs)
-            # check geotransform
-            if lgeotransform: 
-                data2D, geotransform = data2D
-                if not geotransform == geotransform0:
-                    raise AxisError(geotransform) # to make sure all geotransforms are identical!
-            else: geotransform = None
-            # size information
-            if not shape2D == data2D.shape:
-                raise AxisError(data2D.shape) # to make sure all geotransforms are identical!            
-            # insert 2D raster into 3D array
-            data[i+i0,:,:] = data2D # raster shape has to match
-        elif lskipMissing:
-            # fill with masked values
-            data[i+i0,:,:] = ma.masked # mask missing raster
-            if lfeedback: print(' ', end=' ') # indicate missing with dot
-        else:
-          raise IOError(filepath)
+        tasks.append(((file_pattern.format(**path_params),),raster_kwargs)) # construct file name
+    geotransform = geotransform0 if lgeotransform else None
+    pool = getRasterPool(NP=NP, lthreads=lthreads)
+    try:
+        for i,(task,data2D) in enumerate(zip(tasks, imapBounded(pool, readRasterFile, tasks)), start=i0+1):
+            
+            filepath = task[0][0]
+            if data2D is not None:
+                if lfeedback: print('.', end=' ') # indicate data with bar/pipe
+                # check geotransform
+                if lgeotransform: 
+                    data2D, geotransform = data2D
+                    if not geotransform == geotransform0:
+                        raise AxisError(geotransform) # to make sure all geotransforms are identical!
+                # size information
+                if not shape2D == data2D.shape:
+                    raise AxisError(data2D.shape) # to make sure all geotransforms are identical!            
+                # insert 2D raster into 3D array
+                data[i,:,:] = data2D # raster shape has to match
+            elif lskipMissing:
+                # fill with masked values
+                data[i,:,:] = ma.masked # mask missing raster
+                if lfeedback: print(' ', end=' ') # indicate missing with dot
+            else:
+              raise IOError(filepath)
+    finally:
+        if pool is not None: 
+            pool.close(); pool.join()
 
     # complete feedback with linebreak
     if lfeedback: print('')
     
     # reshape and check dimensions
-    assert i+i0 == data.shape[0]-1, (i,i0)
+    assert len(tasks)+i0+1 == data.shape[0], (len(tasks),i0)
     data = data.reshape(shape+shape2D) # now we have the full shape
     gc.collect() # remove duplicate data
     
@@ -498,6 +555,43 @@ def readRasterArray(file_pattern, lgzip=None, lgdal=True, dtype=np.float32, lmas
     return return_data
 
 
+def parseASCIIraster(content, dtype=np.float32):
+    ''' parse the content (bytes) of an Arc/Info ASCII Grid file; returns a 2D array (with the origin in the
+        lower left corner, like the GDAL reader), the geotransform and the no-data value '''
+    # parse header lines (until the first line starting with a number)
+    header = dict(); pos = 0
+    while True:
+        end = content.find(b'\n', pos)
+        if end < 0: end = len(content)
+        line = content[pos:end].split()
+        if len(line) != 2 or not line[0][:1].isalpha(): break
+        header[line[0].decode().upper()] = line[1].decode()
+        pos = end + 1
+    try:
+        ie = int(header['NCOLS']); je = int(header['NROWS']); d = float(header['CELLSIZE'])
+        if 'XLLCORNER' in header: xll = float(header['XLLCORNER'])
+        else: xll = float(header['XLLCENTER']) - d/2.
+        if 'YLLCORNER' in header: yll = float(header['YLLCORNER'])
+        else: yll = float(header['YLLCENTER']) - d/2.
+    except KeyError as e:
+        raise IOError("Missing header info: {}".format(e))
+    na = np.dtype(dtype).type(header['NODATA_VALUE']) if 'NODATA_VALUE' in header else None
+    # parse numbers directly from the byte string (whitespace separated, newlines are ignored)
+    data = np.fromstring(content[pos:], dtype=dtype, sep=' ')
+    if data.size != ie*je:
+        raise IOError("Raster size does not match header: {} != {} x {}".format(data.size, je, ie))
+    # the first row is the top row: flip y-axis
+    data = flip(data.reshape((je,ie)), axis=-2)
+    geotransform = (xll, d, 0., yll, 0., d)
+    return data, geotransform, na
+
+
+def readRasterFile(filepath, **kwargs):
+    ''' read a single raster file for readRasterArray (returns None, if the file does not exist) '''
+    if not os.path.exists(filepath): return None
+    return readASCIIraster(filepath, **kwargs)
+
+
 def readASCIIraster(filepath, lgzip=None, lgdal=True, dtype=np.float32, lmask=True, fillValue=None, 
                     lgeotransform=True, lna=False, **kwargs):
     ''' load a 2D field from an ASCII raster file (can be compressed); return (masked) numpy array and geotransform '''
@@ -512,16 +606,17 @@ def readASCIIraster(filepath, lgzip=None, lgdal=True, dtype=np.float32, lmask=Tr
         os.environ.setdefault('GDAL_DATA','/usr/local/share/gdal') # set default environment variable to prevent problems in IPython Notebooks
         gdal.UseExceptions() # use exceptions (off by default)
           
-        if lgzip and not ( ramdisk and os.path.exists(ramdisk) ):
-            raise IOError("RAM disk '{}' not found; RAM disk is required to unzip raster files for GDAL.".format(ramdisk) + 
-                          "\nSet the RAM disk location using the RAMDISK environment variable.")
+        # without a RAM disk, GDAL's virtual file system is used to read directly from the gzip stream
+        lvsigzip = lgzip and not ( ramdisk and os.path.exists(ramdisk) )
               
         ## use GDAL to read raster and parse meta data
         ds = tmp = None # for graceful exit
         try: 
           
             # if file is compressed, create temporary decompresse file
-            if lgzip:
+            if lvsigzip:
+              filepath = '/vsigzip/' + filepath # decompressed on the fly by GDAL
+            elif lgzip:
               with gzip.open(filepath, mode='rb') as gz, tempfile.NamedTemporaryFile(mode='wb', dir=ramdisk, delete=False) as tmp:
                 shutil.copyfileobj(gz, tmp)
               filepath = tmp.name # full path of the temporary file (must not be deleted upon close!)
@@ -568,37 +663,24 @@ def readASCIIraster(filepath, lgzip=None, lgdal=True, dtype=np.float32, lmask=Tr
   
     else:
         
-        ## parse header manually and use Numpy's genfromtxt to read array
+        ## parse header manually and use a fast numeric parser to read the array
         
         # handle compression on the fly (no temporary file)
         if lgzip: Raster = gzip.open(filepath, mode='rb')
         else: Raster = open(filepath, mode='rb')
     
-        # open file
-        with Raster:
+        # read file content and parse
+        with Raster: content = Raster.read()
+        data, geotransform, na = parseASCIIraster(content, dtype=dtype)
+        del content
         
-            # read header information
-            headers = ('NCOLS','NROWS','XLLCORNER','YLLCORNER','CELLSIZE','NODATA_VALUE')
-            hdtypes = (int,int,float,float,float,dtype)
-            hvalues = []
-            # loop over items
-            for header,hdtype in zip(headers,hdtypes):
-                name, val = Raster.readline().split()
-                if name.upper() != header: 
-                    raise IOError("Unknown header info: '{:s}' != '{:s}'".format(name,header))
-                hvalues.append(hdtype(val))
-            ie, je, xll, yll, d, na = hvalues
-            # derive geotransform
-            if lgeotransform: geotransform = (xll, d, 0., yll, 0., d)
-            
-            # read data
-            #print ie, je, xll, yll, d, na
-            # N.B.: the file cursor is already moved to the end of the header, hence skip_header=0
-            data = np.genfromtxt(Raster, skip_header=0, dtype=dtype, usemask=lmask, 
-                                 missing_values=na, filling_values=fillValue, **kwargs)
-          
-        if not data.shape == (je,ie):
-            raise IOError(data.shape, ie, je, xll, yll, d, na,)
+        # mask or replace missing values
+        if lmask: 
+            data = ma.masked_equal(data, value=na, copy=False)
+            if fillValue is not None: data._fill_value = fillValue
+            else: data._fill_value = na
+        elif fillValue is not None and na is not None: 
+            data[data == na] = fillValue # replace original fill value 
       
     # return data and optional meta data
     if lgeotransform or lna:
@@ -608,3 +690,155 @@ def readASCIIraster(filepath, lgzip=None, lgdal=True, dtype=np.float32, lmask=Tr
     else: 
         return_data = data
     return return_data
+
+
+## functions to write ASCII rasters directly (without GDAL)
+
+# default size of blocks of rasters that are formatted together (in bytes)
+blockbytes = 2**26
+
+def formatASCIIheader(shape, geotransform, noDataValue=None, fmt='%.8g'):
+    ''' format the header of an Arc/Info ASCII Grid file, like the GDAL AAIGrid driver; 'shape' is 
+        (nrows, ncols) and the geotransform refers to the lower left corner (dy > 0) '''
+    nrows, ncols = shape
+    x0, dx, s, y0, t, dy = geotransform
+    if s != 0 or t != 0: raise NotImplementedError("Rotated grids are not supported: {}".format(geotransform))
+    header = 'ncols        {:d}\nnrows        {:d}\n'.format(ncols,nrows)
+    header += 'xllcorner    {:.12f}\nyllcorner    {:.12f}\n'.format(x0,y0)
+    if np.isclose(dx,dy): header += 'cellsize     {:.12f}\n'.format(dx)
+    else: header += 'dx           {:.12f}\ndy           {:.12f}\n'.format(dx,dy)
+    if noDataValue is not None: header += 'NODATA_value  {:s}\n'.format(fmt%noDataValue)
+    return header
+
+def formatASCIIblock(block, fmt='%.8g'):
+    ''' format a 3D block of rasters (bands, rows, columns) as the bodies of ASCII raster files (the first 
+        row is the top row); a template for the entire raster is applied to all values of a band at once, 
+        so that there is no Python loop over values or rows '''
+    nrows, ncols = block.shape[-2:]
+    template = ( (' '+fmt)*ncols + '\n' )*nrows
+    return [template % tuple(band.ravel().tolist()) for band in block]
+
+def writeRasterBlock(filepaths, block, header='', fmt='%.8g', lgzip=False):
+    ''' format a 3D block of rasters and write one ASCII raster file for each band (optionally gzip 
+        compressed); this is the worker function for exportASCIIraster '''
+    for filepath,body in zip(filepaths,formatASCIIblock(block, fmt=fmt)):
+        content = ( header + body ).encode('ascii')
+        with ( gzip.open(filepath, mode='wb') if lgzip else open(filepath, mode='wb') ) as f:
+            f.write(content)
+    return filepaths
+
+def rasterFilenames(var, prefix, lcoord=False, lfortran=True, formatter=None):
+    ''' construct the file names (without folder and extension) of all horizontal slices of a Variable, 
+        following the naming conventions of the ASCII_raster method of GDAL-enabled Variables (in C-order) '''
+    names = [prefix]
+    for n,ax in enumerate(var.axes[:-2]):
+        # N.B.: the recursive ASCII_raster method only applies formatting options to the outer axis
+        if n > 0: lcoord = False; lfortran = True; formatter = None
+        lenax = len(ax); axname = ax.name
+        one = 1 if lfortran else 0 # Fortran or C indexing
+        if formatter and axname in formatter:
+            fmt = formatter[axname]
+            if isinstance(fmt, (list,tuple)): axtag = fmt[0]; fmt = fmt[1]
+            else: axtag = None # assign below
+        else:
+            axtag = None # assign below
+            if lcoord: fmt = '{}' # just a default... usually user-specified
+            else: fmt = '{{:0{:d}d}}'.format(int(np.ceil(np.log10(lenax+one)))) # number of digits
+        if axtag is None: axtag = axname if lcoord else 'i{:s}'.format(axname.title())
+        values = ax.coord if lcoord else range(one,lenax+one)
+        names = ['{:s}_{:s}_{:s}'.format(name,axtag,fmt).format(value) for name in names for value in values]
+    return names
+
+def exportASCIIraster(var, prefix=None, folder=None, ext='.asc', wrap360=False, fillValue=None, noDataValue=None, 
+                      lcoord=False, lfortran=True, formatter=None, fmt=None, lgzip=False, NP=None, lthreads=True, 
+                      blocksize=None, pool=None):
+    ''' Export a GDAL-enabled Variable to ASCII raster files (one for each horizontal slice) without GDAL: the
+        header is written directly and blocks of slices along the first axis are read and formatted at once;
+        file names and options are the same as for the ASCII_raster method of GDAL-enabled Variables, but 
+        files can be written concurrently by NP workers (threads or processes) and can be compressed with 
+        gzip ('.gz' is appended); 'fmt' is a printf-style format string for values (default: '%d' for 
+        integers and '%.8g' for floats); returns a list of file paths. '''
+    if not var.gdal: raise ArgumentError("Exporting to ASCII_raster format requires a GDAL-enabled Variable.")
+    if var.axisIndex(var.xlon) != var.ndim-1 or var.axisIndex(var.ylat) != var.ndim-2:
+        raise NotImplementedError("Horizontal axes have to be the last indices.")
+    if folder is None: raise IOError("Need to specify a folder to export to ASCII raster file.")
+    prefix = prefix or var.name
+    # fill values and data type (same as getGDAL)
+    if fillValue is None:
+        if var.fillValue is not None: fillValue = var.fillValue
+        else: fillValue = ma.default_fill_value(var.dtype)
+    if noDataValue is None: noDataValue = fillValue
+    if var.dtype in (np.float32,np.float64,np.int16,np.int32): dtype = var.dtype
+    elif np.issubdtype(var.dtype,np.inexact): dtype = np.dtype('f4')
+    else: dtype = np.dtype('i2') # integers and booleans
+    if fmt is None: fmt = '%.8g' if np.issubdtype(dtype,np.inexact) else '%d'
+    # geotransform of output (wrap-around and orientation: the first row is the top row)
+    ye, xe = var.shape[-2:]
+    x0, dx, s, y0, t, dy = var.geotransform
+    shift = int( 180. / dx ) if wrap360 else 0
+    x0 -= shift*dx
+    lflip = dy > 0
+    if not lflip: y0 += ye*dy; dy = -1*dy # use lower left corner for header
+    header = formatASCIIheader((ye,xe), (x0,dx,s,y0,t,dy), noDataValue=noDataValue if var.masked else None, fmt=fmt)
+    # file names
+    names = rasterFilenames(var, prefix, lcoord=lcoord, lfortran=lfortran, formatter=formatter)
+    if ext: names = [name+ext for name in names]
+    if lgzip: names = [name+'.gz' for name in names]
+    filepaths = ['{:s}/{:s}'.format(folder,name) for name in names]
+    # read blocks along the first (non-horizontal) axis (NetCDF variables are read block by block)
+    lfile = not var.data and hasattr(var,'ncvar')
+    if lfile and var.ndim > 2 and var.slices:
+        # N.B.: preset slices can not be merged with the block slices, so sliced axes have to be loaded
+        slc = var.slices[0]; lfile = isinstance(slc,slice) and slc == slice(None)
+    if not var.data and not lfile: var.load()
+    if var.ndim == 2: nblk = 1; nbnd = 1; blocksize = 1
+    else:
+        nblk = var.shape[0]; nbnd = len(filepaths)//nblk # bands per element of first axis
+        if blocksize is None: blocksize = max(1, int(blockbytes//(np.dtype(dtype).itemsize*xe*ye*nbnd)))
+    def tasks():
+        for i in range(0,nblk,blocksize):
+            j = min(i+blocksize,nblk)
+            data = var[:] if var.ndim == 2 else var[(slice(i,j),)+(slice(None),)*(var.ndim-1)]
+            if isinstance(data,ma.MaskedArray): data = data.filled(fillValue)
+            data = np.asarray(data)
+            if np.issubdtype(data.dtype,np.inexact): data = np.where(np.isnan(data), fillValue, data)
+            data = data.astype(dtype, copy=False).reshape((-1,ye,xe))
+            if shift: data = np.roll(data, shift, axis=2)
+            if lflip: data = flip(data, axis=-2)
+            yield (filepaths[i*nbnd:j*nbnd], data), dict(header=header, fmt=fmt, lgzip=lgzip)
+    # write files, using a pool of workers
+    lpool = pool is None
+    if lpool:
+        # N.B.: daemonic processes (e.g. workers of asyncPoolEC) can not have child processes
+        if multiprocessing.current_process().daemon: lthreads = True
+        pool = getRasterPool(NP=NP, lthreads=lthreads)
+    try:
+        for _ in imapBounded(pool, writeRasterBlock, tasks()): pass
+    finally:
+        if lpool and pool is not None: pool.close(); pool.join()
+    return filepaths
+
+def exportASCIIdataset(dataset, varlist=None, prefix=None, folder=None, NP=None, lthreads=True, **kwargs):
+    ''' Export all GDAL-enabled Variables of a Dataset to ASCII raster files using exportASCIIraster (one pool 
+        of workers is used for all Variables); varlist and prefix work like in the ASCII_raster method of 
+        GDAL-enabled Datasets; returns a dictionary with lists of file paths for each Variable '''
+    if varlist is None: varlist = list(dataset.variables.keys())
+    if not isinstance(varlist, (dict,tuple,list)): raise TypeError(varlist)
+    if isinstance(varlist, (tuple,list)): varlist = {var:None for var in varlist}
+    if not folder: 
+        raise ArgumentError("A valid folder is necessary to export a dataset to ASCII raster format.")
+    if not os.path.exists(folder): os.makedirs(folder) # make sure folder exists
+    if multiprocessing.current_process().daemon: lthreads = True
+    pool = getRasterPool(NP=NP, lthreads=lthreads)
+    filedict = dict()
+    try:
+        for varname,vartag in varlist.items():
+            var = dataset.variables[varname]
+            if vartag is None: vartag = var.name
+            # skip variables that are not gdal enabled
+            if var.gdal: 
+                pf = '{:s}_{:s}'.format(prefix,vartag) if prefix else vartag
+                filedict[vartag] = exportASCIIraster(var, prefix=pf, folder=folder, pool=pool, **kwargs)
+    finally:
+        if pool is not None: pool.close(); pool.join()
+    return filedict
@@ -0,0 +1,258 @@
+'''
+A local catalog of the files in the data archive, backed by an SQLite database: for each file the
+size and modification time are recorded, as well as meta data (dataset, experiment, mode, grid,
+period and, optionally, the variables in the file). Scans are incremental, i.e. only folders that
+have changed since the last scan are listed again, and only new or modified files are examined.
+The loaders and the skip/overwrite logic of the batch scripts use the catalog as a fast path for
+existence checks and modification times, if a default catalog is active (see setCatalog or the
+GEODATA_CATALOG environment variable); otherwise, the file system is queried directly.
+'''
+
+import os
+import re
+import sqlite3
+import fnmatch
+from time import time
+# internal imports
+from geodata.misc import ArgumentError
+
+
+## parse meta data from file names
+
+# file names follow the pattern '{filetype}[_d{domain}][_{grid}]_{mode}[_{period}].nc', e.g.
+# 'wrfsrfc_d01_arb2_clim_1979-1994.nc', 'cru_clim_1979-2009.nc' or 'cesmatm_monthly.nc'
+filename_regex = re.compile(r'^(?P<filetype>[^_]+)(?:_(?P<domain>d\d\d))?(?:_(?P<grid>.+?))?_(?P<mode>clim|monthly|daily)(?:_(?P<period>[^_]+?))?\.nc$')
+mode_names = dict(clim='climatology', monthly='time-series', daily='daily')
+
+def parseFilename(filename):
+  ''' infer file type, domain, grid, mode and period from a file name (heuristic, based on the naming
+      conventions of getFileName and the FileType classes); fields that are not found are None '''
+  meta = dict(filetype=None, domain=None, grid=None, mode=None, period=None)
+  match = filename_regex.match(os.path.basename(filename))
+  if match:
+    meta.update(match.groupdict())
+    meta['mode'] = mode_names[meta['mode']]
+  return meta
+
+def readVariables(filepath):
+  ''' read the names of the variables in a NetCDF file (None, if the file can not be read) '''
+  import netCDF4 as nc
+  try:
+    with nc.Dataset(filepath, mode='r') as ncfile: varlist = list(ncfile.variables.keys())
+  except (IOError, OSError, RuntimeError): varlist = None # e.g. incomplete files from crashed jobs
+  return varlist
+
+
+## the catalog
+
+class ArchiveCatalog(object):
+  '''
+    A catalog of files in the data archive, stored in an SQLite database; lookups are answered from the
+    catalog for all files in folders that have been scanned, without accessing the (shared) file system;
+    the scan pattern is recorded for each folder, and files that do not match it are not covered.
+    N.B.: the catalog is only as current as the last scan, so folders should be rescanned before a
+          batch run, and files that are written should be registered with updateFile.
+  '''
+  columns = ('path', 'folder', 'filename', 'dataset', 'experiment', 'mode', 'grid', 'period', 'filetype',
+             'domain', 'variables', 'size', 'mtime')
+
+  def __init__(self, dbfile, timeout=60.):
+    ''' open catalog database (a new database is created, if it does not exist) '''
+    if not isinstance(dbfile,str): raise TypeError(dbfile)
+    self.dbfile = os.path.abspath(dbfile)
+    self.timeout = timeout # concurrent writers wait for the lock
+    self._conn = None; self._pid = None
+    with self.connection as conn:
+      conn.execute('''CREATE TABLE IF NOT EXISTS folders (folder TEXT PRIMARY KEY, parent TEXT,
+                      mtime REAL, scanned REAL, dataset TEXT, experiment TEXT, pattern TEXT)''')
+      conn.execute('''CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, folder TEXT, filename TEXT,
+                      dataset TEXT, experiment TEXT, mode TEXT, grid TEXT, period TEXT, filetype TEXT,
+                      domain TEXT, variables TEXT, size INTEGER, mtime REAL)''')
+      conn.execute('CREATE INDEX IF NOT EXISTS files_folder ON files (folder)')
+      conn.execute('CREATE INDEX IF NOT EXISTS files_meta ON files (dataset, experiment, mode, grid)')
+
+  @property
+  def connection(self):
+    ''' a connection to the database; connections can not be shared between processes, so a new
+        connection is opened in (forked) worker processes '''
+    if self._conn is None or self._pid != os.getpid():
+      self._conn = sqlite3.connect(self.dbfile, timeout=self.timeout)
+      self._pid = os.getpid()
+    return self._conn
+
+  def close(self):
+    ''' close database connection '''
+    if self._conn is not None and self._pid == os.getpid(): self._conn.close()
+    self._conn = None; self._pid = None
+
+  def __getstate__(self):
+    ''' connections are not pickled (for multiprocessing) '''
+    state = self.__dict__.copy(); state['_conn'] = None; state['_pid'] = None
+    return state
+
+  ## scanning
+
+  def scan(self, folder, dataset=None, experiment=None, pattern='*.nc', lrecursive=False, lvariables=False,
+           lforce=False):
+    ''' scan a folder and record all files matching 'pattern'; scans are incremental: folders are only
+        listed, if their modification time changed (i.e. files were added, removed or renamed), and
+        only new or modified files are examined; with 'lforce', all files are checked again (files
+        that are modified in place do not change the folder's modification time); if 'lvariables' is
+        True, the variable names are read from the file headers; returns the number of updated files '''
+    folder = os.path.abspath(folder)
+    if not os.path.isdir(folder): raise IOError("Folder '{:s}' does not exist!".format(folder))
+    conn = self.connection
+    with conn:
+      nupd = self._scanFolder(conn, folder, None, dataset, experiment, pattern, lrecursive, lvariables, lforce)
+    return nupd
+
+  def _scanFolder(self, conn, folder, parent, dataset, experiment, pattern, lrecursive, lvariables, lforce):
+    ''' scan a single folder (and sub-folders); the transaction is handled by the caller '''
+    mtime = os.stat(folder).st_mtime
+    row = conn.execute('SELECT mtime, dataset, experiment, pattern FROM folders WHERE folder = ?', (folder,)).fetchone()
+    # N.B.: dataset and experiment are inherited from previous scans, if they are not given
+    if row is not None:
+      if dataset is None: dataset = row[1]
+      if experiment is None: experiment = row[2]
+    nupd = 0
+    if lforce or row is None or row[0] != mtime or row[3] != pattern:
+      # list folder and compare with catalog entries
+      known = {path:(size,ftime) for path,size,ftime in
+               conn.execute('SELECT path, size, mtime FROM files WHERE folder = ?', (folder,))}
+      subfolders = []; found = set()
+      for entry in os.scandir(folder):
+        if entry.is_dir():
+          subfolders.append(entry.path)
+        elif entry.is_file() and fnmatch.fnmatch(entry.name, pattern):
+          st = entry.stat(); found.add(entry.path)
+          if lforce or known.get(entry.path) != (st.st_size,st.st_mtime):
+            self._recordFile(conn, entry.path, st, dataset, experiment, lvariables); nupd += 1
+      # remove vanished files and folders
+      vanished = [(path,) for path in known if path not in found]
+      conn.executemany('DELETE FROM files WHERE path = ?', vanished); nupd += len(vanished)
+      for subfolder, in conn.execute('SELECT folder FROM folders WHERE parent = ?', (folder,)).fetchall():
+        if subfolder not in subfolders: self._removeFolder(conn, subfolder)
+      conn.execute('INSERT OR REPLACE INTO folders VALUES (?,?,?,?,?,?,?)',
+                   (folder, parent, mtime, time(), dataset, experiment, pattern))
+    else:
+      # N.B.: sub-folders can change, even if the folder itself did not
+      subfolders = [subfolder for subfolder, in conn.execute('SELECT folder FROM folders WHERE parent = ?', (folder,))]
+    if lrecursive:
+      for subfolder in subfolders:
+        if os.path.isdir(subfolder):
+          nupd += self._scanFolder(conn, subfolder, folder, None, None, pattern, lrecursive, lvariables, lforce)
+        else: self._removeFolder(conn, subfolder)
+    return nupd
+
+  def _removeFolder(self, conn, folder):
+    ''' remove a folder and all its files and sub-folders from the catalog '''
+    for subfolder, in conn.execute('SELECT folder FROM folders WHERE parent = ?', (folder,)).fetchall():
+      self._removeFolder(conn, subfolder)
+    conn.execute('DELETE FROM files WHERE folder = ?', (folder,))
+    conn.execute('DELETE FROM folders WHERE folder = ?', (folder,))
+
+  def _recordFile(self, conn, filepath, st, dataset, experiment, lvariables):
+    ''' insert or update the catalog entry of a file '''
+    meta = parseFilename(filepath)
+    varlist = readVariables(filepath) if lvariables else None
+    variables = ','.join(varlist) if varlist is not None else None
+    conn.execute('INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)',
+                 (filepath, os.path.dirname(filepath), os.path.basename(filepath), dataset, experiment,
+                  meta['mode'], meta['grid'], meta['period'], meta['filetype'], meta['domain'], variables,
+                  st.st_size, st.st_mtime))
+
+  def updateFile(self, filepath, lvariables=False):
+    ''' update the entry of a single file after it was written, renamed or removed (only files in
+        scanned folders that match the scan pattern are recorded); the modification time of its folder is updated as well, so that
+        the next incremental scan does not have to list the folder again '''
+    filepath = os.path.abspath(filepath); folder = os.path.dirname(filepath)
+    conn = self.connection
+    with conn:
+      row = conn.execute('SELECT dataset, experiment, pattern FROM folders WHERE folder = ?', (folder,)).fetchone()
+      if row is None or not fnmatch.fnmatch(os.path.basename(filepath), row[2]): return False
+      if os.path.exists(filepath):
+        self._recordFile(conn, filepath, os.stat(filepath), row[0], row[1], lvariables)
+      else: conn.execute('DELETE FROM files WHERE path = ?', (filepath,))
+      conn.execute('UPDATE folders SET mtime = ? WHERE folder = ?', (os.stat(folder).st_mtime, folder))
+    return True
+
+  ## lookups
+
+  def lookup(self, filepath):
+    ''' return the catalog entry of a file as a dictionary; returns None, if the file is not in a scanned
+        folder or does not match the scan pattern (i.e. the catalog has no information), and an empty
+        dictionary, if the folder was scanned, but the file does not exist '''
+    filepath = os.path.abspath(filepath)
+    conn = self.connection
+    row = conn.execute('SELECT * FROM files WHERE path = ?', (filepath,)).fetchone()
+    if row is not None:
+      entry = dict(zip(self.columns,row))
+      entry['variables'] = entry['variables'].split(',') if entry['variables'] is not None else None
+    else:
+      row = conn.execute('SELECT pattern FROM folders WHERE folder = ?', (os.path.dirname(filepath),)).fetchone()
+      # N.B.: files that do not match the scan pattern (e.g. pickles or masks) were never recorded
+      if row is not None and fnmatch.fnmatch(os.path.basename(filepath), row[0]): entry = dict()
+      else: entry = None
+    return entry
+
+  def query(self, dataset=None, experiment=None, mode=None, grid=None, period=None, variable=None,
+            filetype=None, domain=None):
+    ''' return a list of file paths that match the given meta data (None matches everything) '''
+    args = dict(dataset=dataset, experiment=experiment, mode=mode, grid=grid, period=period,
+                filetype=filetype, domain=domain)
+    conditions = []; values = []
+    for key,value in args.items():
+      if value is not None: conditions.append('{:s} = ?'.format(key)); values.append(value)
+    if variable is not None:
+      conditions.append("instr(',' || variables || ',', ?) > 0"); values.append(','+variable+',')
+    sql = 'SELECT path FROM files'
+    if conditions: sql += ' WHERE ' + ' AND '.join(conditions)
+    return [path for path, in self.connection.execute(sql+' ORDER BY path', values)]
+
+
+## default catalog and fast-path functions for the loaders and batch scripts
+
+catalog = None # the default catalog; None means the file system is queried directly
+
+def setCatalog(dbfile=None):
+  ''' set (or unset, if None) the default catalog; 'dbfile' can be a path or an ArchiveCatalog '''
+  global catalog
+  if catalog is not None and catalog is not dbfile: catalog.close()
+  if dbfile is None or isinstance(dbfile,ArchiveCatalog): catalog = dbfile
+  elif isinstance(dbfile,str): catalog = ArchiveCatalog(dbfile)
+  else: raise ArgumentError(dbfile)
+  return catalog
+
+def getCatalog():
+  ''' return the default catalog (None, if no catalog is active) '''
+  return catalog
+
+# check for environment variable
+if os.getenv('GEODATA_CATALOG',None): setCatalog(os.getenv('GEODATA_CATALOG'))
+
+def fileExists(filepath):
+  ''' check if a file exists; uses the default catalog, if the file is in a scanned folder '''
+  entry = catalog.lookup(filepath) if catalog is not None else None
+  if entry is None: return os.path.exists(filepath)
+  else: return bool(entry)
+
+def getModTime(filepath):
+  ''' return the modification time of a file (like os.path.getmtime); uses the default catalog, if
+      the file is in a scanned folder '''
+  entry = catalog.lookup(filepath) if catalog is not None else None
+  if entry is None: return os.path.getmtime(filepath)
+  elif not entry: raise IOError("File '{:s}' does not exist!".format(filepath))
+  else: return entry['mtime']
+
+def getFileSize(filepath):
+  ''' return the size of a file (like os.path.getsize); uses the default catalog, if the file is in a
+      scanned folder '''
+  entry = catalog.lookup(filepath) if catalog is not None else None
+  if entry is None: return os.path.getsize(filepath)
+  elif not entry: raise IOError("File '{:s}' does not exist!".format(filepath))
+  else: return entry['size']
+
+def updateFile(filepath):
+  ''' register a new, modified or removed file with the default catalog (if active) '''
+  if catalog is not None: return catalog.updateFile(filepath)
+  else: return False
@@ -485,6 +485,110 @@ def percentile(a, q, axis=None, interpolation='linear', keepdims=False):
   parr = np.rollaxis(parr, axis=0, start=parr.ndim) # move percentile axis to the back
   return parr
 
+# capacity of quantile sketch compactors for a given error bound
+def sketchCapacity(eps, n=None):
+  ''' determine the capacity k of the compactors in a QuantileSketch, so that the normalized rank error 
+      is bounded by 'eps' for a sample size 'n' (the error is eps ~ L/2k, with L levels of compactors);
+      if the sample size is not known, a conservative default is used '''
+  if not 0 < eps < 1: raise ValueError(eps)
+  if n is None: n = 2**31
+  nlev = lambda k: max(1, int(np.ceil(np.log2(max(float(n)/k,1.))))) # number of levels
+  # find the smallest capacity that satisfies the error bound (more capacity means fewer levels)
+  kmin = int(np.ceil(0.5/eps)); kmax = int(np.ceil(nlev(kmin)/(2.*eps)))
+  while kmin < kmax:
+    k = (kmin+kmax)//2
+    if 2.*eps*k >= nlev(k): kmax = k
+    else: kmin = k+1
+  k = kmax
+  return k
+
+# a mergeable quantile sketch for many samples at once
+class QuantileSketch(object):
+  ''' 
+    A mergeable quantile sketch for many independent samples (e.g. time-series at each grid point) that 
+    can be updated with chunks of data. The sketch consists of a hierarchy of compactors (Manku et al. 
+    1998, Karnin et al. 2016): each level holds up to 2k values per sample; full blocks are sorted and 
+    every other value is promoted to the next level, where it represents twice the weight. Since all 
+    samples receive the same number of values, they are compacted in lock-step, so that all operations 
+    are vectorized over samples. Missing values have to be NaN and are ignored.
+  '''
+  
+  def __init__(self, npts=1, eps=0.01, n=None, k=None):
+    ''' initialize with number of samples, error bound and (expected) sample size, or compactor capacity '''
+    if k is None: k = sketchCapacity(eps, n=n)
+    if not isinstance(k,(int,np.integer)) or k < 1: raise ValueError(k)
+    self.npts = npts
+    self.k = int(k)
+    self.levels = [] # arrays with shape (npts,m); the weight of each value is 2**level
+    self.ncompact = [] # number of compactions in each level (used to alternate offsets)
+    self.count = 0 # number of values added to each sample (including NaN)
+    
+  def _compact(self, level):
+    ''' compact all full blocks in a level and promote to the next level (recursively) '''
+    buf = self.levels[level]; blk = 2*self.k
+    nblk = buf.shape[1]//blk
+    if nblk == 0: return
+    blocks = np.sort(buf[:,:nblk*blk].reshape((self.npts,nblk,blk)), axis=-1) # NaN's sorted to the end
+    # N.B.: alternating between even and odd offsets, so that errors tend to cancel
+    lodd = ( (self.ncompact[level] + np.arange(nblk))%2 == 1 ).reshape((1,nblk,1))
+    promoted = np.where(lodd, blocks[:,:,1::2], blocks[:,:,0::2]).reshape((self.npts,nblk*self.k))
+    self.ncompact[level] += nblk
+    self.levels[level] = buf[:,nblk*blk:].copy() # retain remainder, but not the full buffer
+    if level+1 == len(self.levels): 
+      self.levels.append(promoted); self.ncompact.append(0)
+    else: 
+      self.levels[level+1] = np.concatenate((self.levels[level+1],promoted), axis=1)
+    self._compact(level+1)
+    
+  def update(self, data, axis=-1):
+    ''' add a chunk of values; 'axis' is the sample axis, all other axes are flattened '''
+    if isinstance(data,np.ma.MaskedArray): data = data.astype(np.float64).filled(np.NaN)
+    data = np.asarray(data, dtype=np.float64)
+    data = np.rollaxis(data, axis=axis, start=data.ndim).reshape((-1,data.shape[axis]))
+    if data.shape[0] != self.npts: raise AxisError("Number of samples in chunk does not match sketch.")
+    if len(self.levels) == 0: self.levels.append(data.copy()); self.ncompact.append(0)
+    else: self.levels[0] = np.concatenate((self.levels[0],data), axis=1)
+    self.count += data.shape[1]
+    self._compact(0)
+    return self
+  
+  def merge(self, sketch):
+    ''' merge another sketch (with the same number of samples and capacity) into this one '''
+    if not isinstance(sketch,QuantileSketch): raise TypeError(sketch)
+    if sketch.npts != self.npts or sketch.k != self.k: raise ArgumentError("Sketches are not compatible.")
+    for level,buf in enumerate(sketch.levels):
+      if level == len(self.levels): 
+        self.levels.append(buf.copy()); self.ncompact.append(0)
+      else: self.levels[level] = np.concatenate((self.levels[level],buf), axis=1)
+    self.count += sketch.count
+    for level in range(len(self.levels)): self._compact(level)
+    return self
+  
+  def quantile(self, q):
+    ''' return quantiles q (fractions in [0,1]) for all samples as an array with shape (npts,len(q));
+        linear interpolation between ranks is used, as in np.percentile '''
+    q = np.asarray(q, dtype=np.float64).reshape((1,-1))
+    if len(self.levels) == 0: return np.zeros((self.npts,q.size))*np.NaN
+    values = np.concatenate(self.levels, axis=1)
+    weights = np.concatenate([np.ones(buf.shape[1], dtype=np.int64)*2**level for level,buf in enumerate(self.levels)])
+    nval = values.shape[1]; rows = np.arange(self.npts).reshape((-1,1))
+    idx = np.argsort(values, axis=1) # NaN's sorted to the end
+    values = values[rows,idx]
+    cumw = np.cumsum(np.where(np.isnan(values), 0, weights[idx]), axis=1)
+    total = cumw[:,-1:]
+    # find the values for a given (fractional) rank; ranks of all samples are merged into one array
+    offset = rows*(total.max()+1)
+    flatw = (cumw + offset).ravel()
+    def rankValue(rank):
+      i = np.searchsorted(flatw, rank + offset, side='right') - rows*nval
+      return values[rows,np.minimum(i,nval-1)]
+    rank = q*(total-1)
+    lo = np.floor(rank)
+    vlo = rankValue(lo); vhi = rankValue(np.minimum(lo+1,total-1))
+    qdata = vlo + (rank-lo)*(vhi-vlo)
+    qdata[total.ravel()==0,:] = np.NaN # all values missing
+    return qdata
+
 # function to subtract the mean and divide by the standard deviation, i.e. standardize
 def standardize(var, axis=None, lcopy=True, **kwargs):
   ''' subtract mean, divide by standard deviation, and optionally smooth time series; key word arguments are passed on to smoothing function '''
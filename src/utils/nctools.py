@@ -19,6 +19,11 @@ import os
 
 # NC4 compression options
 zlib_default = dict(zlib=True, complevel=1, shuffle=True) # my own default compression settings
+# NC4 chunking presets: 'map' stores one full map per chunk (fast access to individual time steps),
+# 'timeseries' stores complete time-series for small tiles (fast extraction at points/stations)
+chunking_presets = ('map','timeseries','contiguous')
+chunk_bytes = 2**20 # target chunk size in bytes for the 'timeseries' preset (1 MB)
+chunk_time = 120 # time chunk for the 'timeseries' preset, if the time dimension is unlimited or empty
 
 # data error class
 class NCDataError(Exception):
@@ -74,6 +79,54 @@ def coerceAtts(atts):
   return ncatts
 
 
+def getCompression(zlib=True, complevel=None, shuffle=None, lsd=None):
+  ''' Return a dictionary of compression arguments for createVariable, starting from the default 
+      settings (or a dictionary passed as 'zlib'); 'lsd' is the least significant digit to retain 
+      (lossy quantization of floating point data). Returns False, if compression is disabled. '''
+  if isinstance(zlib,dict): zlib = zlib.copy()
+  elif zlib: zlib = zlib_default.copy()
+  else: return False
+  if complevel is not None: zlib['complevel'] = complevel
+  if shuffle is not None: zlib['shuffle'] = shuffle
+  if lsd is not None: zlib['least_significant_digit'] = lsd
+  return zlib
+
+def getChunkSizes(dims, shape, dtype, chunking=None, timedim='time', chunkbytes=None, timechunk=None):
+  ''' Translate a chunking policy into chunk sizes for a NetCDF variable with the given dimensions;
+      a policy can be one of the presets 'map' (one time step per chunk) or 'timeseries' (the entire 
+      time dimension per chunk, with small spatial tiles), a tuple/list of chunk sizes, a dictionary 
+      of chunk sizes for individual dimensions (others are not chunked), or a function that takes 
+      dims, shape, and dtype as arguments; 'contiguous' and None are returned as is. If the time 
+      dimension is unlimited or empty, the 'timeseries' preset uses 'timechunk' (default: chunk_time). '''
+  if chunking is None or chunking == 'contiguous': return chunking
+  if callable(chunking): chunking = chunking(dims, shape, dtype)
+  lunlim = [n is None or n == 0 for n in shape] # unlimited dimensions
+  shape = [1 if lu else n for n,lu in zip(shape,lunlim)]
+  ndim = len(dims)
+  if isinstance(chunking,str):
+    if chunking not in chunking_presets: raise ValueError("Unknown chunking preset: '{:s}'".format(chunking))
+    if chunking == 'map':
+      chunks = [1 if dim == timedim else n for dim,n in zip(dims,shape)] # the map and all other dimensions
+    elif chunking == 'timeseries':
+      if chunkbytes is None: chunkbytes = chunk_bytes
+      if timechunk is None: timechunk = chunk_time
+      chunks = [(timechunk if lu else n) if dim == timedim else 1 for dim,n,lu in zip(dims,shape,lunlim)]
+      # distribute remaining chunk elements evenly over the (up to two) innermost dimensions
+      nelts = max(1, chunkbytes // ( np.dtype(dtype).itemsize * int(np.prod(chunks)) ))
+      inner = [i for i in range(ndim-1,-1,-1) if dims[i] != timedim][:2]
+      if inner:
+        n = max(1, int(nelts**(1./len(inner)))) 
+        for i in inner: chunks[i] = min(shape[i], n)
+  elif isinstance(chunking,dict):
+    chunks = [chunking.get(dim,n) for dim,n in zip(dims,shape)]
+  elif isinstance(chunking,(tuple,list)):
+    if len(chunking) != ndim: raise NCAxisError("Number of chunk sizes does not match number of dimensions.")
+    chunks = list(chunking)
+  else: raise TypeError(chunking)
+  # make sure chunks are not larger than dimensions (unless unlimited)
+  return tuple(max(1,int(c) if lu else min(int(c),n)) for c,n,lu in zip(chunks,shape,lunlim))
+
+
 ## generic netcdf functions
 
 def add_strvar(dst, name, strlist, dim, atts=None):
@@ -127,8 +180,10 @@ def add_coord(dst, name, data=None, length=None, atts=None, dtype=None, zlib=Tru
   return coord
 
 def add_var(dst, name, dims, data=None, shape=None, atts=None, dtype=None, zlib=True, fillValue=None, 
-            lusestr=True, **kwargs):
-  ''' Function to add a Variable to a NetCDF Dataset; returns the Variable reference. '''
+            lusestr=True, chunking=None, **kwargs):
+  ''' Function to add a Variable to a NetCDF Dataset; returns the Variable reference. 
+      'zlib' can be a dictionary of compression arguments (see getCompression) and 'chunking' 
+      is a chunking policy (see getChunkSizes). '''
   # all remaining kwargs are passed on to dst.createVariable()
   # use data array to infer dimensions and data type
   if data is not None:
@@ -170,6 +225,15 @@ def add_var(dst, name, dims, data=None, shape=None, atts=None, dtype=None, zlib=
   if isinstance(zlib,dict): varargs.update(zlib)
   elif zlib: varargs.update(zlib_default)
   varargs.update(kwargs)
+  # N.B.: chunking is only supported by the HDF5-based NetCDF4 format
+  if chunking is not None and dst.data_model.startswith('NETCDF4') and not lstrvar and dtype != np.dtype(str):
+    chunksizes = getChunkSizes(dims, shape, dtype, chunking=chunking)
+    if chunksizes == 'contiguous': 
+      if not any(varargs.get(key) for key in ('zlib','shuffle','fletcher32')): varargs['contiguous'] = True
+      # N.B.: contiguous storage is not possible with compression filters
+    elif chunksizes is not None: varargs['chunksizes'] = chunksizes
+  if 'least_significant_digit' in varargs and dtype.kind != 'f': 
+    del varargs['least_significant_digit'] # only applies to floating point data
   if fillValue is None:
       if atts and '_FillValue' in atts: fillValue = atts['_FillValue'] # will be removed later
       elif atts and 'missing_value' in atts: fillValue = atts['missing_value']
@@ -273,9 +337,15 @@ def copy_dims(dst, src, dimlist=None, namemap=None, copy_coords=True, **kwargs):
 ## Dataset functions
 
 def writeNetCDF(dataset, ncfile, ncformat='NETCDF4', zlib=True, writeData=True, overwrite=True, skipUnloaded=False, 
-                feedback=False, close=True):
-  ''' A function to write the data in a generic Dataset to a NetCDF file. '''
+                feedback=False, close=True, chunking=None, varchunking=None, complevel=None, shuffle=None, lsd=None):
+  ''' A function to write the data in a generic Dataset to a NetCDF file. 
+      The chunking policy 'chunking' applies to all variables (see getChunkSizes), unless it is 
+      overridden for individual variables in 'varchunking' (a dictionary); compression can be adjusted 
+      with 'complevel', 'shuffle' and 'lsd' (least significant digit, a number or a dictionary). '''
   if feedback: print(("Writing to file: '{:s}'".format(ncfile))) # print feedback
+  if varchunking is None: varchunking = dict()
+  elif not isinstance(varchunking,dict): raise TypeError(varchunking)
+  zlib = getCompression(zlib=zlib, complevel=complevel, shuffle=shuffle)
   # open file
   if isinstance(ncfile,str): 
     if not overwrite and os.path.exists(ncfile): raise IOError("File '{:s}' already exists and 'overwrite' set to False.".format(ncfile))
@@ -292,8 +362,10 @@ def writeNetCDF(dataset, ncfile, ncformat='NETCDF4', zlib=True, writeData=True,
   for name,var in list(dataset.variables.items()):
     dims = tuple([ax.name for ax in var.axes])
     #data = var.getArray(unmask=True) if writeData and ( var.data or not skipUnloaded ) else None  
-    add_var(ncfile, name, dims=dims, data=var.data_array, atts=coerceAtts(var.atts), 
-            dtype=var.dtype, zlib=zlib, fillValue=var.fillValue)
+    varlsd = lsd.get(name,None) if isinstance(lsd,dict) else lsd
+    varzlib = getCompression(zlib=zlib, lsd=varlsd) if zlib and varlsd is not None else zlib
+    add_var(ncfile, name, dims=dims, data=var.data_array, atts=coerceAtts(var.atts), dtype=var.dtype, 
+            zlib=varzlib, fillValue=var.fillValue, chunking=varchunking.get(name,chunking))
   # close file or return file handle
   ncfile.sync()
   if close: ncfile.close()